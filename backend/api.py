@@ -11,7 +11,26 @@ project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
 
 from client.device_client import IoTDeviceClient
-from flask import Flask, jsonify, request, send_from_directory
+from client.install_pipeline import InstallPipeline
+from backend.responses import (
+    device_info_response,
+    purchase_request_error,
+    purchase_response,
+    install_response,
+    batch_install_uids,
+    batch_install_updates,
+    batch_install_response,
+    transaction_response,
+    notifications_response,
+    long_poll_timeout,
+    stream_since_id,
+    sse_events,
+    sse_gone,
+    SSE_HEADERS,
+    SSE_KEEPALIVE,
+)
+from backend.notification_store import NotificationStore, NotificationGone, NOTIFICATION_SSE_KEEPALIVE
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_socketio import SocketIO
 import logging
 import asyncio
@@ -47,26 +66,36 @@ VERSION = os.getenv("DEVICE_VERSION", "1.0.0")
 PORT = int(os.getenv("DEVICE_API_PORT", 5002))
 MANUFACTURER_API_URL = os.getenv("MANUFACTURER_API_URL")
 
-# 알림 저장소 (메모리)
-notifications = []
-notification_id_counter = 1
+# 알림 저장소 (최근 NOTIFICATION_CAPACITY개, NOTIFICATION_STORE_PATH가 있으면 디스크에도 기록)
+notification_store = NotificationStore()
 
 
 # 알림 등록 함수 (emit + 저장)
 def notify_new_update(uid, version, description):
-    global notification_id_counter
     logger.info(f"[notify_new_update] 새로운 알림 emit 중 - UID: {uid}")
-    notification = {
-        "id": notification_id_counter,
-        "timestamp": int(time.time()),
-        "type": "new_update",
-        "data": {"uid": uid, "version": version, "description": description},
-    }
-    notifications.append(notification)
-    notification_id_counter += 1
+    notification = notification_store.add(
+        "new_update", {"uid": uid, "version": version, "description": description}
+    )
     socketio.emit("notification", notification)
 
 
+# 트랜잭션 상태 알림 (emit만, 상태는 /api/device/transactions/<tx_id>로 조회)
+def notify_transaction_status(record):
+    logger.info(f"[notify_transaction_status] {record['kind']} 트랜잭션 {record['status']} - TX 해시: {record['tx_hash']}")
+    socketio.emit(
+        "notification",
+        {"timestamp": int(time.time()), "type": "transaction", "data": record},
+    )
+
+
+# 일괄 설치 진행 알림 (emit만)
+def notify_install_progress(event):
+    socketio.emit(
+        "notification",
+        {"timestamp": int(time.time()), "type": "install_progress", "data": event},
+    )
+
+
 # 기기 클라이언트 인스턴스 생성
 device = None
 try:
@@ -76,11 +105,15 @@ try:
         serial=SERIAL,
         version=VERSION,
         notification_callback=notify_new_update,
+        tx_status_callback=notify_transaction_status,
     )
     logger.info(f"IoT 기기 클라이언트 초기화 완료: {DEVICE_ID}")
 except Exception as e:
     logger.error(f"IoT 기기 클라이언트 초기화 실패: {e}")
 
+# 일괄 설치 파이프라인 (단계별 동시 실행 수 제한은 요청 간 공유)
+install_pipeline = InstallPipeline(device, progress_callback=notify_install_progress) if device else None
+
 # 정적 파일 디렉토리 설정
 current_dir = os.path.dirname(os.path.abspath(__file__))
 static_folder = os.path.join(os.path.dirname(current_dir), "frontend")
@@ -109,13 +142,6 @@ def get_device_info():
     installation_logs = device.get_owner_update_history()
     last_update = installation_logs[0] if installation_logs else None
 
-    # 기기의 현재 버전은 마지막 업데이트의 버전을 사용
-    current_version = (
-        last_update["version"] if last_update else device.attributes["version"]
-    )
-    last_update_timestamp = last_update["installedAt"] if last_update else None
-    last_update_uid = last_update["uid"] if last_update else None
-
     # 마지막 업데이트 description만 반환
     if last_update:
         try:
@@ -129,17 +155,8 @@ def get_device_info():
     else:
         last_update_description = None
 
-    return jsonify(
-        {
-            "id": device.device_id,
-            "model": device.attributes["model"],
-            "serial": device.attributes["serial"],
-            "version": current_version,
-            "lastUpdate": last_update_timestamp,
-            "uid": last_update_uid,
-            "description": last_update_description,
-        }
-    )
+    body, status = device_info_response(device, installation_logs, last_update_description)
+    return jsonify(body), status
 
 
 @app.route("/api/device/connection", methods=["GET"])
@@ -175,7 +192,11 @@ def get_device_client():
     if not device:
         try:
             device = IoTDeviceClient(
-                device_id=DEVICE_ID, model=MODEL, serial=SERIAL, version=VERSION
+                device_id=DEVICE_ID,
+                model=MODEL,
+                serial=SERIAL,
+                version=VERSION,
+                tx_status_callback=notify_transaction_status,
             )
             logger.info(f"IoT 기기 클라이언트 초기화 완료: {DEVICE_ID}")
         except Exception as e:
@@ -196,60 +217,25 @@ def is_update_installed(uid):
 
 @app.route("/api/device/updates/purchase", methods=["POST"])
 def purchase_update():
-    """업데이트 구매"""
+    """
+    업데이트 구매
+    - 기본: 트랜잭션 전송 직후 pending 상태와 txId 반환 (결과는 SocketIO "notification" type=transaction으로 전달)
+    - {"wait": true}: 영수증 확인 후 반환
+    """
     if not device:
         return jsonify({"error": "디바이스 초기화에 실패했습니다"}), 500
 
     try:
         data = request.json
-        uid = data.get("uid")
-        price = data.get("price")
+        error = purchase_request_error(data)
+        if error:
+            body, status = error
+            return jsonify(body), status
 
-        if not uid:
-            return jsonify({"error": "업데이트 ID가 필요합니다"}), 400
-
-        if not price:
-            return jsonify({"error": "가격이 필요합니다"}), 400
-
-        result = device.purchase_update(uid, price)
-
-        if not result.get("success"):
-            error_msg = result.get("message", "")
-            if "잔액이 부족합니다" in error_msg:
-                return (
-                    jsonify(
-                        {
-                            "error": "계정 잔액이 부족합니다. 필요한 금액을 확인해주세요.",
-                            "details": error_msg,
-                        }
-                    ),
-                    400,
-                )
-            elif "Already purchased" in error_msg:
-                return (
-                    jsonify(
-                        {
-                            "error": "구매할 수 없거나 이미 구매한 업데이트입니다.",
-                            "details": error_msg,
-                        }
-                    ),
-                    400,
-                )
-            else:
-                return (
-                    jsonify(
-                        {"error": "업데이트 구매에 실패했습니다.", "details": error_msg}
-                    ),
-                    500,
-                )
-
-        return jsonify(
-            {
-                "success": True,
-                "transaction": result["tx_hash"],
-                "message": f"업데이트 {uid} 구매 완료",
-            }
-        )
+        uid = data.get("uid")
+        result = device.purchase_update(uid, data.get("price"), wait=bool(data.get("wait", False)))
+        body, status = purchase_response(uid, result)
+        return jsonify(body), status
 
     except ValueError as e:
         logger.error(f"업데이트 구매 중 값 오류: {e}")
@@ -293,32 +279,9 @@ def install_update():
 
         # 실패 시 구체적인 오류 메시지 반환
         if not result["success"]:
-            error_message = result.get("message", "알 수 없는 오류")
-            logger.error(f"설치 실패: {error_message}")
-
-            # 오류 메시지 분석하여 적절한 메시지 생성
-            if "대칭키 복호화 실패" in error_message:
-                message = "대칭키 복호화 실패, 환불되었습니다."
-            elif "해시 검증 실패" in error_message:
-                message = "업데이트 파일 무결성 검증 실패, 환불되었습니다."
-            elif "다운로드" in error_message:
-                message = "업데이트 파일 다운로드 실패, 환불되었습니다."
-            else:
-                message = "업데이트 설치 실패, 환불되었습니다."
-
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "error": message,  # 사용자에게 보여질 메시지
-                        "details": error_message,  # 디버깅용 상세 에러
-                        "message": message,  # 이전 버전 호환성 유지
-                    }
-                ),
-                500,
-            )
-
-        return jsonify(result)
+            logger.error(f"설치 실패: {result.get('message', '알 수 없는 오류')}")
+        body, status = install_response(result)
+        return jsonify(body), status
 
     except Exception as e:
         logger.error(f"업데이트 설치 중 오류: {e}")
@@ -337,6 +300,58 @@ def install_update():
         )
 
 
+@app.route("/api/device/updates/install/batch", methods=["POST"])
+def install_updates():
+    """
+    여러 업데이트 일괄 설치 (uids 순서대로 설치 확인)
+    - 다운로드·복호화·트랜잭션 단계를 파이프라인으로 겹쳐 실행
+    - 진행 상황은 SocketIO "notification" type=install_progress로 전달
+    """
+    if not device or not install_pipeline:
+        return jsonify({"error": "디바이스 초기화에 실패했습니다"}), 500
+
+    try:
+        data = request.json or {}
+        uids, error = batch_install_uids(data)
+        if error:
+            body, status = error
+            return jsonify(body), status
+
+        # 업데이트 정보 가져오기
+        update_infos, error = batch_install_updates(uids, device.check_for_updates_http())
+        if error:
+            body, status = error
+            return jsonify(body), status
+
+        logger.info(f"업데이트 일괄 설치 시작: {uids}")
+        body, status = batch_install_response(install_pipeline.install(update_infos))
+        return jsonify(body), status
+
+    except Exception as e:
+        logger.error(f"업데이트 일괄 설치 중 오류: {e}")
+        import traceback
+
+        logger.error(traceback.format_exc())
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": "업데이트 일괄 설치 중 오류가 발생했습니다.",
+                }
+            ),
+            500,
+        )
+
+
+@app.route("/api/device/transactions/<tx_id>", methods=["GET"])
+def get_transaction_status(tx_id):
+    """전송한 트랜잭션의 상태 조회 (pending/success/failed/timeout)"""
+    if not device:
+        return jsonify({"error": "디바이스 초기화에 실패했습니다"}), 500
+    body, status = transaction_response(tx_id, device.get_transaction_status(tx_id))
+    return jsonify(body), status
+
+
 @app.route("/api/device/history", methods=["GET"])
 def get_update_history():
     """설치된 업데이트와 환불된 업데이트 이력 조회 (device_client 위임)"""
@@ -354,11 +369,43 @@ def get_update_history():
 
 @app.route("/api/notifications", methods=["GET"])
 def get_notifications():
-    """since=<id> 이후의 알림 목록 반환"""
+    """
+    since=<id> 이후의 알림 목록 반환 (since 이후 알림이 이미 밀려났으면 410)
+    - wait=<초>: 새 알림이 생기거나 시간이 지날 때까지 응답을 보류 (롱 폴링, 최대 NOTIFICATION_LONG_POLL_MAX)
+    - epoch=<값>: 마지막으로 받은 epoch와 현재 epoch가 다르면(서버 재시작·저장소 초기화) 410
+    """
     since_id = request.args.get("since", default=0, type=int)
-    # since_id보다 큰 id의 알림만 반환
-    filtered = [n for n in notifications if n["id"] > since_id]
-    return jsonify({"notifications": filtered})
+    timeout = long_poll_timeout(request.args.get("wait"))
+    epoch = request.args.get("epoch") or None
+    body, status = notifications_response(notification_store, since_id, timeout, epoch)
+    return jsonify(body), status
+
+
+@app.route("/api/notifications/stream", methods=["GET"])
+def stream_notifications():
+    """
+    알림 SSE 스트림 (since=<id> 또는 Last-Event-ID 이후부터 전송)
+    - 새 알림이 없으면 NOTIFICATION_SSE_KEEPALIVE초마다 keepalive 주석만 전송
+    - since 이후 알림이 이미 밀려났거나 epoch=<값>이 현재 epoch와 다르면 "gone" 이벤트 후 종료
+    """
+    since_id = stream_since_id(request.args.get("since"), request.headers.get("Last-Event-ID"))
+    epoch = request.args.get("epoch") or None
+
+    def events():
+        last_id = since_id
+        while True:
+            try:
+                notifications = notification_store.wait(last_id, NOTIFICATION_SSE_KEEPALIVE, epoch)
+            except NotificationGone as e:
+                yield sse_gone(e)
+                return
+            if not notifications:
+                yield SSE_KEEPALIVE
+                continue
+            yield sse_events(notifications)
+            last_id = notifications[-1]["id"]
+
+    return Response(events(), mimetype="text/event-stream", headers=SSE_HEADERS)
 
 
 if __name__ == "__main__":
@@ -371,8 +418,18 @@ if __name__ == "__main__":
     # Web3 이벤트 리스너 비동기 루틴 실행
     async def websocket_listener():
         await device._init_async_web3_socket_()
+        # 컨트랙트 로드가 끝난 뒤에 중단된 설치 재개 (로드 전에는 설치 대상 조회가 불가능)
+        eventlet.spawn(resume_installs)
         await device.listen_for_updates()
 
+    # 재시작 전에 중단된 설치를 마지막 완료 단계부터 이어서 진행
+    def resume_installs():
+        try:
+            for result in device.resume_installs():
+                logger.info(f"중단된 설치 재개 결과: {result}")
+        except Exception as e:
+            logger.error(f"중단된 설치 재개 실패: {e}")
+
     # eventlet용 green thread에서 실행
     threading.Thread(target=run_socketio).start()
     eventlet.spawn(asyncio.run, websocket_listener())
\ No newline at end of file
@@ -0,0 +1,402 @@
+import os
+import sys
+
+# 프로젝트 루트 디렉토리 추가 (Docker 환경 고려)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from client.device_client import IoTDeviceClient
+from client.async_device_client import AsyncIoTDeviceClient
+from client.install_pipeline import InstallPipeline
+from backend.responses import (
+    device_info_response,
+    purchase_request_error,
+    purchase_response,
+    install_response,
+    batch_install_uids,
+    batch_install_updates,
+    batch_install_response,
+    transaction_response,
+    gone_response,
+    long_poll_timeout,
+    stream_since_id,
+    sse_events,
+    sse_gone,
+    SSE_HEADERS,
+    SSE_KEEPALIVE,
+)
+from backend.notification_store import NotificationStore, NotificationGone, NOTIFICATION_SSE_KEEPALIVE
+import logging
+import asyncio
+import time
+import socketio
+import uvicorn
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+# ASGI 서빙 모드 (선택): api.py(Flask + eventlet)와 같은 경로·SocketIO 알림을 Starlette + python-socketio로 제공
+# - HTTP 조회·트랜잭션(AsyncIoTDeviceClient)과 WebSocket 이벤트 리스너가 하나의 asyncio 이벤트 루프를 공유
+# - 다운로드·복호화 등 블로킹 설치 작업은 asyncio.to_thread로 실행
+# 실행: python backend/asgi.py
+
+# 환경 변수 로드
+load_dotenv()
+
+# 로깅 설정
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+
+# 기기 설정
+DEVICE_ID = os.getenv("DEVICE_ID", "blocker_device_001")
+MODEL = os.getenv("DEVICE_MODEL", "VS500")
+SERIAL = os.getenv("DEVICE_SERIAL", "KMHEM42APXA752012")
+VERSION = os.getenv("DEVICE_VERSION", "1.0.0")
+PORT = int(os.getenv("DEVICE_API_PORT", 5002))
+
+# 서버 이벤트 루프 (startup에서 설정, 다른 스레드의 알림 emit을 이 루프로 넘김)
+loop = None
+background_tasks = []
+
+# 알림 저장소 (최근 NOTIFICATION_CAPACITY개, NOTIFICATION_STORE_PATH가 있으면 디스크에도 기록)
+notification_store = NotificationStore()
+# 롱 폴링·SSE 요청이 기다리는 이벤트 (새 알림이 추가되면 서버 루프에서 모두 set)
+notification_waiters = set()
+
+
+def _set_notification_waiters():
+    for event in notification_waiters:
+        event.set()
+
+
+def wake_notification_waiters(notification):
+    """notification_store 구독 콜백 (어느 스레드에서 호출돼도 서버 루프에서 대기 요청을 깨움)"""
+    if loop is not None:
+        loop.call_soon_threadsafe(_set_notification_waiters)
+
+
+notification_store.subscribe(wake_notification_waiters)
+
+
+async def wait_for_notifications(since_id, timeout, epoch=None):
+    """NotificationStore.wait()의 asyncio 버전 (이벤트 루프를 막지 않음)"""
+    event = asyncio.Event()
+    notification_waiters.add(event)
+    try:
+        deadline = loop.time() + timeout
+        while True:
+            event.clear()
+            notifications = notification_store.since(since_id, epoch)
+            remaining = deadline - loop.time()
+            if notifications or remaining <= 0:
+                return notifications
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        notification_waiters.discard(event)
+
+
+def emit_notification(notification):
+    """SocketIO "notification" 전송 (설치·영수증 폴링 스레드에서 호출해도 서버 루프에서 실행)"""
+    if loop is None:
+        return
+    asyncio.run_coroutine_threadsafe(sio.emit("notification", notification), loop)
+
+
+# 알림 등록 함수 (emit + 저장)
+def notify_new_update(uid, version, description):
+    logger.info(f"[notify_new_update] 새로운 알림 emit 중 - UID: {uid}")
+    notification = notification_store.add(
+        "new_update", {"uid": uid, "version": version, "description": description}
+    )
+    emit_notification(notification)
+
+
+# 트랜잭션 상태 알림 (emit만)
+def notify_transaction_status(record):
+    logger.info(f"[notify_transaction_status] {record['kind']} 트랜잭션 {record['status']} - TX 해시: {record['tx_hash']}")
+    emit_notification({"timestamp": int(time.time()), "type": "transaction", "data": record})
+
+
+# 일괄 설치 진행 알림 (emit만)
+def notify_install_progress(event):
+    emit_notification({"timestamp": int(time.time()), "type": "install_progress", "data": event})
+
+
+# 기기 클라이언트 인스턴스 생성 (키·설치·저널은 동기 클라이언트, HTTP 조회·트랜잭션은 비동기 클라이언트)
+device = None
+try:
+    device = IoTDeviceClient(
+        device_id=DEVICE_ID,
+        model=MODEL,
+        serial=SERIAL,
+        version=VERSION,
+        notification_callback=notify_new_update,
+        tx_status_callback=notify_transaction_status,
+    )
+    logger.info(f"IoT 기기 클라이언트 초기화 완료: {DEVICE_ID}")
+except Exception as e:
+    logger.error(f"IoT 기기 클라이언트 초기화 실패: {e}")
+
+async_device = AsyncIoTDeviceClient(device) if device else None
+install_pipeline = InstallPipeline(device, progress_callback=notify_install_progress) if device else None
+
+# 정적 파일 디렉토리 설정
+static_folder = os.path.join(project_root, "frontend")
+
+
+def json_response(body, status=200):
+    return JSONResponse(body, status_code=status)
+
+
+def device_unavailable():
+    return json_response({"error": "디바이스 초기화에 실패했습니다"}, 500)
+
+
+async def get_device_info(request):
+    """기기 정보 반환"""
+    if not async_device:
+        return device_unavailable()
+
+    # 설치된 업데이트 이력에서 마지막 업데이트 정보 확인
+    installation_logs = await async_device.get_owner_update_history()
+    last_update = installation_logs[0] if installation_logs else None
+
+    # 마지막 업데이트 description만 반환
+    last_update_description = None
+    if last_update:
+        try:
+            update_info = await async_device.contract.functions.getUpdateInfo(last_update["uid"]).call()
+            last_update_description = update_info[3]  # description 필드
+        except Exception as e:
+            logger.error(f"마지막 업데이트 description 조회 실패: {e}")
+
+    return json_response(*device_info_response(device, installation_logs, last_update_description))
+
+
+async def check_connection(request):
+    """블록체인 연결 상태 확인"""
+    if not async_device or async_device.web3 is None:
+        return json_response({"connected": False}, 500)
+
+    try:
+        return json_response({"connected": await async_device.web3.is_connected()})
+    except Exception as e:
+        logger.error(f"블록체인 연결 확인 중 오류: {e}", exc_info=True)
+        return json_response({"connected": False, "error": "블록체인 연결 중 오류가 발생했습니다."}, 500)
+
+
+async def check_updates(request):
+    if not async_device:
+        return json_response({"updates": [], "error": "기기 없음"}, 500)
+    try:
+        return json_response({"updates": await async_device.check_for_updates_http()})
+    except Exception as e:
+        logger.error(f"업데이트 확인 실패: {e}")
+        return json_response({"updates": [], "error": "업데이트 확인 중 오류 발생"}, 500)
+
+
+async def purchase_update(request):
+    """업데이트 구매 (api.py와 같은 요청/응답 형식)"""
+    if not async_device:
+        return device_unavailable()
+
+    try:
+        data = await request.json()
+        error = purchase_request_error(data)
+        if error:
+            return json_response(*error)
+
+        uid = data.get("uid")
+        result = await async_device.purchase_update(uid, data.get("price"), wait=bool(data.get("wait", False)))
+        return json_response(*purchase_response(uid, result))
+
+    except ValueError as e:
+        logger.error(f"업데이트 구매 중 값 오류: {e}")
+        return json_response({"error": "잘못된 입력값입니다."}, 400)
+    except Exception as e:
+        logger.error(f"업데이트 구매 중 오류: {e}", exc_info=True)
+        return json_response({"error": "업데이트 구매 중 오류가 발생했습니다."}, 500)
+
+
+async def install_update(request):
+    """업데이트 설치 (다운로드·복호화·설치 확인은 스레드에서 실행)"""
+    if not async_device:
+        return device_unavailable()
+
+    try:
+        data = await request.json()
+        uid = data.get("uid")
+
+        if not uid:
+            return json_response({"error": "업데이트 ID가 필요합니다"}, 400)
+
+        # 업데이트 정보 가져오기
+        updates = await async_device.check_for_updates_http()
+        update_info = next((u for u in updates if u["uid"] == uid), None)
+
+        if not update_info:
+            return json_response({"error": f"업데이트 {uid}를 찾을 수 없습니다"}, 404)
+
+        logger.info(f"업데이트 설치 시작: {uid}")
+        result = await asyncio.to_thread(device.download_update, update_info)
+        if not result["success"]:
+            logger.error(f"설치 실패: {result.get('message', '알 수 없는 오류')}")
+        return json_response(*install_response(result))
+
+    except Exception as e:
+        logger.error(f"업데이트 설치 중 오류: {e}", exc_info=True)
+        return json_response({"success": False, "message": "업데이트 설치 중 오류가 발생했습니다."}, 500)
+
+
+async def install_updates(request):
+    """여러 업데이트 일괄 설치 (진행 상황은 SocketIO "notification" type=install_progress로 전달)"""
+    if not async_device or not install_pipeline:
+        return device_unavailable()
+
+    try:
+        data = await request.json() or {}
+        uids, error = batch_install_uids(data)
+        if error:
+            return json_response(*error)
+
+        update_infos, error = batch_install_updates(uids, await async_device.check_for_updates_http())
+        if error:
+            return json_response(*error)
+
+        logger.info(f"업데이트 일괄 설치 시작: {uids}")
+        results = await asyncio.to_thread(install_pipeline.install, update_infos)
+        return json_response(*batch_install_response(results))
+
+    except Exception as e:
+        logger.error(f"업데이트 일괄 설치 중 오류: {e}", exc_info=True)
+        return json_response({"success": False, "message": "업데이트 일괄 설치 중 오류가 발생했습니다."}, 500)
+
+
+async def get_transaction_status(request):
+    """전송한 트랜잭션의 상태 조회 (pending/success/failed/timeout)"""
+    if not async_device:
+        return device_unavailable()
+    tx_id = request.path_params["tx_id"]
+    return json_response(*transaction_response(tx_id, async_device.get_transaction_status(tx_id)))
+
+
+async def get_update_history(request):
+    """설치된 업데이트와 환불된 업데이트 이력 조회"""
+    if not async_device:
+        return device_unavailable()
+    try:
+        return json_response({"history": await async_device.get_owner_update_history()})
+    except Exception as e:
+        logger.error(f"업데이트 이력 조회 실패: {e}", exc_info=True)
+        return json_response({"error": "서버 오류가 발생했습니다"}, 500)
+
+
+async def get_notifications(request):
+    """since=<id> 이후의 알림 목록 반환 (wait=<초>: 롱 폴링, since 이후 알림이 밀려났거나 epoch가 바뀌었으면 410)"""
+    try:
+        since_id = int(request.query_params.get("since", 0))
+    except ValueError:
+        since_id = 0
+    timeout = long_poll_timeout(request.query_params.get("wait"))
+    epoch = request.query_params.get("epoch") or None
+    try:
+        if timeout > 0:
+            notifications = await wait_for_notifications(since_id, timeout, epoch)
+        else:
+            notifications = notification_store.since(since_id, epoch)
+    except NotificationGone as e:
+        return json_response(*gone_response(e))
+    return json_response({"notifications": notifications, "epoch": notification_store.epoch})
+
+
+async def stream_notifications(request):
+    """알림 SSE 스트림 (api.py의 /api/notifications/stream과 같은 형식)"""
+    since_id = stream_since_id(request.query_params.get("since"), request.headers.get("last-event-id"))
+    epoch = request.query_params.get("epoch") or None
+
+    async def events():
+        last_id = since_id
+        while True:
+            try:
+                notifications = await wait_for_notifications(last_id, NOTIFICATION_SSE_KEEPALIVE, epoch)
+            except NotificationGone as e:
+                yield sse_gone(e)
+                return
+            if not notifications:
+                yield SSE_KEEPALIVE
+                continue
+            yield sse_events(notifications)
+            last_id = notifications[-1]["id"]
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+# 재시작 전에 중단된 설치를 마지막 완료 단계부터 이어서 진행
+def resume_installs():
+    try:
+        for result in device.resume_installs():
+            logger.info(f"중단된 설치 재개 결과: {result}")
+    except Exception as e:
+        logger.error(f"중단된 설치 재개 실패: {e}")
+
+
+async def startup():
+    """서버 루프에서 블록체인 연결·이벤트 리스너·중단된 설치 재개 시작"""
+    global loop
+    loop = asyncio.get_running_loop()
+    if not device:
+        return
+
+    try:
+        await device._init_async_web3_socket_()
+        await async_device.connect()
+    except Exception as e:
+        logger.error(f"[asgi] 블록체인 연결 실패: {e}")
+        return
+
+    background_tasks.append(asyncio.create_task(device.listen_for_updates()))
+    background_tasks.append(asyncio.create_task(asyncio.to_thread(resume_installs)))
+
+
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    if async_device:
+        await async_device.close()
+
+
+web_app = Starlette(
+    routes=[
+        Route("/api/device/info", get_device_info, methods=["GET"]),
+        Route("/api/device/connection", check_connection, methods=["GET"]),
+        Route("/api/device/updates", check_updates, methods=["GET"]),
+        Route("/api/device/updates/purchase", purchase_update, methods=["POST"]),
+        Route("/api/device/updates/install", install_update, methods=["POST"]),
+        Route("/api/device/updates/install/batch", install_updates, methods=["POST"]),
+        Route("/api/device/transactions/{tx_id}", get_transaction_status, methods=["GET"]),
+        Route("/api/device/history", get_update_history, methods=["GET"]),
+        Route("/api/notifications", get_notifications, methods=["GET"]),
+        Route("/api/notifications/stream", stream_notifications, methods=["GET"]),
+        # 프론트엔드 정적 파일 ("/"는 index.html, 디렉토리가 없으면 404)
+        *([Mount("/", app=StaticFiles(directory=static_folder, html=True))] if os.path.isdir(static_folder) else []),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+)
+
+# SocketIO(/socket.io) + Starlette, lifespan은 startup/shutdown으로 처리
+app = socketio.ASGIApp(sio, other_asgi_app=web_app, on_startup=startup, on_shutdown=shutdown)
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=PORT)
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 보관할 최근 알림 수 / 디스크 기록 파일 (비어 있으면 메모리에만 보관)
+NOTIFICATION_CAPACITY = int(os.getenv("NOTIFICATION_CAPACITY", 1000))
+NOTIFICATION_STORE_PATH = os.getenv("NOTIFICATION_STORE_PATH") or None
+# 롱 폴링 최대 대기 시간(초) / SSE 스트림 keepalive 주석 전송 간격(초)
+NOTIFICATION_LONG_POLL_MAX = float(os.getenv("NOTIFICATION_LONG_POLL_MAX", 30))
+NOTIFICATION_SSE_KEEPALIVE = float(os.getenv("NOTIFICATION_SSE_KEEPALIVE", 15))
+
+
+class NotificationGone(Exception):
+    """요청한 since 이후의 알림 일부가 이미 밀려났거나 저장소가 초기화되어 이어서 받을 수 없음 (처음부터 다시 동기화 필요)"""
+
+    def __init__(self, since_id, oldest_id, latest_id, epoch):
+        super().__init__(f"알림 {since_id} 이후 이력을 이어서 제공할 수 없습니다 (보관 범위: {oldest_id}~{latest_id})")
+        self.since_id = since_id
+        self.oldest_id = oldest_id
+        self.latest_id = latest_id
+        self.epoch = epoch
+
+
+class NotificationStore:
+    """
+    최근 알림 저장소 (고정 크기 링 버퍼, 스레드 안전)
+    - id는 1부터 1씩 증가하며, 가득 차면 가장 오래된 알림부터 밀려남
+    - since 조회는 id 순서를 이용한 이진 탐색 (O(log n))
+    - path를 지정하면 JSON Lines 파일에 이어 쓰고 시작 시 최근 capacity개를 복원 (재시작 후에도 since로 이어서 조회)
+    - 새 알림 발행: wait()로 대기 중인 스레드를 깨우고 subscribe()한 콜백 호출 (롱 폴링·SSE가 같은 발행 경로 사용)
+    - epoch: id 체계를 구분하는 값 (기록 파일이 있으면 재시작 후에도 유지, 없으면 시작할 때마다 새로 발급)
+    - 디스크 쓰기는 조회 락(_lock) 밖에서 수행하고, 쓰기 순서는 _write_lock으로 보장
+    """
+
+    def __init__(self, capacity=NOTIFICATION_CAPACITY, path=NOTIFICATION_STORE_PATH):
+        self.capacity = max(1, capacity)
+        self.path = path
+        self._buffer = [None] * self.capacity
+        self._start = 0  # 가장 오래된 알림의 위치
+        self._size = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._added = threading.Condition(self._lock)
+        self._subscribers = []
+        self._write_lock = threading.Lock()
+        self._unwritten = []  # 아직 기록 파일에 쓰지 않은 알림 (id 순)
+        self._file_lines = 0
+        self.epoch = None
+
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._load()
+        if self.epoch is None:
+            self.epoch = uuid.uuid4().hex
+            if self.path:
+                # 새 파일이거나 epoch 없는 이전 형식 파일 → epoch 머리줄과 함께 다시 씀
+                self._write_snapshot(self._snapshot())
+
+    def add(self, notification_type, data):
+        """알림 추가 → 저장된 알림 dict (id, timestamp 포함)"""
+        with self._lock:
+            notification = {
+                "id": self._next_id,
+                "timestamp": int(time.time()),
+                "type": notification_type,
+                "data": data,
+            }
+            self._next_id += 1
+            self._append(notification)
+            if self.path:
+                self._unwritten.append(notification)
+            self._added.notify_all()
+
+        if self.path:
+            self._persist()
+
+        for callback in list(self._subscribers):
+            try:
+                callback(notification)
+            except Exception as e:
+                logger.error(f"[NotificationStore] 구독 콜백 오류: {e}")
+        return notification
+
+    def subscribe(self, callback):
+        """알림이 추가될 때마다 callback(알림) 호출 (추가한 스레드에서 호출되므로 빨리 반환해야 함)"""
+        self._subscribers.append(callback)
+
+    def since(self, since_id, epoch=None):
+        """
+        since_id보다 큰 id의 알림 목록 (id 순)
+        - since_id가 0 이하면 보관 중인 알림 전체
+        - 아직 발급되지 않은 since_id면 빈 목록
+        - 그 사이 알림이 밀려났거나, epoch가 주어졌는데 현재 epoch와 다르면(재시작·저장소 초기화) NotificationGone
+        """
+        with self._lock:
+            return self._since(since_id, epoch)
+
+    def wait(self, since_id, timeout, epoch=None):
+        """
+        since_id 이후 알림이 생기거나 timeout(초)이 지날 때까지 대기 → since()와 같은 결과 (시간 초과면 빈 목록)
+        - eventlet 환경에서는 threading이 green 버전이므로 허브를 막지 않음
+        """
+        deadline = time.monotonic() + timeout
+        with self._added:
+            while True:
+                notifications = self._since(since_id, epoch)
+                remaining = deadline - time.monotonic()
+                if notifications or remaining <= 0:
+                    return notifications
+                self._added.wait(remaining)
+
+    def _since(self, since_id, epoch=None):
+        oldest_id = self._at(0)["id"] if self._size else self._next_id
+        if since_id > 0 and (since_id < oldest_id - 1 or (epoch is not None and epoch != self.epoch)):
+            raise NotificationGone(since_id, oldest_id, self._next_id - 1, self.epoch)
+
+        # id > since_id인 첫 위치를 이진 탐색
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._at(mid)["id"] <= since_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return [self._at(i) for i in range(lo, self._size)]
+
+    @property
+    def latest_id(self):
+        """마지막으로 발급한 알림 id (없으면 0)"""
+        with self._lock:
+            return self._next_id - 1
+
+    def _at(self, index):
+        """오래된 순서 기준 index번째 알림"""
+        return self._buffer[(self._start + index) % self.capacity]
+
+    def _append(self, notification):
+        if self._size < self.capacity:
+            self._buffer[(self._start + self._size) % self.capacity] = notification
+            self._size += 1
+        else:
+            self._buffer[self._start] = notification
+            self._start = (self._start + 1) % self.capacity
+
+    def _load(self):
+        """기록 파일에서 epoch와 최근 capacity개 복원 (손상된 줄은 건너뜀)"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    notification = json.loads(line)
+                    if "epoch" in notification and "id" not in notification:
+                        self.epoch = str(notification["epoch"])
+                        continue
+                    notification_id = int(notification["id"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self._file_lines += 1
+                if notification_id < self._next_id:
+                    continue
+                self._append(notification)
+                self._next_id = notification_id + 1
+        logger.info(f"[NotificationStore] 알림 {self._size}개 복원 (마지막 id: {self._next_id - 1})")
+
+    def _persist(self):
+        """
+        아직 쓰지 않은 알림을 기록 파일에 이어 쓰기 (보관 범위의 2배를 넘으면 보관 중인 알림만 남기도록 다시 씀)
+        - 대상 목록·스냅샷만 _lock 안에서 가져오고 파일 쓰기·fsync는 락 밖에서 수행 (조회·대기 스레드를 막지 않음)
+        - _write_lock을 잡은 스레드가 그때까지 쌓인 알림을 모두 씀 → 파일의 id 순서 유지
+        """
+        with self._write_lock:
+            with self._lock:
+                pending, self._unwritten = self._unwritten, []
+                snapshot = self._snapshot() if pending and self._file_lines >= 2 * self.capacity else None
+            if not pending:
+                return
+            try:
+                if snapshot is not None:
+                    self._write_snapshot(snapshot)
+                    return
+                with open(self.path, "a") as f:
+                    f.write("".join(json.dumps(notification) + "\n" for notification in pending))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._file_lines += len(pending)
+            except OSError as e:
+                logger.error(f"[NotificationStore] 알림 기록 실패: {e}")
+
+    def _snapshot(self):
+        """보관 중인 알림 목록 (오래된 순, _lock 안에서 호출)"""
+        return [self._at(index) for index in range(self._size)]
+
+    def _write_snapshot(self, notifications):
+        """epoch 머리줄 + 알림 목록으로 기록 파일을 원자적으로 교체"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, staging_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(json.dumps({"epoch": self.epoch}) + "\n")
+                for notification in notifications:
+                    f.write(json.dumps(notification) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(staging_path, self.path)
+        except BaseException:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+        self._file_lines = len(notifications)
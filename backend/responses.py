@@ -0,0 +1,182 @@
+"""
+API 응답 본문 구성 (Flask api.py와 ASGI asgi.py가 공유)
+- 각 함수는 (응답 dict, HTTP 상태 코드)를 반환하며, 프레임워크별 JSON 응답 변환은 호출 측에서 처리
+"""
+
+import json
+
+from backend.notification_store import NotificationGone, NOTIFICATION_LONG_POLL_MAX
+
+# SSE 응답 헤더 (프록시 버퍼링·캐시 방지) / 연결 유지용 주석
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+SSE_KEEPALIVE = ": keepalive\n\n"
+
+
+def device_info_response(device, installation_logs, last_update_description):
+    """기기 정보 (현재 버전은 마지막 업데이트의 버전)"""
+    last_update = installation_logs[0] if installation_logs else None
+    return {
+        "id": device.device_id,
+        "model": device.attributes["model"],
+        "serial": device.attributes["serial"],
+        "version": last_update["version"] if last_update else device.attributes["version"],
+        "lastUpdate": last_update["installedAt"] if last_update else None,
+        "uid": last_update["uid"] if last_update else None,
+        "description": last_update_description,
+    }, 200
+
+
+def purchase_request_error(data):
+    """구매 요청 본문 검증 (문제가 없으면 None)"""
+    if not data.get("uid"):
+        return {"error": "업데이트 ID가 필요합니다"}, 400
+    if not data.get("price"):
+        return {"error": "가격이 필요합니다"}, 400
+    return None
+
+
+def purchase_response(uid, result):
+    """purchase_update 결과 → 응답 (실패 메시지로 잔액 부족·이미 구매 구분)"""
+    if not result.get("success"):
+        error_msg = result.get("message", "")
+        if "잔액이 부족합니다" in error_msg:
+            return {
+                "error": "계정 잔액이 부족합니다. 필요한 금액을 확인해주세요.",
+                "details": error_msg,
+            }, 400
+        elif "Already purchased" in error_msg:
+            return {
+                "error": "구매할 수 없거나 이미 구매한 업데이트입니다.",
+                "details": error_msg,
+            }, 400
+        else:
+            return {"error": "업데이트 구매에 실패했습니다.", "details": error_msg}, 500
+
+    pending = result.get("pending", False)
+    return {
+        "success": True,
+        "pending": pending,
+        "txId": result["tx_id"],
+        "transaction": result["tx_hash"],
+        "message": f"업데이트 {uid} 구매 트랜잭션 전송됨" if pending else f"업데이트 {uid} 구매 완료",
+    }, 200
+
+
+def install_response(result):
+    """download_update 결과 → 응답 (실패 시 오류 메시지를 분석해 사용자용 메시지 생성)"""
+    if result["success"]:
+        return result, 200
+
+    error_message = result.get("message", "알 수 없는 오류")
+    if result.get("pending"):
+        # 파일 설치는 끝났지만 설치 확인 트랜잭션이 확정되지 않음 (환불하지 않고 다음 시도에서 확인부터 재개)
+        message = "업데이트 설치 확인 대기 중입니다. 다시 시도하면 설치 확인부터 이어서 진행합니다."
+        return {
+            "success": False,
+            "pending": True,
+            "error": message,
+            "details": error_message,
+            "message": message,
+        }, 202
+    if "대칭키 복호화 실패" in error_message:
+        message = "대칭키 복호화 실패, 환불되었습니다."
+    elif "해시 검증 실패" in error_message:
+        message = "업데이트 파일 무결성 검증 실패, 환불되었습니다."
+    elif "다운로드" in error_message:
+        message = "업데이트 파일 다운로드 실패, 환불되었습니다."
+    else:
+        message = "업데이트 설치 실패, 환불되었습니다."
+
+    return {
+        "success": False,
+        "error": message,  # 사용자에게 보여질 메시지
+        "details": error_message,  # 디버깅용 상세 에러
+        "message": message,  # 이전 버전 호환성 유지
+    }, 500
+
+
+def batch_install_uids(data):
+    """일괄 설치 요청 검증 → (중복 제거한 uid 목록(요청 순서 유지), None) 또는 (None, 오류 응답)"""
+    uids = data.get("uids")
+    if not uids or not isinstance(uids, list):
+        return None, ({"error": "업데이트 ID 목록(uids)이 필요합니다"}, 400)
+    return list(dict.fromkeys(uids)), None
+
+
+def batch_install_updates(uids, updates):
+    """
+    uid 목록 → (설치할 업데이트 정보 목록, None) 또는 (None, 오류 응답)
+    :param updates: 사용 가능한 업데이트 목록 (check_for_updates_http 결과)
+    """
+    updates = {u["uid"]: u for u in updates}
+    missing = [uid for uid in uids if uid not in updates]
+    if missing:
+        return None, ({"error": f"업데이트 {', '.join(missing)}를 찾을 수 없습니다", "missing": missing}, 404)
+    return [updates[uid] for uid in uids], None
+
+
+def batch_install_response(results):
+    return {"success": all(r["success"] for r in results), "results": results}, 200
+
+
+def transaction_response(tx_id, record):
+    if record is None:
+        return {"error": f"트랜잭션 {tx_id}를 찾을 수 없습니다"}, 404
+    return {"transaction": record}, 200
+
+
+def notifications_response(store, since_id, timeout=0, epoch=None):
+    """
+    since_id 이후 알림 목록 (이미 밀려난 구간이거나 epoch가 바뀌었으면 410: 클라이언트는 since=0으로 다시 동기화)
+    :param timeout: 0보다 크면 새 알림이 생길 때까지 최대 timeout초 대기 (롱 폴링)
+    :param epoch: 클라이언트가 마지막으로 받은 epoch (생략하면 재시작 여부를 확인하지 않음)
+    """
+    try:
+        if timeout > 0:
+            notifications = store.wait(since_id, timeout, epoch)
+        else:
+            notifications = store.since(since_id, epoch)
+    except NotificationGone as e:
+        return gone_response(e)
+    return {"notifications": notifications, "epoch": store.epoch}, 200
+
+
+def gone_response(error):
+    return {
+        "error": str(error),
+        "oldestId": error.oldest_id,
+        "latestId": error.latest_id,
+        "epoch": error.epoch,
+    }, 410
+
+
+def long_poll_timeout(value):
+    """wait 쿼리 값(초) → 롱 폴링 대기 시간 (없거나 잘못된 값이면 0: 즉시 응답, 최대 NOTIFICATION_LONG_POLL_MAX)"""
+    try:
+        return min(max(float(value), 0.0), NOTIFICATION_LONG_POLL_MAX)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def stream_since_id(since, last_event_id):
+    """SSE 시작 위치: 재연결 시 브라우저가 보내는 Last-Event-ID 우선, 없으면 since 쿼리, 둘 다 없으면 0"""
+    for value in (last_event_id, since):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            continue
+    return 0
+
+
+def sse_events(notifications):
+    """알림 목록 → SSE "notification" 이벤트 (id는 Last-Event-ID 재연결용)"""
+    return "".join(
+        f"id: {n['id']}\nevent: notification\ndata: {json.dumps(n, ensure_ascii=False)}\n\n"
+        for n in notifications
+    )
+
+
+def sse_gone(error):
+    """since 이후 알림이 밀려났음을 알리는 SSE "gone" 이벤트 (스트림 종료 후 since=0으로 다시 연결)"""
+    body, _ = gone_response(error)
+    return f"event: gone\ndata: {json.dumps(body, ensure_ascii=False)}\n\n"
@@ -0,0 +1,336 @@
+import os
+import time
+import asyncio
+import logging
+
+import aiohttp
+from web3 import AsyncWeb3
+
+from client.device_client import IoTDeviceClient, AVAILABLE_UPDATES_TTL, GAS_FALLBACK_LIMIT
+from client.gas_oracle import (
+    GasOracle, fees_from_chain, GAS_FEE_TTL, GAS_EIP1559, GAS_FEE_HISTORY_BLOCKS, GAS_PRIORITY_PERCENTILE,
+)
+from client.tx_manager import AsyncTransactionManager, STATUS_PENDING, STATUS_SUCCESS, STATUS_FAILED
+from client.ttl_cache import AsyncSingleFlightCache
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# AsyncHTTPProvider가 공유하는 aiohttp 세션의 최대 동시 연결 수
+ASYNC_HTTP_POOL_SIZE = int(os.getenv("ASYNC_HTTP_POOL_SIZE", 20))
+
+
+class AsyncIoTDeviceClient:
+    """
+    IoTDeviceClient의 asyncio 버전 (HTTP 조회·트랜잭션을 AsyncWeb3로 처리)
+    - 연결 풀을 둔 aiohttp 세션 하나를 AsyncHTTPProvider가 재사용 (요청마다 연결을 새로 만들지 않음)
+    - 서로 독립적인 RPC는 asyncio.gather로 동시에 실행
+    - 키·설치·저널·이벤트 색인은 감싼 IoTDeviceClient를 그대로 사용하고,
+      nonce 관리와 함수별 가스 추정치는 동기 경로와 공유 (두 경로를 섞어 써도 nonce가 겹치지 않음)
+    """
+
+    def __init__(self, device, pool_size=ASYNC_HTTP_POOL_SIZE):
+        """
+        :param device: 초기화된 IoTDeviceClient
+        :param pool_size: aiohttp 세션의 최대 동시 연결 수
+        """
+        self.device = device
+        self.pool_size = pool_size
+        self.web3 = None
+        self.contract = None
+        self.tx_manager = None
+        self._session = None
+
+        # 사용 가능한 업데이트 목록 캐시 (동기 캐시가 무효화되면 함께 무효화: 이벤트 수신, 트랜잭션 완료 등)
+        self.available_updates = AsyncSingleFlightCache(
+            self._fetch_available_updates, AVAILABLE_UPDATES_TTL, name="available_updates_async"
+        )
+        device.available_updates.subscribe(self.available_updates.invalidate)
+        # 수수료 캐시 (최신 블록·feeHistory·gasPrice 동시 조회)
+        self._fees = AsyncSingleFlightCache(self._fetch_fees, GAS_FEE_TTL, name="gas_fees_async")
+
+    async def connect(self):
+        """연결 풀 세션·AsyncHTTPProvider 생성 및 컨트랙트 바인딩 (이벤트 루프 안에서 호출)"""
+        if self.web3 is not None:
+            return
+
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+        provider = AsyncWeb3.AsyncHTTPProvider(self.device.web3_http_provider)
+        await provider.cache_async_session(self._session)
+        self.web3 = AsyncWeb3(provider)
+
+        if self.device.contract_http is None:
+            await self.device._load_contract()
+        self.contract = self.web3.eth.contract(
+            address=self.device.contract_http.address,
+            abi=self.device.contract_http.abi,
+        )
+        self.tx_manager = AsyncTransactionManager(
+            self.web3,
+            self.device.owner_address,
+            self.device.owner_private_key,
+            self.device.tx_manager.nonces,
+            status_callback=self.device.tx_manager.status_callback,
+        )
+        logger.info(
+            f"[AsyncIoTDeviceClient] AsyncHTTPProvider 연결 (연결 풀 {self.pool_size}): {self.device.web3_http_provider}"
+        )
+
+    async def close(self):
+        """aiohttp 세션 종료"""
+        if self._session is not None:
+            await self._session.close()
+        self._session = None
+        self.web3 = None
+
+    async def check_for_updates_http(self):
+        """[API용] 사용 가능한 업데이트 목록 (AVAILABLE_UPDATES_TTL 동안 캐시)"""
+        try:
+            # 캐시된 목록은 공유되므로 호출자별 사본 반환
+            return [dict(update) for update in await self.available_updates.get()]
+        except Exception as e:
+            logger.error(f"[check_for_updates_http] 업데이트 확인 실패: {e}")
+            return []
+
+    async def _fetch_available_updates(self):
+        logger.info("[check_for_updates_http] 사용 가능한 업데이트(미설치/미환불) 목록 조회 (getAvailableUpdatesForOwner)")
+        result = await self.contract.functions.getAvailableUpdatesForOwner().call(
+            {"from": self.device.owner_address}
+        )
+        return IoTDeviceClient._parse_available_updates(result)
+
+    async def purchase_update(self, uid, price, wait=True):
+        """
+        업데이트 구매
+        :param wait: False면 영수증을 기다리지 않고 전송 직후 반환 (tx_id로 상태 조회)
+        """
+        owner = self.device.owner_address
+        try:
+            # 업데이트 정보·잔액·가스 추정(구매 가능 여부 사전 확인 겸)·수수료를 동시에 조회
+            purchase_function = self.contract.functions.purchaseUpdate(uid)
+            update_info, balance, gas_estimate, fees = await asyncio.gather(
+                self.contract.functions.getUpdateInfo(uid).call(),
+                self.web3.eth.get_balance(owner),
+                purchase_function.estimate_gas({"from": owner, "value": price}),
+                self.fees(),
+                return_exceptions=True,
+            )
+            for result in (update_info, balance, fees):
+                if isinstance(result, Exception):
+                    raise result
+
+            # 업데이트의 실제 가격 확인
+            actual_price = update_info[4]
+            logger.info(f"업데이트의 실제 가격: {actual_price} wei")
+            logger.info(f"전달받은 가격: {price} wei")
+
+            # 전달받은 가격이 실제와 다르면 실제 가격으로 다시 추정
+            if price != actual_price:
+                price = actual_price
+                gas_estimate = await purchase_function.estimate_gas({"from": owner, "value": price})
+            elif isinstance(gas_estimate, Exception):
+                raise gas_estimate
+
+            gas_limit = self.device.gas_oracle.record(purchase_function, gas_estimate)
+
+            # 잔액 확인
+            total_cost = price + (gas_limit * GasOracle.max_fee_per_gas(fees))
+            if balance < total_cost:
+                error_msg = f"계정 잔액이 부족합니다. 필요: {total_cost} wei, 보유: {balance} wei"
+                logger.error(error_msg)
+                return {"success": False, "message": error_msg}
+
+            logger.info(f"업데이트 구매 시작 - UID: {uid}, 가격: {price} wei")
+            record = await self._send_transaction(
+                "purchase",
+                uid,
+                purchase_function,
+                {"gas": gas_limit, "value": price, **fees},
+                wait=wait,
+            )
+            if record["status"] == STATUS_PENDING:
+                return {"tx_hash": record["tx_hash"], "tx_id": record["id"], "success": True, "pending": True}
+
+            logger.info(f"업데이트 구매 완료 - TX 해시: {record['tx_hash']}")
+            return {"tx_hash": record["tx_hash"], "tx_id": record["id"], "success": record["status"] == STATUS_SUCCESS}
+
+        except Exception as e:
+            logger.error(f"업데이트 구매 실패: {e}")
+            return {"success": False, "message": "revert Already purchased"}
+
+    async def refund_update(self, uid):
+        """업데이트 환불 시도"""
+        try:
+            refund_time = int(time.time())  # 환불 시각(유닉스 타임스탬프)
+            record = await self._send_transaction(
+                "refund",
+                uid,
+                self.contract.functions.refundOnNotMatch(uid),
+            )
+            logger.info(f"환불 트랜잭션 완료 - TX 해시: {record['tx_hash']}")
+            return {
+                "tx_hash": record["tx_hash"],
+                "success": record["status"] == STATUS_SUCCESS,
+                "refundedAt": refund_time,
+            }
+        except Exception as e:
+            logger.error(f"환불 실패: {e}")
+            return {"success": False, "message": str(e)}
+
+    async def confirm_installation(self, uid):
+        """설치 완료 확인 메시지 전송"""
+        try:
+            logger.info(f"업데이트 설치 확인 메시지 전송 - UID: {uid}")
+            device_id = self.device.device_id
+            record = await self._send_transaction(
+                "confirm",
+                uid,
+                self.contract.functions.confirmInstallation(uid, device_id),
+            )
+            logger.info(f"설치 확인 메시지 전송 완료 - TX 해시: {record['tx_hash']}")
+
+            installation_record = {
+                "uid": uid,
+                "device_id": device_id,
+                "version": self.device.attributes["version"],
+                "timestamp": int(time.time()),
+                "tx_hash": record["tx_hash"],
+                "status": "completed",
+            }
+            return {
+                "tx_hash": record["tx_hash"],
+                "success": record["status"] == STATUS_SUCCESS,
+                "record": installation_record,
+            }
+        except Exception as e:
+            logger.error(f"설치 확인 메시지 전송 실패: {e}")
+            return {"success": False, "message": str(e)}
+
+    async def fees(self):
+        """트랜잭션 수수료 필드 dict (GasOracle.fees()와 같은 형태)"""
+        return dict(await self._fees.get())
+
+    async def _fetch_fees(self):
+        if GAS_EIP1559 == "off":
+            return {"gasPrice": await self.web3.eth.gas_price}
+        block, history, gas_price = await asyncio.gather(
+            self.web3.eth.get_block("latest"),
+            self.web3.eth.fee_history(GAS_FEE_HISTORY_BLOCKS, "latest", [GAS_PRIORITY_PERCENTILE]),
+            self.web3.eth.gas_price,
+            return_exceptions=True,
+        )
+        return fees_from_chain(block, history, gas_price)
+
+    async def _estimate_gas(self, function, transaction):
+        """함수별 가스 한도 (GasOracle의 추정치 캐시 공유, 추정 실패 시 GAS_FALLBACK_LIMIT)"""
+        oracle = self.device.gas_oracle
+        cached = oracle.cached(function)
+        if cached is not None:
+            return cached
+        try:
+            return oracle.record(function, await function.estimate_gas(transaction))
+        except Exception as e:
+            logger.warning(f"[AsyncIoTDeviceClient] {function.fn_name} 가스 추정 실패 → {GAS_FALLBACK_LIMIT} 사용: {e}")
+            return GAS_FALLBACK_LIMIT
+
+    async def _send_transaction(self, kind, uid, function, tx_params=None, wait=True):
+        """
+        AsyncTransactionManager로 트랜잭션 전송 → 트랜잭션 기록
+        - tx_params에 없는 가스 한도·수수료는 캐시에서 채움
+        - 영수증이 확인되면 사용 가능한 업데이트 캐시 무효화, 실패한 트랜잭션이면 가스 추정치도 폐기
+        """
+        tx_params = dict(tx_params or {})
+        if "gas" not in tx_params:
+            tx_params["gas"] = await self._estimate_gas(function, {"from": self.device.owner_address})
+        if "gasPrice" not in tx_params and "maxFeePerGas" not in tx_params:
+            tx_params.update(await self.fees())
+
+        def on_complete(done):
+            if done["status"] == STATUS_FAILED:
+                self.device.gas_oracle.forget(function)
+            # 동기 캐시를 무효화하면 구독 중인 이 클라이언트의 캐시도 함께 무효화됨
+            self.device.available_updates.invalidate(f"{kind} 트랜잭션 {done['status']}")
+
+        async def build(params):
+            return await function.build_transaction({**tx_params, **params})
+
+        record = await self.tx_manager.submit(build, kind=kind, meta={"uid": uid}, on_complete=on_complete)
+        if wait:
+            record = await self.tx_manager.wait(record["id"])
+        return record
+
+    def get_transaction_status(self, tx_id):
+        """전송한 트랜잭션의 현재 상태 (동기 경로에서 보낸 트랜잭션 포함, 없으면 None)"""
+        # connect() 전이거나 연결에 실패하면 비동기 트랜잭션 관리자가 없으므로 동기 경로 기록만 조회
+        record = self.tx_manager.get(tx_id) if self.tx_manager is not None else None
+        return record or self.device.get_transaction_status(tx_id)
+
+    async def get_update_infos(self, uids):
+        """getUpdateInfo(uid) 여러 건을 동시에 조회 → {uid: 반환값 또는 예외 객체}"""
+        uids = list(dict.fromkeys(uids))
+        results = await asyncio.gather(
+            *(self.contract.functions.getUpdateInfo(uid).call() for uid in uids),
+            return_exceptions=True,
+        )
+        return dict(zip(uids, results))
+
+    async def _query_events(self, event, **filters):
+        """이벤트 색인을 새 블록까지 동기화한 뒤 조회 (백필 중이면 색인된 범위만, DB 조회는 이벤트 루프 밖에서 실행)"""
+        store = self.device.event_store
+        if store is None:
+            raise RuntimeError("이벤트 색인이 초기화되지 않았습니다")
+        await store.refresh_async(self.web3)
+        return await asyncio.to_thread(store.query, event, **filters)
+
+    async def get_update_history(self):
+        """설치된 업데이트 이력 조회"""
+        try:
+            logger.info("[get_update_history] 업데이트 설치 이력 조회 시작")
+            events = await self._query_events("UpdateInstalled", device_id=self.device.device_id)
+            logger.info(f"[get_update_history] 감지된 설치 이력 UID: {[event['uid'] for event in events]}")
+            update_infos = await self.get_update_infos([event["args"]["uid"] for event in events])
+            return IoTDeviceClient._history_items(events, update_infos)
+        except Exception as e:
+            logger.error(f"[get_update_history] 설치 이력 조회 실패: {e}")
+            return []
+
+    async def get_refunded_updates(self):
+        """환불 완료된 업데이트 목록 조회 (중복된 구매 시도도 모두 표시)"""
+        try:
+            logger.info("[get_refunded_updates] 환불된 업데이트 목록 조회 시작")
+            owner = self.device.owner_address
+            # 구매 시도한 UID 목록·설치 이력·UpdateDelivered 이벤트를 동시에 조회
+            update_uids, history, delivered_events = await asyncio.gather(
+                self.contract.functions.getOwnerUpdates().call({"from": owner}),
+                self.get_update_history(),
+                self._query_events("UpdateDelivered", owner=self.web3.to_checksum_address(owner)),
+                return_exceptions=True,
+            )
+            if isinstance(update_uids, Exception):
+                raise update_uids
+            if isinstance(delivered_events, Exception):
+                logger.error(f"[get_refunded_updates] 이벤트 조회 실패: {delivered_events}")
+                delivered_events = []
+            logger.info(f"[get_refunded_updates] 전체 구매 시도한 UID 목록: {update_uids}")
+
+            installed_uids = {log["uid"] for log in history}
+            logger.info(f"[get_refunded_updates] 설치된 UID 목록: {installed_uids}")
+
+            update_infos = await self.get_update_infos([uid for uid in update_uids if uid not in installed_uids])
+            return IoTDeviceClient._refunded_items(update_uids, installed_uids, delivered_events, update_infos)
+
+        except Exception as e:
+            logger.error(f"[get_refunded_updates] 환불 목록 조회 실패: {e}")
+            return []
+
+    async def get_owner_update_history(self):
+        """getOwnerUpdateHistory() 호출 → 구매/설치/환불 상태 및 시각, 업데이트 상세정보"""
+        try:
+            result = await self.contract.functions.getOwnerUpdateHistory().call(
+                {"from": self.device.owner_address}
+            )
+            return IoTDeviceClient._parse_owner_update_history(result)
+        except Exception as e:
+            logger.error(f"[get_owner_update_history] 오류: {e}")
+            return []
@@ -6,13 +6,44 @@ import logging
 from dotenv import load_dotenv
 import sys
 import base64
+import hashlib
+import tempfile
+from collections import OrderedDict
 from hashlib import sha256
 from charm.core.engine.util import objectToBytes
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3.exceptions import TimeExhausted, TransactionNotFound
 
-from crypto.symmetric.symmetric import SymmetricCrypto
+from crypto.symmetric.symmetric import SymmetricCrypto, CBCStreamDecryptor
 from crypto.hash.hash import HashTools
-from ipfs.download.download import IPFSDownloader
+from ipfs.download.download import IPFSDownloader, STREAM_CHUNK_SIZE
 from crypto.cpabe.cpabe import CPABETools
+from crypto.cpabe.keycache import CPABEKeyCache
+from client.event_store import EventStore
+from client.rpc_batch import RPCBatcher, BlockHeaderCache
+from client.multicall import ReadAggregator
+from client.ttl_cache import SingleFlightCache
+from client.listener import SupervisedLogListener
+from client.tx_manager import (
+    TransactionManager,
+    STATUS_PENDING,
+    STATUS_SUCCESS,
+    STATUS_FAILED,
+    TX_RECEIPT_POLL_INTERVAL,
+    TX_RECEIPT_TIMEOUT,
+)
+from client.gas_oracle import GasOracle
+from client.install_journal import (
+    InstallJournal,
+    InstallStageError,
+    reached,
+    STAGE_DOWNLOADED,
+    STAGE_VERIFIED,
+    STAGE_KEY_DECRYPTED,
+    STAGE_FILE_DECRYPTED,
+    STAGE_CONFIRMED,
+)
 
 import requests
 MANUFACTURER_API_URL = os.getenv("MANUFACTURER_API_URL")
@@ -33,11 +64,24 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
 KEY_DIR = os.path.join(current_dir, "keys") #SKd 저장 폴더
 
+# 사용 가능한 업데이트 목록 캐시 유지 시간(초)
+AVAILABLE_UPDATES_TTL = float(os.getenv("AVAILABLE_UPDATES_TTL", 10))
+
+# 리스너가 구독하는 컨트랙트 이벤트 (수신 시 사용 가능한 업데이트 캐시 무효화)
+AVAILABILITY_EVENTS = ("UpdateRegistered", "UpdateDelivered", "UpdateInstalled")
+# 중복 수신 제거를 위해 기억하는 최근 로그 수
+SEEN_LOG_CACHE_SIZE = 1024
+# 가스 추정이 실패했을 때 사용할 가스 한도 (환불·설치 확인)
+GAS_FALLBACK_LIMIT = int(os.getenv("GAS_FALLBACK_LIMIT", 200000))
+
 class IoTDeviceClient:
     """IoT 기기 소프트웨어 업데이트 클라이언트"""
 
-    def __init__(self, device_id, model, serial, version, notification_callback=None):
-        """IoT 클라이언트 초기화"""
+    def __init__(self, device_id, model, serial, version, notification_callback=None, tx_status_callback=None):
+        """
+        IoT 클라이언트 초기화
+        :param tx_status_callback: 트랜잭션 상태(pending/success/failed/timeout)가 바뀔 때 호출할 함수
+        """
         # 장치 속성 설정
         self.device_id = device_id
         self.attributes = {"model": model, "serial": serial, "version": version}
@@ -63,6 +107,17 @@ class IoTDeviceClient:
         # Web3 연결
         self.web3_http = Web3(Web3.HTTPProvider(self.web3_http_provider)) # API 조회용
         self.web3_socket = None # WebSocket 연결용
+        # 조회 배치 전용 provider + 블록 헤더 LRU 캐시 (호출 간 유지)
+        self.rpc_batcher = RPCBatcher(self.web3_http_provider)
+        self.block_headers = BlockHeaderCache(self.rpc_batcher)
+        # 조회 묶음 실행기 (Multicall3 또는 JSON-RPC 배치)
+        self.reader = ReadAggregator(self.rpc_batcher)
+        # 수수료(feeHistory)·함수별 가스 추정치 TTL 캐시
+        self.gas_oracle = GasOracle(self.rpc_batcher)
+        # 트랜잭션 파이프라인 (chain_id 캐시, 로컬 nonce 관리, 영수증 백그라운드 폴링)
+        self.tx_manager = TransactionManager(
+            self.web3_http, self.owner_address, self.owner_private_key, status_callback=tx_status_callback
+        )
 
         # 연결 확인
         try:
@@ -79,15 +134,43 @@ class IoTDeviceClient:
         self.cpabe = CPABETools()
         self.group = self.cpabe.get_group()
 
+        # 역직렬화된 키 캐시 (키 파일이 바뀐 경우에만 다시 로드)
+        self.public_key = None
+        self.device_secret_key = None
+        self.key_cache = CPABEKeyCache(
+            self.cpabe,
+            os.path.join(KEY_DIR, "public_key.bin"),
+            os.path.join(KEY_DIR, "device_secret_key_file.bin"),
+        )
+
         # 레지스트리 및 컨트랙트 객체
         self.contract_http = None
         self.contract_socket = None
 
+        # 컨트랙트 이벤트 로컬 색인 및 topic0 → 이벤트 이름 (컨트랙트 로드 후 생성)
+        self.event_store = None
+        self.event_topics = {}
+
+        # 로그 구독 감독자 (listen_for_updates에서 생성) 및 중복 수신 제거용 최근 로그
+        self.listener = None
+        self._seen_logs = OrderedDict()
+
+        # 사용 가능한 업데이트 목록 캐시 (TTL + 이벤트 기반 무효화, 동시 요청은 RPC 1회로 합침)
+        self.available_updates = SingleFlightCache(
+            self._fetch_available_updates, AVAILABLE_UPDATES_TTL, name="available_updates"
+        )
+
+        # IPFS 다운로더 (세션 풀·헬스체크 캐시·로컬 캐시를 설치 간 공유)
+        self.ipfs_downloader = IPFSDownloader()
+
         # 업데이트 폴더 설정
         self.update_dir = os.path.join(os.path.dirname(__file__), "updates")
         if not os.path.exists(self.update_dir):
             os.makedirs(self.update_dir)
 
+        # uid별 설치 진행 상태 저널 (중단된 설치를 마지막 완료 단계부터 재개)
+        self.install_journal = InstallJournal()
+
         logger.info(
             f"IoT 디바이스 클라이언트 초기화 완료 - 기기 ID: {device_id}, 모델: {model}"
         )
@@ -111,25 +194,9 @@ class IoTDeviceClient:
         await self._load_contract()
 
     def _load_keys(self):
-        """CP-ABE 키 로드"""
+        """CP-ABE 키 로드 (캐시 사용: 키 파일이 바뀐 경우에만 다시 역직렬화)"""
         try:
-            key_dir = os.path.join(os.path.dirname(__file__), "keys")
-            logger.info(f"폴더 이름: {KEY_DIR}")
-
-            # 키 로드
-            if os.path.exists(os.path.join(KEY_DIR , "public_key.bin")):
-                # 제조사로부터 받은 공개키 로드
-                public_key_file = os.path.join(KEY_DIR, "public_key.bin")
-                self.public_key = self.cpabe.load_public_key(public_key_file)
-                logger.info("공개키 로드 완료")
-            else:
-                logger.warning("공개키를 찾을 수 없습니다. 제조사로부터 받아야 합니다.")
-
-            # 개인키 로드
-            device_secret_key_file = os.path.join(KEY_DIR, "device_secret_key_file.bin")
-            self.device_secret_key = self.cpabe.load_device_secret_key(device_secret_key_file)
-            logger.info("기기 비밀키 로드 완료")  # SKd (Device secret key) loaded (value not logged)
-
+            self.public_key, self.device_secret_key = self.key_cache.get()
         except Exception as e:
             logger.error(f"키 로드 중 오류 발생: {e}")
 
@@ -160,13 +227,14 @@ class IoTDeviceClient:
                 abi=registry_abi
             )
             
-            # 3. 레지스트리에서 업데이트 컨트랙트 정보 가져오기
-            update_contract_address = registry_contract_http.functions.getContractAddress(
-                "SoftwareUpdateContract"
-            ).call()
-            update_abi_json = registry_contract_http.functions.getAbi(
-                "SoftwareUpdateContract"
-            ).call()
+            # 3. 레지스트리에서 업데이트 컨트랙트 정보 가져오기 (주소·ABI를 한 번의 조회로)
+            update_contract_address, update_abi_json = self.reader.read([
+                registry_contract_http.functions.getContractAddress("SoftwareUpdateContract"),
+                registry_contract_http.functions.getAbi("SoftwareUpdateContract"),
+            ])
+            for result in (update_contract_address, update_abi_json):
+                if isinstance(result, Exception):
+                    raise result
             contract_abi = json.loads(update_abi_json)
 
             if not isinstance(contract_abi, list):
@@ -182,13 +250,29 @@ class IoTDeviceClient:
                     abi=contract_abi
                 )
                 
-                self.contract_socket = self.web3_socket.eth.contract(
-                    address=update_contract_address,
-                    abi=contract_abi
-                )
+                # WebSocket 연결 실패 시에는 리스너가 재연결하면서 바인딩
+                if self.web3_socket is not None:
+                    self.contract_socket = self.web3_socket.eth.contract(
+                        address=update_contract_address,
+                        abi=contract_abi
+                    )
                 
                 logger.info(f"스마트 컨트랙트 로드 완료 - 업데이트 컨트랙트 주소: {update_contract_address}")
 
+                # 리스너가 수신한 로그를 이벤트 이름으로 구분하기 위한 topic0 매핑
+                self.event_topics = {
+                    HexBytes(event_abi_to_log_topic(abi)): abi["name"]
+                    for abi in contract_abi
+                    if abi.get("type") == "event"
+                }
+
+                # 이력 조회용 이벤트 색인 (마지막 처리 블록 이후만 증분 동기화, 밀린 구간은 백그라운드에서 백필)
+                try:
+                    self.event_store = EventStore(self.web3_http, self.contract_http, headers=self.block_headers)
+                    self.event_store.start_sync()
+                except Exception as e:
+                    logger.warning(f"이벤트 색인 초기화 실패 (이력 조회 불가): {e}")
+
             except Exception as e:
                 logger.error(f"컨트랙트 객체 생성 실패: {e}")
                 raise Exception(f"컨트랙트 객체 생성에 실패했습니다: {e}")
@@ -198,142 +282,177 @@ class IoTDeviceClient:
             raise Exception(f"컨트랙트 로드에 실패했습니다: {e}")
 
     async def listen_for_updates(self):
-            logger.info("[listen_for_updates] 업데이트 이벤트 리스너 시작")
+        """
+        컨트랙트 로그 구독 (컨트랙트 주소 + 관심 이벤트 topic으로 필터)
+        - 블록마다 조회하지 않고, 해당 이벤트 로그가 발생했을 때만 노드가 전달
+        - 재연결(지수 백오프), 하트비트, 수신/처리 큐, 체크포인트 기반 누락 로그 재처리는
+          SupervisedLogListener가 담당하며 반환되지 않음
+        """
+        logger.info("[listen_for_updates] 업데이트 이벤트 리스너 시작")
+        self.listener = SupervisedLogListener(self)
+        await self.listener.run()
 
+    async def _connect_socket(self):
+        """WebSocket 연결을 새로 만들고 소켓용 컨트랙트 객체를 다시 바인딩 (리스너 재연결용)"""
+        if self.web3_socket is not None:
             try:
-                if not await self.web3_socket.is_connected():
-                    raise Exception("WebSocket 연결이 되어있지 않습니다")
-
-                # 새 블록 구독
-                subscription_id = await self.web3_socket.eth.subscribe("newHeads")
-                logger.info(f"[listen_for_updates] 블록 구독 시작 (ID: {subscription_id})")
-
-                # 새 블록 수신 루프
-                async for response in self.web3_socket.socket.process_subscriptions():
-                    block_hash = response["result"]["hash"]
-                    await self.check_for_updates_in_block(block_hash)
+                await self.web3_socket.provider.disconnect()
+            except Exception:
+                pass
+        self.web3_socket = await AsyncWeb3(AsyncWeb3.WebSocketProvider(self.web3_socket_provider))
+        self.contract_socket = self.web3_socket.eth.contract(
+            address=self.contract_http.address,
+            abi=self.contract_http.abi
+        )
+        logger.info(f"[connect_socket] WebSocket 재연결 완료: {self.web3_socket_provider}")
 
-            except Exception as e:
-                logger.error(f"[listen_for_updates] WebSocket 이벤트 리스너 오류: {e}")
+    def _log_filter(self):
+        """구독/조회 공통 로그 필터 (컨트랙트 주소 + AVAILABILITY_EVENTS topic0 중 하나)"""
+        topics = [topic for topic, name in self.event_topics.items() if name in AVAILABILITY_EVENTS]
+        return {"address": self.contract_socket.address, "topics": [topics]}
 
-    async def check_for_updates_in_block(self, block_hash):
-        """해당 블록에 UpdateRegistered 이벤트가 포함돼 있는지 확인하고 처리"""
+    async def handle_contract_log(self, log):
+        """구독/누락 구간 재처리로 받은 컨트랙트 로그 처리 (캐시 무효화 + UpdateRegistered 알림)"""
         try:
-            # 블록 정보 가져오기
-            block = await self.web3_socket.eth.get_block(block_hash)
-            block_number = block["number"]
-            logger.info(f"[check_for_updates_in_block] 블록 #{block_number} 확인 중...")
-
-            # 디버깅: 블록 정보 출력
-            logger.debug(f"[check_for_updates_in_block] 블록 해시: {block_hash}")
-            logger.debug(f"[check_for_updates_in_block] 블록 전체 정보: {block}")
-
-            # 이벤트 시그니처 필터 없이 address만으로 로그 조회 (디버깅 목적)
-            logs = await self.web3_socket.eth.get_logs({
-                "from_block": block_number,
-                "to_block": block_number,
-                "address": self.contract_socket.address
-            })
-
-            logger.debug(f"[check_for_updates_in_block] get_logs 결과: {logs}")
-
-            if not logs:
-                logger.info(f"[check_for_updates_in_block] 이벤트 없음 (Block #{block_number})")
+            # 재처리와 구독이 같은 로그를 중복 전달할 수 있으므로 (블록 해시, 로그 인덱스, 제거 여부)로 제거
+            # - 이미 받은 로그가 체인 재구성으로 제거(removed)되면 같은 위치라도 다른 키로 처리
+            # - 반대 상태의 키는 지워 제거 후 다시 포함되는 경우도 처리
+            removed = bool(log.get("removed"))
+            position = (HexBytes(log["blockHash"]).hex(), log["logIndex"])
+            log_key = position + (removed,)
+            if log_key in self._seen_logs:
+                return
+            self._seen_logs.pop(position + (not removed,), None)
+            self._seen_logs[log_key] = True
+            while len(self._seen_logs) > SEEN_LOG_CACHE_SIZE:
+                self._seen_logs.popitem(last=False)
+
+            block_number = log["blockNumber"]
+
+            event_name = self.event_topics.get(HexBytes(log["topics"][0])) if log["topics"] else None
+            if event_name in AVAILABILITY_EVENTS:
+                self.available_updates.invalidate(f"{event_name} 이벤트 (Block #{block_number})")
+            if removed:
+                logger.info(f"[handle_contract_log] 체인 재구성으로 제거된 로그 (Block #{block_number})")
+                return
+            if event_name != "UpdateRegistered":
                 return
 
-            # ABI 이벤트 디코딩
-            for log in logs:
-                try:
-                    decoded_event = self.contract_socket.events.UpdateRegistered().process_log(log)
-                    uid = decoded_event["args"]["uid"]
-                    version = decoded_event["args"]["version"]
-                    description = decoded_event["args"]["description"]
-
-                    logger.info(f"[이벤트 감지] uid={uid}, version={version}")
+            decoded_event = self.contract_socket.events.UpdateRegistered().process_log(log)
+            uid = decoded_event["args"]["uid"]
+            version = decoded_event["args"]["version"]
+            description = decoded_event["args"]["description"]
 
-                    if self.notification_callback:
-                        self.notification_callback(
-                            uid.hex() if isinstance(uid, bytes) else str(uid),
-                            version,
-                            description
-                        )
+            logger.info(f"[이벤트 감지] uid={uid}, version={version}")
 
-                except Exception as decode_err:
-                    logger.warning(f"[check_for_updates_in_block] 로그 디코딩 실패: {decode_err}")
+            if self.notification_callback:
+                self.notification_callback(
+                    uid.hex() if isinstance(uid, bytes) else str(uid),
+                    version,
+                    description
+                )
 
         except Exception as e:
-            logger.error(f"[check_for_updates_in_block] 블록 이벤트 조회 실패: {e}")
-            
-    
+            logger.warning(f"[handle_contract_log] 로그 처리 실패: {e}")
+
     def check_for_updates_http(self, from_block=0, to_block="latest"):
         """
         [API용] Flask 등에서 "/api/device/updates" 조회 시 사용
         - self.contract_api (HTTP)로 동기 호출
         - 이벤트 WebSocket과 충돌 없이 조회
+        - 결과는 AVAILABLE_UPDATES_TTL 동안 캐시하며, 관련 이벤트 수신 또는 구매/환불/설치 후 무효화
         """
-        logger.info("[check_for_updates_http] 사용 가능한 업데이트(미설치/미환불) 목록 조회 (getAvailableUpdatesForOwner)")
-        updates = []
         try:
-            # getAvailableUpdatesForOwner를 한 번만 호출하여 모든 정보 배열을 가져옴
-            result = self.contract_http.functions.getAvailableUpdatesForOwner().call({'from': self.owner_address})
-            # 반환값: (uids, ipfsHashes, encryptedKeys, hashOfUpdates, descriptions, prices, versions, isValids)
-            (
-                uids,
-                ipfs_hashes,
-                encrypted_keys,
-                hash_of_updates,
-                descriptions,
-                prices,
-                versions,
-                is_valids
-            ) = result
-            logger.info(f"[check_for_updates_http] 사용 가능한 업데이트 UID: {uids}")
-
-            for i in range(len(uids)):
-                if not is_valids[i]:
-                    continue
-                update = {
-                    "uid": uids[i],
-                    "ipfsHash": ipfs_hashes[i],
-                    "encryptedKey": base64.b64encode(encrypted_keys[i]).decode() if encrypted_keys[i] else "",
-                    "hashOfUpdate": hash_of_updates[i],
-                    "description": descriptions[i],
-                    "price": prices[i],
-                    "version": versions[i]
-                }
-                updates.append(update)
-            # 최신 등록순(최근 것이 위로)으로 반환
-            updates.reverse()
+            # 캐시된 목록은 공유되므로 호출자별 사본 반환
+            return [dict(update) for update in self.available_updates.get()]
         except Exception as e:
             logger.error(f"[check_for_updates_http] 업데이트 확인 실패: {e}")
+            return []
+
+    def _fetch_available_updates(self):
+        """getAvailableUpdatesForOwner 조회 → 업데이트 목록 (available_updates 캐시의 loader)"""
+        logger.info("[check_for_updates_http] 사용 가능한 업데이트(미설치/미환불) 목록 조회 (getAvailableUpdatesForOwner)")
+        # getAvailableUpdatesForOwner를 한 번만 호출하여 모든 정보 배열을 가져옴 (msg.sender 기준 조회)
+        (result,) = self.reader.read(
+            [self.contract_http.functions.getAvailableUpdatesForOwner()], sender=self.owner_address
+        )
+        if isinstance(result, Exception):
+            raise result
+        return self._parse_available_updates(result)
+
+    @staticmethod
+    def _parse_available_updates(result):
+        """getAvailableUpdatesForOwner 반환값 → 업데이트 목록 (최신 등록순)"""
+        updates = []
+        # 반환값: (uids, ipfsHashes, encryptedKeys, hashOfUpdates, descriptions, prices, versions, isValids)
+        (
+            uids,
+            ipfs_hashes,
+            encrypted_keys,
+            hash_of_updates,
+            descriptions,
+            prices,
+            versions,
+            is_valids
+        ) = result
+        logger.info(f"[check_for_updates_http] 사용 가능한 업데이트 UID: {uids}")
+
+        for i in range(len(uids)):
+            if not is_valids[i]:
+                continue
+            update = {
+                "uid": uids[i],
+                "ipfsHash": ipfs_hashes[i],
+                "encryptedKey": base64.b64encode(encrypted_keys[i]).decode() if encrypted_keys[i] else "",
+                "hashOfUpdate": hash_of_updates[i],
+                "description": descriptions[i],
+                "price": prices[i],
+                "version": versions[i]
+            }
+            updates.append(update)
+        # 최신 등록순(최근 것이 위로)으로 반환
+        updates.reverse()
         return updates
 
-    def purchase_update(self, uid, price):
-        """업데이트 구매"""
+    def purchase_update(self, uid, price, wait=True):
+        """
+        업데이트 구매
+        :param wait: False면 영수증을 기다리지 않고 전송 직후 반환 (tx_id로 상태 조회, 결과는 tx_status_callback으로 알림)
+        """
         try:
+            # 업데이트 정보·잔액·가스 추정(구매 가능 여부 사전 확인 겸)을 한 번의 배치로 조회
+            purchase_function = self.contract_http.functions.purchaseUpdate(uid)
+            update_info, balance, gas_estimate = self.reader.read([
+                self.contract_http.functions.getUpdateInfo(uid),
+                lambda w3: w3.eth.get_balance(self.owner_address),
+                lambda w3: self.rpc_batcher.rebind(purchase_function).estimate_gas({
+                    "from": self.owner_address,
+                    "value": price,
+                }),
+            ])
+            for result in (update_info, balance):
+                if isinstance(result, Exception):
+                    raise result
+
             # 업데이트의 실제 가격 확인
-            update_info = self.contract_http.functions.getUpdateInfo(uid).call()
             actual_price = update_info[4]
             
             logger.info(f"업데이트의 실제 가격: {actual_price} wei")
             logger.info(f"전달받은 가격: {price} wei")
             
-            # 가격을 정확한 값으로 설정
-            price = actual_price
-
-            # 가스 가격 명시 (EIP-1559 피하기 위해 legacy 방식 사용)
-            gas_price = self.web3_http.to_wei("1", "gwei")
+            # 전달받은 가격이 실제와 다르면 실제 가격으로 다시 추정
+            if price != actual_price:
+                price = actual_price
+                gas_estimate = purchase_function.estimate_gas({"from": self.owner_address, "value": price})
+            elif isinstance(gas_estimate, Exception):
+                raise gas_estimate
 
-            # 가스 추정 (여유 버퍼 포함)
-            gas_estimate = self.contract_http.functions.purchaseUpdate(uid).estimate_gas({
-                "from": self.owner_address,
-                "value": price,
-            })
-            gas_estimate += 10000  # 안전 여유치
+            # 가스 한도(여유 비율 포함)·수수료 (EIP-1559 지원 체인이면 maxFeePerGas, 아니면 gasPrice)
+            gas_limit = self.gas_oracle.record(purchase_function, gas_estimate)
+            fees = self.gas_oracle.fees()
 
             # 잔액 확인
-            balance = self.web3_http.eth.get_balance(self.owner_address)
-            total_cost = price + (gas_estimate * gas_price)
+            total_cost = price + (gas_limit * self.gas_oracle.max_fee_per_gas(fees))
 
             if balance < total_cost:
                 error_msg = f"계정 잔액이 부족합니다. 필요: {total_cost} wei, 보유: {balance} wei"
@@ -342,27 +461,19 @@ class IoTDeviceClient:
 
             logger.info(f"업데이트 구매 시작 - UID: {uid}, 가격: {price} wei")
 
-            # 트랜잭션 구성
-            txn = self.contract_http.functions.purchaseUpdate(uid).build_transaction(
-                {
-                    "chainId": self.web3_http.eth.chain_id,
-                    "gas": gas_estimate,
-                    "gasPrice": gas_price,
-                    "nonce": self.web3_http.eth.get_transaction_count(self.owner_address),
-                    "value": price,
-                }
-            )
-
-            # 서명 및 전송
-            signed_txn = self.web3_http.eth.account.sign_transaction(
-                txn, private_key=self.owner_private_key
+            # 트랜잭션 구성·서명·전송 (chainId, nonce는 TransactionManager가 채움)
+            record = self._send_transaction(
+                "purchase",
+                uid,
+                purchase_function,
+                {"gas": gas_limit, "value": price, **fees},
+                wait=wait,
             )
-            tx_hash = self.web3_http.eth.send_raw_transaction(signed_txn.raw_transaction)
-            tx_receipt = self.web3_http.eth.wait_for_transaction_receipt(tx_hash)
-
-            logger.info(f"업데이트 구매 완료 - TX 해시: {tx_hash.hex()}")
+            if record["status"] == STATUS_PENDING:
+                return {"tx_hash": record["tx_hash"], "tx_id": record["id"], "success": True, "pending": True}
 
-            return {"tx_hash": tx_hash.hex(), "success": tx_receipt.status == 1}
+            logger.info(f"업데이트 구매 완료 - TX 해시: {record['tx_hash']}")
+            return {"tx_hash": record["tx_hash"], "tx_id": record["id"], "success": record["status"] == STATUS_SUCCESS}
 
         except Exception as e:
             logger.error(f"업데이트 구매 실패: {e}")
@@ -372,157 +483,401 @@ class IoTDeviceClient:
         """업데이트 환불 시도"""
         try:
             refund_time = int(time.time())  # 환불 시각(유닉스 타임스탬프)
-            txn = self.contract_http.functions.refundOnNotMatch(uid).build_transaction({
-                "chainId": self.web3_http.eth.chain_id,
-                "gas": 200000,
-                "gasPrice": self.web3_http.eth.gas_price,
-                "nonce": self.web3_http.eth.get_transaction_count(self.owner_address),
-            })
-            signed_txn = self.web3_http.eth.account.sign_transaction(txn, private_key=self.owner_private_key)
-            tx_hash = self.web3_http.eth.send_raw_transaction(signed_txn.raw_transaction)
-            tx_receipt = self.web3_http.eth.wait_for_transaction_receipt(tx_hash)
-            logger.info(f"환불 트랜잭션 완료 - TX 해시: {tx_hash.hex()}")
+            record = self._send_transaction(
+                "refund",
+                uid,
+                self.contract_http.functions.refundOnNotMatch(uid),
+            )
+            logger.info(f"환불 트랜잭션 완료 - TX 해시: {record['tx_hash']}")
             return {
-                "tx_hash": tx_hash.hex(),
-                "success": tx_receipt.status == 1,
+                "tx_hash": record["tx_hash"],
+                "success": record["status"] == STATUS_SUCCESS,
                 "refundedAt": refund_time  # 환불 시각 포함
             }
         except Exception as e:
             logger.error(f"환불 실패: {e}")
             return {"success": False, "message": str(e)}
 
-    def download_update(self, update_info):
-        """업데이트 다운로드 및 설치 - 논문 로직에 맞춰 개선 (오류 발생 시 환불 시도)"""
-        try:   
-            # 키 로드
-            self._load_keys()
-            
-            logger.info(f"업데이트 다운로드 시작 - UID: {update_info['uid']}")
+    def download_update(self, update_info, aes_key=None):
+        """
+        업데이트 다운로드 및 설치 - 논문 로직에 맞춰 개선 (오류 발생 시 환불 시도)
+        - 새 설치는 대칭키를 먼저 복호화한 뒤 다운로드 → 해시 검증 → 복호화를 한 번의 스트림으로 처리하고
+          file-decrypted 단계부터 저널에 기록
+        - 저널이 남아 있는 설치(downloaded → verified → key-decrypted → file-decrypted)는
+          마지막으로 완료한 단계 다음부터 진행 (로컬에 저장된 암호문을 다시 읽음)
+        :param aes_key: decrypt_update_keys()로 미리 복호화한 대칭키 (주어지면 CP-ABE 단계 생략)
+        """
+        uid = update_info["uid"]
+        try:
+            logger.info(f"업데이트 다운로드 시작 - UID: {uid}")
+            record = self.install_journal.resume(update_info)
+
+            if record is None:
+                # 1. CP-ABE로 암호화된 대칭키(Ec) 복호화하여 대칭키(kbj) 획득
+                #    (다운로드 스트림을 받는 즉시 복호화하기 위해 먼저 수행)
+                if aes_key is None:
+                    aes_key = self.decrypt_aes_key(update_info)
+                else:
+                    logger.info("미리 복호화된 대칭키 사용 (CP-ABE 복호화 생략)")
+                # 2~4. IPFS 스트리밍 다운로드 + SHA-3 해시 검증 + AES 복호화 (단일 패스)
+                record = self.stream_update(update_info, aes_key)
+            else:
+                # 1~4. 중단된 설치: 남은 단계만 진행
+                record = self.fetch_update(update_info, record)
+                record = self.decrypt_update_key(record, aes_key)
+                record = self.decrypt_update_file(record)
+            # 5~6. 업데이트 설치 및 블록체인에 설치 완료 내역 기록
+            return self.complete_installation(record)
+
+        except InstallStageError as e:
+            logger.error(f"업데이트 설치 실패 - UID: {uid}: {e}")
+            return self.abort_installation(uid, str(e))
+        except Exception as e:
+            logger.error(f"업데이트 다운로드 또는 설치 실패: {e}")
+            return self.abort_installation(uid, f"업데이트 설치 실패: {e}")
 
-            uid = update_info["uid"]
-            ipfs_hash = update_info["ipfsHash"]
-            encrypted_key = update_info["encryptedKey"]
-            # 1. base64 decode
-            encrypted_key_bytes = base64.b64decode(encrypted_key)
-            # 2. bytes → JSON 문자열
-            encrypted_key_json = encrypted_key_bytes.decode("utf-8")
-            hash_of_update = update_info["hashOfUpdate"]
+    def stream_update(self, update_info, aes_key):
+        """
+        암호화된 업데이트 파일을 스트리밍으로 받으면서 해시 검증·복호화(file-decrypted) → 저널 기록
+        - 암호문을 로컬에 저장하지 않으므로 중간에 중단되면 처음부터 다시 진행
+        """
+        uid = update_info["uid"]
+        ipfs_hash = update_info["ipfsHash"]
+        hash_of_update = update_info["hashOfUpdate"]
+        try:
+            logger.info(f"IPFS에서 암호화된 파일 스트리밍 시작: {ipfs_hash}")
+            file_name, chunks = self.ipfs_downloader.open_stream(ipfs_hash, expected_hash=hash_of_update)
+        except Exception as e:
+            logger.error(f"업데이트 다운로드 실패: {e}")
+            raise InstallStageError(f"다운로드 실패: {e}")
 
-            # 1. IPFS에서 암호화된 업데이트 파일(Es) 다운로드
-            ipfs_downloader = IPFSDownloader()
+        try:
+            calculated_hash, decrypted_bj = self._stream_verify_and_decrypt(
+                chunks, aes_key, hash_of_update, self.decrypted_output_path(uid, file_name)
+            )
+        except ConnectionError as e:
+            logger.error(f"업데이트 다운로드 실패: {e}")
+            raise InstallStageError(f"다운로드 실패: {e}")
+        except Exception as e:
+            logger.error(f"업데이트 파일 복호화 실패: {e}")
+            raise InstallStageError(f"업데이트 파일 복호화 실패: {e}")
+
+        # SHA-3 해시 검증 결과 확인 (불일치 시 평문은 확정되지 않고 폐기됨)
+        if decrypted_bj is None:
+            logger.error(f"해시 검증 실패: 계산된 해시 {calculated_hash} != 기대 해시 {hash_of_update}")
+            if self.ipfs_downloader.cache:
+                # 손상된 캐시 항목이 재시도에 다시 쓰이지 않도록 제거
+                self.ipfs_downloader.cache.evict(ipfs_hash)
+            raise InstallStageError("업데이트 파일 해시 검증 실패")
+
+        logger.info(f"decrypted_bj 업데이트 파일 복호화 성공: {decrypted_bj}")
+        return self.install_journal.advance(
+            uid, STAGE_FILE_DECRYPTED, update=update_info, fileName=file_name, outputPath=decrypted_bj
+        )
 
+    def fetch_update(self, update_info, record=None):
+        """암호화된 업데이트 파일 다운로드(downloaded) 및 해시 검증(verified) → 저널 기록"""
+        uid = update_info["uid"]
+        if not reached(record, STAGE_DOWNLOADED):
+            ipfs_hash = update_info["ipfsHash"]
+            encrypted_path = os.path.join(self.update_dir, f".{uid}.download")
             try:
                 logger.info(f"IPFS에서 암호화된 파일 다운로드 시작: {ipfs_hash}")
-                update_file_path = ipfs_downloader.download_file(ipfs_hash, self.update_dir, uid)
-                if not update_file_path:
-                    refund_result = self.refund_update(uid)
-                    return {
-                        "success": False,
-                        "message": "업데이트 파일 다운로드에 실패했습니다",
-                        "refund": refund_result
-                    }
+                file_name, chunks = self.ipfs_downloader.open_stream(
+                    ipfs_hash, expected_hash=update_info["hashOfUpdate"]
+                )
+                calculated_hash = self._store_encrypted_stream(chunks, encrypted_path)
             except Exception as e:
                 logger.error(f"업데이트 다운로드 실패: {e}")
-                refund_result = self.refund_update(uid)
-                return {"success": False, "message": f"다운로드 실패: {e}", "refund": refund_result}
-
-            # 다운로드된 파일 검증
-            if not os.path.exists(update_file_path):
-                logger.info("다운로드된 파일이 없습니다.")
-            elif os.path.getsize(update_file_path) == 0:
-                logger.info("다운로드된 파일 크기가 0입니다.")
-            else:
-                logger.info(f"다운로드된 파일 크기: {os.path.getsize(update_file_path)} bytes")
-
-            # 파일 내용 일부 출력
-            with open(update_file_path, "rb") as file:
-                file_content = file.read(64)
+                raise InstallStageError(f"다운로드 실패: {e}")
+
+            record = self.install_journal.advance(
+                uid,
+                STAGE_DOWNLOADED,
+                update=update_info,
+                fileName=file_name,
+                encryptedPath=encrypted_path,
+                calculatedHash=calculated_hash,
+            )
 
-            logger.info(f"다운로드된 파일 내용 (처음 64바이트): {file_content.hex()}")
-            logger.info(f"원본 텍스트 (일부): {file_content[:64].decode(errors='ignore')}")
+        if not reached(record, STAGE_VERIFIED):
+            hash_of_update = update_info["hashOfUpdate"]
+            if record["calculatedHash"] != hash_of_update:
+                logger.error(f"해시 검증 실패: 계산된 해시 {record['calculatedHash']} != 기대 해시 {hash_of_update}")
+                if self.ipfs_downloader.cache:
+                    # 손상된 캐시 항목이 재시도에 다시 쓰이지 않도록 제거
+                    self.ipfs_downloader.cache.evict(update_info["ipfsHash"])
+                raise InstallStageError("업데이트 파일 해시 검증 실패")
+            logger.info("해시 검증 성공")
+            record = self.install_journal.advance(uid, STAGE_VERIFIED)
+        return record
 
-            logger.info(f"업데이트 파일 다운로드 완료 - 경로: {update_file_path}")
+    def decrypt_update_key(self, record, aes_key=None):
+        """CP-ABE 대칭키 복호화(key-decrypted) → 저널 기록 (aes_key가 주어지면 CP-ABE 생략)"""
+        if reached(record, STAGE_KEY_DECRYPTED):
+            return record
 
-            # 2. SHA-3 해시 검증
-            logger.info("암호화된 파일 해시 검증 시작")
-            calculated_hash = HashTools.sha3_hash_file(update_file_path)
-            if calculated_hash != hash_of_update:
-                logger.error(f"해시 검증 실패: 계산된 해시 {calculated_hash} != 기대 해시 {hash_of_update}")
-                os.remove(update_file_path)
-                refund_result = self.refund_update(uid)
-                return {"success": False, "message": "업데이트 파일 해시 검증 실패", "refund": refund_result}
+        if aes_key is not None:
+            logger.info("미리 복호화된 대칭키 사용 (CP-ABE 복호화 생략)")
+        else:
+            aes_key = self.decrypt_aes_key(record["update"])
 
-            logger.info("해시 검증 성공")
+        return self.install_journal.advance(
+            record["uid"], STAGE_KEY_DECRYPTED, aesKey=base64.b64encode(aes_key).decode("ascii")
+        )
 
-            
-            # 3. CP-ABE로 암호화된 대칭키(Ec) 복호화하여 대칭키(kbj) 획득
-            try:
-                # logger.info(f"디바이스 속성 (SKd): {[s.strip() for s in self.device_secret_key['S']]}")
-                logger.info(f"디바이스 secret 속성(SKd) 사용 (총 {len(self.device_secret_key['S'])}개)")
-                
-                # 복호화된 대칭키 확인
-                decrypted_kbj = self.decrypt_cpabe(encrypted_key_json, self.public_key, self.device_secret_key)
-                logger.info(f"복호화된 kbj: {decrypted_kbj}, 타입: {type(decrypted_kbj)}")
+    def decrypt_aes_key(self, update_info):
+        """CP-ABE로 암호화된 대칭키(Ec) 복호화 → AES 대칭키 (실패 시 InstallStageError)"""
+        try:
+            self._load_keys()
+            # 1. base64 decode → 2. bytes → JSON 문자열
+            encrypted_key_json = base64.b64decode(update_info["encryptedKey"]).decode("utf-8")
+            logger.info(f"디바이스 secret 속성(SKd) 사용 (총 {len(self.device_secret_key['S'])}개)")
 
-                aes_key = sha256(objectToBytes(decrypted_kbj, self.group)).digest()[:32]
-                logger.info(f"복호화된 aes_key: {aes_key}, 타입: {type(aes_key)}")
-            except Exception as e:
-                logger.error(f"대칭키 복호화 실패: {e}")
-                if os.path.exists(update_file_path):
-                    os.remove(update_file_path)
-                refund_result = self.refund_update(uid)
-                return {"success": False, "message": f"대칭키 복호화 실패: {e}", "refund": refund_result}
+            # 복호화된 대칭키 확인
+            decrypted_kbj = self.decrypt_cpabe(encrypted_key_json, self.public_key, self.device_secret_key)
+            logger.info(f"복호화된 kbj: {decrypted_kbj}, 타입: {type(decrypted_kbj)}")
 
-            # 4. 대칭키 aes_key로 업데이트 파일(Es) 복호화하여 원본 업데이트 파일(bj) 획득
-            try:
-                logger.info("대칭키로 업데이트 파일 복호화 시작")
-                decrypted_bj = SymmetricCrypto.decrypt_file(update_file_path, aes_key)
-                logger.info(f"decrypted_bj 업데이트 파일 복호화 성공: {decrypted_bj}")
-                
-                # # 호스트 시스템에서의 실제 경로를 로그로 출력
-                # # host_path = f"/soda/Blocker/sy/{os.path.basename(update_path)}"
-                # host_path = f"/soda/Blocker/sy/{os.path.basename(update_path)}"
-                # logger.info(f"업데이트 파일이 호스트 시스템에 저장됨: {host_path}")
-                
-                # 암호화된 임시 파일 삭제
-                if os.path.exists(update_file_path):
-                    os.remove(update_file_path)
-                    logger.info(f"✅ 암호화된 임시 파일 삭제 완료: {update_file_path}")
-
-                # 복호화된 파일의 저장 경로 로그 출력
-                logger.info(f"업데이트 파일이 호스트 시스템 내부에 저장됨: {decrypted_bj}")
-    
-            except Exception as e:
-                logger.error(f"업데이트 파일 복호화 실패: {e}")
-                if os.path.exists(update_file_path):
-                    os.remove(update_file_path)
-                refund_result = self.refund_update(uid)
-                return {"success": False, "message": f"업데이트 파일 복호화 실패: {e}", "refund": refund_result}
-
-            # 5. 업데이트 설치
-            logger.info(f"업데이트 설치 시작 - 버전: {update_info['version']}")
+            return sha256(objectToBytes(decrypted_kbj, self.group)).digest()[:32]
+        except Exception as e:
+            logger.error(f"대칭키 복호화 실패: {e}")
+            raise InstallStageError(f"대칭키 복호화 실패: {e}")
 
-            # 6. 블록체인에 설치 완료 내역 기록
-            confirmation_result = self.confirm_installation(uid)
-            logger.info(f"설치 확인 메시지 전송 완료: {confirmation_result}")
+    def decrypt_update_file(self, record):
+        """
+        로컬에 저장된 암호화 파일 복호화(file-decrypted) → 저널 기록 (중단된 설치를 재개하거나 일괄 설치에서 사용)
+        - 해시를 다시 확인하면서 복호화하고, 일치할 때만 결과 파일을 확정
+        - 완료 후 저널의 대칭키와 암호화 파일 삭제
+        """
+        if reached(record, STAGE_FILE_DECRYPTED):
+            return record
 
-            # 버전 정보 업데이트
-            old_version = self.attributes["version"]
-            self.attributes["version"] = update_info["version"]
+        uid = record["uid"]
+        hash_of_update = record["update"]["hashOfUpdate"]
+        output_path = self.decrypted_output_path(uid, record["fileName"])
+        try:
+            calculated_hash, decrypted_bj = self._stream_verify_and_decrypt(
+                IPFSDownloader._iter_file(record["encryptedPath"], STREAM_CHUNK_SIZE),
+                base64.b64decode(record["aesKey"]),
+                hash_of_update,
+                output_path,
+            )
+        except Exception as e:
+            logger.error(f"업데이트 파일 복호화 실패: {e}")
+            raise InstallStageError(f"업데이트 파일 복호화 실패: {e}")
+
+        if decrypted_bj is None:
+            # 검증 이후 로컬 파일이 손상된 경우
+            logger.error(f"해시 검증 실패: 계산된 해시 {calculated_hash} != 기대 해시 {hash_of_update}")
+            raise InstallStageError("업데이트 파일 해시 검증 실패")
+
+        logger.info(f"decrypted_bj 업데이트 파일 복호화 성공: {decrypted_bj}")
+        encrypted_path = record["encryptedPath"]
+        record = self.install_journal.advance(
+            uid, STAGE_FILE_DECRYPTED, outputPath=decrypted_bj, aesKey=None, encryptedPath=None
+        )
+        os.remove(encrypted_path)
+        return record
 
+    def complete_installation(self, record):
+        """
+        설치 확인 트랜잭션 전송 → 영수증 확인(confirmed) 후 저널 삭제 및 기기 버전 갱신
+        - 전송 직후 TX 해시를 저널에 기록하고, 재개 시에는 다시 전송하지 않고 그 트랜잭션의 영수증을 확인
+        - 설치 확인이 성공하지 않으면 버전은 그대로 두고 실패(pending) 결과 반환
+          (저널은 file-decrypted로 남아 다음 시도에서 설치 확인부터 재개)
+        """
+        uid = record["uid"]
+        update_info = record["update"]
+
+        # 복호화된 파일의 저장 경로 로그 출력
+        logger.info(f"업데이트 파일이 호스트 시스템 내부에 저장됨: {record['outputPath']}")
+
+        # 5. 업데이트 설치
+        logger.info(f"업데이트 설치 시작 - 버전: {update_info['version']}")
+
+        # 6. 블록체인에 설치 완료 내역 기록
+        if reached(record, STAGE_CONFIRMED):
+            confirmation_result = {"success": True, "tx_hash": record.get("txHash")}
+        else:
+            confirmation_result = None
+            if record.get("confirmTxHash"):
+                confirmation_result = self._resume_confirmation(uid, record["confirmTxHash"])
+            if confirmation_result is None:
+                confirmation_result = self.confirm_installation(
+                    uid, on_submitted=lambda tx_hash: self.install_journal.update(uid, confirmTxHash=tx_hash)
+                )
+            if confirmation_result.get("success"):
+                self.install_journal.advance(uid, STAGE_CONFIRMED, txHash=confirmation_result["tx_hash"])
+            elif confirmation_result.get("status") == STATUS_FAILED:
+                # revert된 트랜잭션은 다음 시도에서 다시 전송
+                self.install_journal.update(uid, confirmTxHash=None)
+
+        if not confirmation_result.get("success"):
+            logger.warning(f"설치 확인 실패 - UID: {uid} (다음 시도에서 설치 확인부터 재개)")
             return {
-                "success": True,
-                "message": f"업데이트 {uid} (버전 {old_version} → {update_info['version']})이(가) 성공적으로 설치되었습니다.",
+                "success": False,
+                "pending": True,
+                "message": f"설치 확인 실패: {confirmation_result.get('message', confirmation_result.get('status'))}",
                 "confirmation": confirmation_result,
             }
 
+        logger.info(f"설치 확인 메시지 전송 완료: {confirmation_result}")
+        self.install_journal.discard(uid)
+
+        # 버전 정보 업데이트
+        old_version = self.attributes["version"]
+        self.attributes["version"] = update_info["version"]
+
+        return {
+            "success": True,
+            "message": f"업데이트 {uid} (버전 {old_version} → {update_info['version']})이(가) 성공적으로 설치되었습니다.",
+            "confirmation": confirmation_result,
+        }
+
+    def _resume_confirmation(self, uid, tx_hash):
+        """
+        중단 전에 전송한 설치 확인 트랜잭션의 영수증 확인 → confirm_installation과 같은 형태의 결과
+        - 노드가 모르는 트랜잭션(누락)이면 저널의 TX 해시를 지우고 None 반환 (다시 전송)
+        """
+        logger.info(f"이전에 전송한 설치 확인 트랜잭션 확인 - UID: {uid}, TX 해시: {tx_hash}")
+        try:
+            receipt = self.web3_http.eth.wait_for_transaction_receipt(
+                tx_hash, timeout=TX_RECEIPT_TIMEOUT, poll_latency=TX_RECEIPT_POLL_INTERVAL
+            )
+        except TimeExhausted:
+            try:
+                self.web3_http.eth.get_transaction(tx_hash)
+            except TransactionNotFound:
+                logger.warning(f"설치 확인 트랜잭션 누락 → 다시 전송 - TX 해시: {tx_hash}")
+                self.install_journal.update(uid, confirmTxHash=None)
+                return None
+            return {"success": False, "tx_hash": tx_hash, "status": STATUS_PENDING, "message": "영수증 대기 중"}
         except Exception as e:
-            logger.error(f"업데이트 다운로드 또는 설치 실패: {e}")
-            refund_result = self.refund_update(update_info["uid"])
-            return {"success": False, "message": f"업데이트 설치 실패: {e}", "refund": refund_result}
+            logger.error(f"설치 확인 영수증 조회 실패: {e}")
+            return {"success": False, "tx_hash": tx_hash, "message": str(e)}
+
+        status = STATUS_SUCCESS if receipt["status"] == 1 else STATUS_FAILED
+        return {"success": status == STATUS_SUCCESS, "tx_hash": tx_hash, "status": status}
+
+    def abort_installation(self, uid, message):
+        """설치 포기: 환불 시도 후 저널 폐기 → 실패 결과"""
+        refund_result = self.refund_update(uid)
+        self.install_journal.discard(uid)
+        return {"success": False, "message": message, "refund": refund_result}
 
-    def confirm_installation(self, uid):
-        """설치 완료 확인 메시지 전송 - 향상된 버전"""
+    def resume_installs(self):
+        """
+        저널에 남은 미완료 설치를 이어서 진행 (재시작 후 호출)
+        - 더 이상 설치 대상이 아닌 업데이트(환불·설치 완료 등)의 저널은 폐기
+        - 컨트랙트 로드 후에 호출해야 하며, 사용 가능한 업데이트 조회가 실패하면 저널을 건드리지 않고 예외 발생
+          (조회 실패를 "설치 대상 없음"으로 오인해 재개할 상태를 지우지 않도록)
+        :return: 설치 결과 목록
+        """
+        records = self.install_journal.pending()
+        if not records:
+            return []
+        if self.contract_http is None:
+            raise RuntimeError("컨트랙트가 로드되지 않아 중단된 설치를 재개할 수 없습니다")
+        available = {update["uid"]: update for update in self.available_updates.get()}
+        results = []
+        for record in records:
+            uid = record["uid"]
+            if uid not in available:
+                logger.info(f"설치 대상이 아닌 업데이트의 저널 폐기 - UID: {uid}")
+                self.install_journal.discard(uid)
+                continue
+            logger.info(f"중단된 설치 재개 - UID: {uid}, 마지막 완료 단계: {record['stage']}")
+            results.append({"uid": uid, **self.download_update(available[uid])})
+        return results
+
+    def decrypted_output_path(self, uid, file_name):
+        """복호화 결과 경로: updates/<uid>.<확장자> 에서 .enc 확장자 복원"""
+        encrypted_name = f"{uid}{IPFSDownloader.restore_extension(file_name)}"
+        return SymmetricCrypto.decrypted_path_for(os.path.join(self.update_dir, encrypted_name))
+
+    def _store_encrypted_stream(self, chunks, path):
+        """
+        암호문 청크 스트림을 path에 저장하면서 SHA3-256 해시 계산
+        - 임시 파일에 기록 후 fsync → os.replace 로 원자적으로 확정
+        :return: 계산된 해시
+        """
+        hasher = hashlib.sha3_256()
+        fd, staging_path = tempfile.mkstemp(
+            prefix=f"{os.path.basename(path)}.", suffix=".part", dir=os.path.dirname(path)
+        )
+        try:
+            with os.fdopen(fd, "wb") as staging:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    staging.write(chunk)
+                staging.flush()
+                os.fsync(staging.fileno())
+            os.replace(staging_path, path)
+        except BaseException:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+        return hasher.hexdigest()
+
+    def _stream_verify_and_decrypt(self, chunks, aes_key, expected_hash, output_path):
+        """
+        암호문 청크 스트림을 한 번만 읽으면서 SHA3-256 해시 계산 + AES-CBC 복호화
+        - 평문은 같은 디렉토리의 임시(staging) 파일에 기록
+        - 해시가 일치할 때만 fsync 후 output_path로 원자적 교체(os.replace)
+        - 메모리 사용량은 청크 크기에 비례 (파일 크기와 무관)
+        :return: (계산된 해시, 확정된 경로 또는 해시 불일치 시 None)
+        """
+        hasher = hashlib.sha3_256()
+        decryptor = CBCStreamDecryptor(aes_key)
+        output_dir = os.path.dirname(output_path)
+        fd, staging_path = tempfile.mkstemp(
+            prefix=f".{os.path.basename(output_path)}.", suffix=".part", dir=output_dir
+        )
+        total_size = 0
+        try:
+            with os.fdopen(fd, "wb") as staging:
+                iterator = iter(chunks)
+                while True:
+                    try:
+                        chunk = next(iterator)
+                    except StopIteration:
+                        break
+                    except Exception as e:
+                        raise ConnectionError(f"다운로드 스트림 중단: {e}") from e
+
+                    total_size += len(chunk)
+                    hasher.update(chunk)
+                    staging.write(decryptor.update(chunk))
+
+                logger.info(f"다운로드된 파일 크기: {total_size} bytes")
+                calculated_hash = hasher.hexdigest()
+                if calculated_hash != expected_hash:
+                    return calculated_hash, None
+
+                staging.write(decryptor.finalize())
+                staging.flush()
+                os.fsync(staging.fileno())
+
+            os.replace(staging_path, output_path)
+            staging_path = None
+
+            # 디렉토리 엔트리까지 디스크에 반영
+            dir_fd = os.open(output_dir, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+            return calculated_hash, output_path
+        finally:
+            if staging_path and os.path.exists(staging_path):
+                os.remove(staging_path)
+
+    def confirm_installation(self, uid, on_submitted=None):
+        """
+        설치 완료 확인 메시지 전송 - 향상된 버전
+        :param on_submitted: 전송 직후(영수증 대기 전) TX 해시를 받아 호출할 함수 (설치 저널 기록용)
+        """
         try:
             logger.info(f"업데이트 설치 확인 메시지 전송 - UID: {uid}")
 
@@ -532,30 +887,18 @@ class IoTDeviceClient:
             # 현재 버전 정보 추가
             current_version = self.attributes["version"]
 
-            # 설치 확인 트랜잭션 구성
-            txn = self.contract_http.functions.confirmInstallation(
-                uid, device_id
-            ).build_transaction(
-                {
-                    "chainId": self.web3_http.eth.chain_id,
-                    "gas": 200000,
-                    "gasPrice": self.web3_http.eth.gas_price,
-                    "nonce": self.web3_http.eth.get_transaction_count(self.owner_address),
-                }
-            )
-
-            # 트랜잭션 서명
-            signed_txn = self.web3_http.eth.account.sign_transaction(
-                txn, private_key=self.owner_private_key
+            # 설치 확인 트랜잭션 구성·서명·전송 후 완료 대기
+            record = self._send_transaction(
+                "confirm",
+                uid,
+                self.contract_http.functions.confirmInstallation(uid, device_id),
+                wait=False,
             )
+            if on_submitted:
+                on_submitted(record["tx_hash"])
+            record = self.tx_manager.wait(record["id"])
 
-            # 트랜잭션 전송
-            tx_hash = self.web3_http.eth.send_raw_transaction(signed_txn.raw_transaction)
-
-            # 트랜잭션 완료 대기
-            tx_receipt = self.web3_http.eth.wait_for_transaction_receipt(tx_hash)
-
-            logger.info(f"설치 확인 메시지 전송 완료 - TX 해시: {tx_hash.hex()}")
+            logger.info(f"설치 확인 메시지 전송 완료 - TX 해시: {record['tx_hash']}")
 
             # 설치 완료 이벤트 기록에 해시, 버전, 시간 등 추가 정보 포함
             installation_record = {
@@ -563,13 +906,14 @@ class IoTDeviceClient:
                 "device_id": device_id,
                 "version": current_version,
                 "timestamp": int(time.time()),
-                "tx_hash": tx_hash.hex(),
+                "tx_hash": record["tx_hash"],
                 "status": "completed",
             }
 
             return {
-                "tx_hash": tx_hash.hex(),
-                "success": tx_receipt.status == 1,
+                "tx_hash": record["tx_hash"],
+                "success": record["status"] == STATUS_SUCCESS,
+                "status": record["status"],
                 "record": installation_record,
             }
 
@@ -593,162 +937,200 @@ class IoTDeviceClient:
             logger.error(f"- device_secret_key: [REDACTED]")
             return None
 
+    def decrypt_update_keys(self, update_infos):
+        """
+        여러 업데이트의 CP-ABE 암호화 대칭키(Ec)를 한 번에 복호화
+        - 동일 암호문 중복 제거, 정책별 그룹화, 프로세스 풀 분산은 CPABETools.decrypt_many가 처리
+        :return: {uid: aes_key 또는 None} (download_update의 aes_key 인자로 전달)
+        """
+        self._load_keys()
+        uids = []
+        encrypted_keys = []
+        aes_keys = {}
+        for update_info in update_infos:
+            uid = update_info["uid"]
+            try:
+                encrypted_keys.append(base64.b64decode(update_info["encryptedKey"]).decode("utf-8"))
+                uids.append(uid)
+            except Exception as e:
+                logger.error(f"암호화된 대칭키 디코딩 실패 - UID: {uid}: {e}")
+                aes_keys[uid] = None
+
+        decrypted = self.cpabe.decrypt_many(encrypted_keys, self.public_key, self.device_secret_key)
+        for uid, decrypted_kbj in zip(uids, decrypted):
+            if decrypted_kbj is None:
+                logger.error(f"CP-ABE 복호화 실패 - UID: {uid}")
+                aes_keys[uid] = None
+            else:
+                aes_keys[uid] = sha256(objectToBytes(decrypted_kbj, self.group)).digest()[:32]
+        logger.info(f"대칭키 일괄 복호화 완료: {sum(k is not None for k in aes_keys.values())}/{len(aes_keys)}")
+        return aes_keys
+
+    def get_update_infos(self, uids):
+        """getUpdateInfo(uid) 여러 건을 한 번에 조회 (Multicall3/배치) → {uid: 반환값 또는 예외 객체}"""
+        uids = list(dict.fromkeys(uids))
+        if not uids:
+            return {}
+        results = self.reader.read([self.contract_http.functions.getUpdateInfo(uid) for uid in uids])
+        return dict(zip(uids, results))
+
+    def _send_transaction(self, kind, uid, function, tx_params=None, wait=True):
+        """
+        TransactionManager로 트랜잭션 전송 → 트랜잭션 기록
+        - tx_params에 없는 가스 한도·수수료는 GasOracle 캐시에서 채움
+        - 영수증이 확인되면 사용 가능한 업데이트 캐시 무효화 (wait=False여도 백그라운드에서 처리),
+          실패한 트랜잭션이면 해당 함수의 가스 추정치도 폐기
+        :param wait: True면 영수증 확인(또는 시간 초과)까지 대기
+        """
+        tx_params = dict(tx_params or {})
+        if "gas" not in tx_params:
+            tx_params["gas"] = self.gas_oracle.estimate(
+                function, {"from": self.owner_address}, fallback=GAS_FALLBACK_LIMIT
+            )
+        if "gasPrice" not in tx_params and "maxFeePerGas" not in tx_params:
+            tx_params.update(self.gas_oracle.fees())
+
+        def on_complete(done):
+            if done["status"] == STATUS_FAILED:
+                self.gas_oracle.forget(function)
+            self.available_updates.invalidate(f"{kind} 트랜잭션 {done['status']}")
+
+        record = self.tx_manager.submit(
+            lambda params: function.build_transaction({**tx_params, **params}),
+            kind=kind,
+            meta={"uid": uid},
+            on_complete=on_complete,
+        )
+        if wait:
+            record = self.tx_manager.wait(record["id"])
+        return record
+
+    def get_transaction_status(self, tx_id):
+        """전송한 트랜잭션의 현재 상태 (없으면 None)"""
+        return self.tx_manager.get(tx_id)
+
     def get_refunded_updates(self):
         """환불 완료된 업데이트 목록 조회 (중복된 구매 시도도 모두 표시)"""
         try:
             logger.info("[get_refunded_updates] 환불된 업데이트 목록 조회 시작")
 
             # 구매 시도한 UID 목록 (중복 허용)
-            update_uids = self.contract_http.functions.getOwnerUpdates().call({"from": self.owner_address})
+            (update_uids,) = self.reader.read(
+                [self.contract_http.functions.getOwnerUpdates()], sender=self.owner_address
+            )
+            if isinstance(update_uids, Exception):
+                raise update_uids
             logger.info(f"[get_refunded_updates] 전체 구매 시도한 UID 목록: {update_uids}")
 
             # 설치된 UID 목록
             installed_uids = {log["uid"] for log in self.get_update_history()}
             logger.info(f"[get_refunded_updates] 설치된 UID 목록: {installed_uids}")
 
-            # UpdateDelivered 이벤트 조회 및 UID별 타임스탬프 목록 생성
-            purchase_timestamps = {}
+            # UpdateDelivered 이벤트 조회 (로컬 색인에서 owner로 조회)
+            delivered_events = []
             try:
-                delivered_event_filter = self.contract_http.events.UpdateDelivered.create_filter(
-                    from_block=0,
-                    to_block='latest'
+                self.event_store.refresh()
+                delivered_events = self.event_store.query(
+                    "UpdateDelivered", owner=self.web3_http.to_checksum_address(self.owner_address)
                 )
-                delivered_events = delivered_event_filter.get_all_entries()
-                logger.info(f"[get_refunded_updates] UpdateDelivered 이벤트 수: {len(delivered_events)}")
-
-                for event in delivered_events:
-                    try:
-                        owner = event.args.owner
-                        uid = event.args.uid
-                        if owner.lower() != self.web3_http.to_checksum_address(self.owner_address).lower():
-                            continue
-
-                        tx = self.web3_http.eth.get_transaction(event.transactionHash)
-                        timestamp = self.web3_http.eth.get_block(tx.blockNumber).timestamp
-
-                        if uid not in purchase_timestamps:
-                            purchase_timestamps[uid] = []
-                        purchase_timestamps[uid].append(timestamp)
-
-                        logger.info(f"[get_refunded_updates] 타임스탬프 추가 - UID: {uid}, 시각: {timestamp}")
-                    except Exception as e:
-                        logger.warning(f"[get_refunded_updates] 이벤트 처리 중 오류: {e}")
-                        continue
             except Exception as e:
                 logger.error(f"[get_refunded_updates] 이벤트 조회 실패: {e}")
 
-            # 중복 구매된 UID도 모두 환불 이력에 추가
-            refunded_updates = []
-            for uid in update_uids:
-                if uid in installed_uids:
-                    logger.info(f"[get_refunded_updates] 설치된 업데이트 제외: {uid}")
-                    continue
-
-                try:
-                    info = self.contract_http.functions.getUpdateInfo(uid).call()
-                    timestamps = purchase_timestamps.get(uid, [])
-
-                    if not timestamps:
-                        # timestamp 정보가 없더라도 기본 0으로 1회는 추가
-                        update_info = {
-                            "uid": uid,
-                            "description": info[3],
-                            "price": info[4],
-                            "version": info[5],
-                            "purchasedAt": 0
-                        }
-                        refunded_updates.append(update_info)
-                        continue
-
-                    for ts in timestamps:
-                        update_info = {
-                            "uid": uid,
-                            "description": info[3],
-                            "price": info[4],
-                            "version": info[5],
-                            "purchasedAt": ts
-                        }
-                        refunded_updates.append(update_info)
-                        logger.info(f"[get_refunded_updates] 환불 목록에 추가 - UID: {uid}, 구매시각: {ts}")
-                except Exception as e:
-                    logger.warning(f"[get_refunded_updates] UID {uid} 정보 조회 실패: {e}")
-                    continue
-
-            # 타임스탬프 기준 정렬
-            sorted_updates = sorted(refunded_updates, key=lambda x: x["purchasedAt"], reverse=True)
-            logger.info(f"[get_refunded_updates] 정렬된 환불 목록: {[{u['uid']: u['purchasedAt']} for u in sorted_updates]}")
-            return sorted_updates
+            update_infos = self.get_update_infos([uid for uid in update_uids if uid not in installed_uids])
+            return self._refunded_items(update_uids, installed_uids, delivered_events, update_infos)
 
         except Exception as e:
             logger.error(f"[get_refunded_updates] 환불 목록 조회 실패: {e}")
             return []
 
+    @staticmethod
+    def _refunded_items(update_uids, installed_uids, delivered_events, update_infos):
+        """구매 시도 UID·설치된 UID·UpdateDelivered 이벤트·업데이트 상세정보 → 환불 목록 (구매시각 최신순)"""
+        logger.info(f"[get_refunded_updates] UpdateDelivered 이벤트 수: {len(delivered_events)}")
+        purchase_timestamps = {}
+        for event in delivered_events:
+            uid = event["args"]["uid"]
+            timestamp = event["timestamp"]
+            purchase_timestamps.setdefault(uid, []).append(timestamp)
+            logger.info(f"[get_refunded_updates] 타임스탬프 추가 - UID: {uid}, 시각: {timestamp}")
+
+        # 중복 구매된 UID도 모두 환불 이력에 추가
+        refunded_updates = []
+        for uid in update_uids:
+            if uid in installed_uids:
+                logger.info(f"[get_refunded_updates] 설치된 업데이트 제외: {uid}")
+                continue
+
+            try:
+                info = update_infos[uid]
+                if isinstance(info, Exception):
+                    raise info
+                # timestamp 정보가 없더라도 기본 0으로 1회는 추가
+                for ts in purchase_timestamps.get(uid) or [0]:
+                    update_info = {
+                        "uid": uid,
+                        "description": info[3],
+                        "price": info[4],
+                        "version": info[5],
+                        "purchasedAt": ts
+                    }
+                    refunded_updates.append(update_info)
+                    logger.info(f"[get_refunded_updates] 환불 목록에 추가 - UID: {uid}, 구매시각: {ts}")
+            except Exception as e:
+                logger.warning(f"[get_refunded_updates] UID {uid} 정보 조회 실패: {e}")
+                continue
+
+        # 타임스탬프 기준 정렬
+        sorted_updates = sorted(refunded_updates, key=lambda x: x["purchasedAt"], reverse=True)
+        logger.info(f"[get_refunded_updates] 정렬된 환불 목록: {[{u['uid']: u['purchasedAt']} for u in sorted_updates]}")
+        return sorted_updates
 
     def get_update_history(self):
         """설치된 업데이트 이력 조회"""
         try:
             logger.info("[get_update_history] 업데이트 설치 이력 조회 시작")
-            # UpdateInstalled 이벤트 필터 생성 (현재 디바이스에 대한 설치 이력만 조회)
-            event_filter = self.contract_http.events.UpdateInstalled.create_filter(
-                from_block=0,
-                to_block='latest'
-            )
-            
-            # 이벤트 로그 조회
-            events = event_filter.get_all_entries()
-            logger.info(f"[get_update_history] 감지된 설치 이력 UID: {[event.args.uid for event in events]}")
+            # UpdateInstalled 이벤트를 로컬 색인에서 현재 디바이스 ID로 조회 (새 블록만 동기화, 백필 중이면 색인된 범위만)
+            self.event_store.refresh()
+            events = self.event_store.query("UpdateInstalled", device_id=self.device_id)
+            logger.info(f"[get_update_history] 감지된 설치 이력 UID: {[event['uid'] for event in events]}")
 
-            history = []
-            block_cache = {}  # 블록 넘버별 캐시
-            for event in events:
-                try:
-                    # 이벤트에서 정보 추출
-                    uid = event.args.uid
-                    device_id = event.args.deviceId
-                    
-                    # 현재 디바이스의 설치 이력만 필터링
-                    # logger.info(f"[get_update_history] 디바이스 ID 비교: event_device_id={device_id} (type={type(device_id)}), self.device_id={self.device_id} (type={type(self.device_id)})")
-                    
-                    # device_id가 bytes 타입인 경우 문자열로 변환
-                    if isinstance(device_id, bytes):
-                        device_id = device_id.decode('utf-8')
-                    
-                    if str(device_id) != str(self.device_id):
-                        logger.info(f"[get_update_history] 다른 디바이스의 이력이므로 건너뜀: {device_id}")
-                        continue
-                    
-                    # 블록 타임스탬프 가져오기 (캐싱 활용)
-                    block_number = event.blockNumber
-                    if block_number not in block_cache:
-                        block_cache[block_number] = self.web3_http.eth.get_block(block_number)
-                    block = block_cache[block_number]
-                    timestamp = block.timestamp
-                    
-                    # 업데이트 상세 정보 조회
-                    update_info = self.contract_http.functions.getUpdateInfo(uid).call()
-                    
-                    history_item = {
-                        "uid": uid,
-                        "device_id": device_id,
-                        "version": update_info[5],
-                        "description": update_info[3],
-                        "timestamp": timestamp,  # 블록체인에서 가져온 시각
-                        "tx_hash": event.transactionHash.hex(),
-                        "block_number": block_number
-                    }
-                    history.append(history_item)
-                    # logger.info(f"[get_update_history] 이력 추가: uid={uid}, block={event.blockNumber}")
-                    
-                except Exception as e:
-                    logger.error(f"[get_update_history] 이력 항목 처리 중 오류 - Event: {event}, 오류: {e}")
-                    continue
-            # 시간순 정렬 (최신순)
-            history.sort(key=lambda x: x["timestamp"], reverse=True)
-            return history
+            # 업데이트 상세 정보를 배치 한 번으로 조회
+            update_infos = self.get_update_infos([event["args"]["uid"] for event in events])
+
+            return self._history_items(events, update_infos)
         except Exception as e:
             logger.error(f"[get_update_history] 설치 이력 조회 실패: {e}")
             return []
 
+    @staticmethod
+    def _history_items(events, update_infos):
+        """UpdateInstalled 이벤트·업데이트 상세정보 → 설치 이력 (최신순)"""
+        history = []
+        for event in events:
+            try:
+                uid = event["args"]["uid"]
+                update_info = update_infos[uid]
+                if isinstance(update_info, Exception):
+                    raise update_info
+
+                history_item = {
+                    "uid": uid,
+                    "device_id": event["device_id"],
+                    "version": update_info[5],
+                    "description": update_info[3],
+                    "timestamp": event["timestamp"],  # 블록체인에서 가져온 시각
+                    "tx_hash": event["tx_hash"],
+                    "block_number": event["block_number"]
+                }
+                history.append(history_item)
+
+            except Exception as e:
+                logger.error(f"[get_update_history] 이력 항목 처리 중 오류 - Event: {event}, 오류: {e}")
+                continue
+        # 시간순 정렬 (최신순)
+        history.sort(key=lambda x: x["timestamp"], reverse=True)
+        return history
+
     def get_owner_update_history(self):
         """
         Solidity의 getOwnerUpdateHistory()를 호출해
@@ -757,33 +1139,42 @@ class IoTDeviceClient:
         try:
             # getOwnerUpdateHistory()는 UpdateHistory[] 구조를 반환
             # 각 UpdateHistory: (uid, ipfsHash, encryptedKey, hashOfUpdate, description, price, version, isValid, isPurchased, isInstalled, isRefunded, purchaseTime, installTime, refundTime)
-            result = self.contract_http.functions.getOwnerUpdateHistory().call({'from': self.owner_address})
-            update_history = []
-            for item in result:
-                try:
-                    price_wei = int(item[5])
-                    price_eth = float(self.web3_http.from_wei(price_wei, "ether"))
-                except Exception:
-                    price_eth = None
-                update_history.append({
-                    "uid": item[0],
-                    "ipfsHash": item[1],
-                    "encryptedKey": base64.b64encode(item[2]).decode() if item[2] else "",
-                    "hashOfUpdate": item[3],
-                    "description": item[4],
-                    "price_eth": price_eth,
-                    "version": item[6],
-                    "isValid": item[7],
-                    "isPurchased": item[8],
-                    "isInstalled": item[9],
-                    "isRefunded": item[10],
-                    "purchasedAt": int(item[11]) if item[11] else None,
-                    "installedAt": int(item[12]) if item[12] else None,
-                    "refundedAt": int(item[13]) if item[13] else None
-                })
-            # 최신순 정렬 (구매시각 기준, 없으면 uid 기준)
-            update_history.sort(key=lambda x: x["purchasedAt"] or 0, reverse=True)
-            return update_history
+            (result,) = self.reader.read(
+                [self.contract_http.functions.getOwnerUpdateHistory()], sender=self.owner_address
+            )
+            if isinstance(result, Exception):
+                raise result
+            return self._parse_owner_update_history(result)
         except Exception as e:
             logger.error(f"[get_owner_update_history] 오류: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    @staticmethod
+    def _parse_owner_update_history(result):
+        """getOwnerUpdateHistory 반환값 → 구매/설치/환불 이력 (구매시각 최신순)"""
+        update_history = []
+        for item in result:
+            try:
+                price_wei = int(item[5])
+                price_eth = float(Web3.from_wei(price_wei, "ether"))
+            except Exception:
+                price_eth = None
+            update_history.append({
+                "uid": item[0],
+                "ipfsHash": item[1],
+                "encryptedKey": base64.b64encode(item[2]).decode() if item[2] else "",
+                "hashOfUpdate": item[3],
+                "description": item[4],
+                "price_eth": price_eth,
+                "version": item[6],
+                "isValid": item[7],
+                "isPurchased": item[8],
+                "isInstalled": item[9],
+                "isRefunded": item[10],
+                "purchasedAt": int(item[11]) if item[11] else None,
+                "installedAt": int(item[12]) if item[12] else None,
+                "refundedAt": int(item[13]) if item[13] else None
+            })
+        # 최신순 정렬 (구매시각 기준, 없으면 uid 기준)
+        update_history.sort(key=lambda x: x["purchasedAt"] or 0, reverse=True)
+        return update_history
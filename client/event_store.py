@@ -0,0 +1,482 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 기본 저장 위치: <프로젝트 루트>/data/events.sqlite3 (docker-compose의 ./data 볼륨과 공유)
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "events.sqlite3",
+)
+
+# 동기화 설정 (환경변수로 재정의 가능)
+EVENT_SYNC_CHUNK_SIZE = int(os.getenv("EVENT_SYNC_CHUNK_SIZE", 2000))
+EVENT_REORG_DEPTH = int(os.getenv("EVENT_REORG_DEPTH", 64))
+EVENT_STORE_START_BLOCK = int(os.getenv("EVENT_STORE_START_BLOCK", 0))
+# sync_async에서 동시에 조회하는 구간 수
+EVENT_SYNC_CONCURRENCY = int(os.getenv("EVENT_SYNC_CONCURRENCY", 8))
+
+# 로컬에 색인하는 컨트랙트 이벤트 (ABI에 없는 이벤트는 건너뜀)
+TRACKED_EVENTS = ("UpdateRegistered", "UpdateDelivered", "UpdateInstalled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    block_number INTEGER NOT NULL,
+    log_index    INTEGER NOT NULL,
+    block_hash   TEXT NOT NULL,
+    tx_hash      TEXT NOT NULL,
+    event        TEXT NOT NULL,
+    uid          TEXT,
+    owner        TEXT,
+    device_id    TEXT,
+    timestamp    INTEGER,
+    args         TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS idx_events_uid ON events (event, uid);
+CREATE INDEX IF NOT EXISTS idx_events_owner ON events (event, owner);
+CREATE INDEX IF NOT EXISTS idx_events_device ON events (event, device_id);
+CREATE TABLE IF NOT EXISTS blocks (
+    number INTEGER PRIMARY KEY,
+    hash   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _encode_arg(value):
+    """이벤트 인자를 JSON으로 저장 가능한 값으로 변환 (bytes는 타입을 보존)"""
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": bytes(value).hex()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_arg(v) for v in value]
+    return value
+
+
+def _decode_arg(value):
+    if isinstance(value, dict) and "__bytes__" in value:
+        return bytes.fromhex(value["__bytes__"])
+    if isinstance(value, list):
+        return [_decode_arg(v) for v in value]
+    return value
+
+
+def _index_text(value):
+    """색인 컬럼용 문자열 (bytes는 utf-8 디코드, 실패 시 hex)"""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            return bytes(value).decode("utf-8")
+        except UnicodeDecodeError:
+            return bytes(value).hex()
+    return str(value)
+
+
+class EventStore:
+    """
+    컨트랙트 이벤트 로컬 색인 (SQLite)
+    - 마지막으로 처리한 블록을 meta 테이블에 기록하고, 이후 블록만 고정 크기 구간으로 조회
+    - 최근 블록 해시를 blocks 테이블에 보관하여 체인 재구성(reorg)이 감지되면
+      공통 조상 이후의 이벤트를 삭제하고 다시 조회
+    - 이벤트를 uid, owner, deviceId로 색인하여 이력 조회를 체인 전체 스캔 없이 로컬에서 처리
+    - 최초 백필처럼 많이 밀린 동기화는 백그라운드에서 실행하고, 조회는 그때까지 색인된 결과로 응답 (refresh)
+    """
+
+    def __init__(self, web3, contract, headers=None, db_path=None, start_block=EVENT_STORE_START_BLOCK,
+                 chunk_size=EVENT_SYNC_CHUNK_SIZE, reorg_depth=EVENT_REORG_DEPTH):
+        """
+        :param web3: sync()에 사용할 Web3 (sync_async만 사용하면 None)
+        :param headers: 블록 헤더 조회에 사용할 BlockHeaderCache (없으면 블록마다 개별 조회)
+        """
+        self.web3 = web3
+        self.contract = contract
+        self.headers = headers
+        self.db_path = db_path or os.getenv("EVENT_STORE_PATH", DEFAULT_DB_PATH)
+        self.start_block = start_block
+        self.chunk_size = max(1, chunk_size)
+        self.reorg_depth = max(1, reorg_depth)
+        self._lock = threading.Lock()       # DB 접근
+        self._sync_lock = threading.Lock()  # sync() 실행 (노드 조회 중에도 query()는 막지 않음)
+        self._async_lock = None
+        self._sync_thread = None
+        self._sync_task = None
+
+        # topic0 → 이벤트 이름 (하나의 get_logs 호출로 모든 추적 이벤트 조회)
+        self._topics = {}
+        for abi in contract.abi:
+            if abi.get("type") == "event" and abi.get("name") in TRACKED_EVENTS:
+                self._topics[HexBytes(event_abi_to_log_topic(abi))] = abi["name"]
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._check_contract()
+
+    def _check_contract(self):
+        """다른 컨트랙트(재배포 등)의 색인이면 초기화"""
+        address = self.contract.address.lower()
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'contract'").fetchone()
+        if row and row[0] == address:
+            return
+        if row:
+            logger.info(f"[EventStore] 컨트랙트 주소 변경 감지 → 색인 초기화 ({row[0]} → {address})")
+        with self._conn:
+            self._conn.execute("DELETE FROM events")
+            self._conn.execute("DELETE FROM blocks")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('contract', ?)", (address,))
+
+    @property
+    def last_block(self):
+        """마지막으로 처리한 블록 번호 (아직 없으면 start_block - 1)"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'last_block'").fetchone()
+        return int(row[0]) if row else self.start_block - 1
+
+    def sync(self):
+        """
+        마지막 처리 블록 이후의 새 이벤트를 가져와 색인
+        :return: 새로 색인한 이벤트 수
+        """
+        with self._sync_lock:
+            latest = self.web3.eth.block_number
+            self._handle_reorg()
+
+            added = 0
+            from_block = self._locked(lambda: self.last_block) + 1
+            started = time.monotonic()
+            while from_block <= latest:
+                to_block = min(from_block + self.chunk_size - 1, latest)
+                added += self._sync_range(from_block, to_block)
+                from_block = to_block + 1
+
+            if added:
+                logger.info(
+                    f"[EventStore] 이벤트 {added}개 색인 (블록 #{latest}까지, "
+                    f"{time.monotonic() - started:.2f}s)"
+                )
+            return added
+
+    def start_sync(self):
+        """백그라운드 스레드에서 sync() 실행 (이미 실행 중이면 무시) → 새로 시작했는지 여부"""
+        if self.syncing:
+            return False
+        self._sync_thread = threading.Thread(target=self._background_sync, daemon=True)
+        self._sync_thread.start()
+        return True
+
+    @property
+    def syncing(self):
+        """백그라운드 동기화 실행 중 여부"""
+        thread_running = self._sync_thread is not None and self._sync_thread.is_alive()
+        task_running = self._sync_task is not None and not self._sync_task.done()
+        return thread_running or task_running
+
+    def _background_sync(self):
+        try:
+            self.sync()
+        except Exception as e:
+            logger.error(f"[EventStore] 백그라운드 동기화 실패: {e}")
+
+    def refresh(self):
+        """
+        조회 직전 색인 갱신 (요청 처리 경로용)
+        - 처리할 블록이 한 구간(chunk_size) 이내면 바로 sync()
+        - 그보다 밀려 있거나 백그라운드 동기화 중이면 기다리지 않음 (지금까지 색인된 결과로 조회)
+        :return: 새로 색인한 이벤트 수 (백그라운드에 맡긴 경우 0)
+        """
+        if self.syncing:
+            return 0
+        latest = self.web3.eth.block_number
+        if latest - self._locked(lambda: self.last_block) > self.chunk_size:
+            self.start_sync()
+            return 0
+        return self.sync()
+
+    async def refresh_async(self, web3):
+        """refresh()의 asyncio 버전 (많이 밀려 있으면 sync_async를 백그라운드 태스크로 실행)"""
+        if self.syncing:
+            return 0
+        latest = await web3.eth.block_number
+        if latest - await asyncio.to_thread(self._locked, lambda: self.last_block) > self.chunk_size:
+            self._sync_task = asyncio.create_task(self._background_sync_async(web3))
+            return 0
+        return await self.sync_async(web3)
+
+    async def _background_sync_async(self, web3):
+        try:
+            await self.sync_async(web3)
+        except Exception as e:
+            logger.error(f"[EventStore] 백그라운드 동기화 실패: {e}")
+
+    async def sync_async(self, web3):
+        """
+        sync()의 asyncio 버전 (AsyncWeb3 사용)
+        - 구간별 get_logs와 블록 헤더 조회를 asyncio.gather로 동시에 실행 (최대 EVENT_SYNC_CONCURRENCY 구간)
+        - DB 읽기·쓰기는 sync()와 같은 DB 잠금을 잡고 이벤트 루프 밖에서 실행
+        :return: 새로 색인한 이벤트 수
+        """
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            stored = await asyncio.to_thread(self._locked, self._stored_tips)
+            if stored:
+                latest, top_hash = await asyncio.gather(
+                    web3.eth.block_number, self._async_block_hash(web3, stored[0][0])
+                )
+                if top_hash != stored[0][1]:
+                    hashes = await asyncio.gather(*(self._async_block_hash(web3, n) for n, _ in stored[1:]))
+                    await asyncio.to_thread(self._locked, self._rollback, stored, [top_hash, *hashes])
+            else:
+                latest = await web3.eth.block_number
+
+            ranges = []
+            from_block = await asyncio.to_thread(self._locked, lambda: self.last_block) + 1
+            while from_block <= latest:
+                to_block = min(from_block + self.chunk_size - 1, latest)
+                ranges.append((from_block, to_block))
+                from_block = to_block + 1
+            if not ranges:
+                return 0
+
+            started = time.monotonic()
+            limit = asyncio.Semaphore(max(1, EVENT_SYNC_CONCURRENCY))
+
+            async def fetch(coro):
+                async with limit:
+                    return await coro
+
+            logs = await asyncio.gather(*(
+                fetch(web3.eth.get_logs(self._log_filter(f, t))) for f, t in ranges
+            )) if self._topics else [[] for _ in ranges]
+            decoded = [self._decode_logs(range_logs) for range_logs in logs]
+
+            block_hashes = list({HexBytes(event["blockHash"]) for events in decoded for _, event in events})
+            blocks = await asyncio.gather(
+                *(fetch(web3.eth.get_block(block_hash)) for block_hash in block_hashes),
+                *(fetch(web3.eth.get_block(to_block)) for _, to_block in ranges),
+            )
+            timestamps = {
+                block_hash.hex(): block["timestamp"] for block_hash, block in zip(block_hashes, blocks)
+            }
+            tips = blocks[len(block_hashes):]
+
+            def write():
+                return sum(
+                    self._write_range(to_block, events, timestamps, HexBytes(tip["hash"]).hex())
+                    for (_, to_block), events, tip in zip(ranges, decoded, tips)
+                )
+
+            added = await asyncio.to_thread(self._locked, write)
+            if added:
+                logger.info(
+                    f"[EventStore] 이벤트 {added}개 색인 (블록 #{latest}까지, "
+                    f"{time.monotonic() - started:.2f}s)"
+                )
+            return added
+
+    def _locked(self, func, *args):
+        with self._lock:
+            return func(*args)
+
+    @staticmethod
+    async def _async_block_hash(web3, number):
+        try:
+            return HexBytes((await web3.eth.get_block(number))["hash"]).hex()
+        except Exception:
+            return None  # 체인이 짧아진 경우 (블록 없음)
+
+    def _log_filter(self, from_block, to_block):
+        return {
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "address": self.contract.address,
+            "topics": [list(self._topics)],
+        }
+
+    def _sync_range(self, from_block, to_block):
+        """[from_block, to_block] 구간의 추적 이벤트를 조회해 저장하고 처리 블록 갱신"""
+        logs = []
+        if self._topics:
+            logs = self.web3.eth.get_logs(self._log_filter(from_block, to_block))
+        events = self._decode_logs(logs)
+
+        # 블록 번호·해시는 로그에 들어 있으므로 트랜잭션 조회 없이 블록 헤더만 (배치로) 조회
+        timestamps = self._block_timestamps({event["blockHash"] for _, event in events})
+
+        # 구간 끝 블록 해시를 기록 (reorg 감지 기준점)
+        tip_hash = HexBytes(self._block_by_number(to_block)["hash"]).hex()
+        return self._locked(self._write_range, to_block, events, timestamps, tip_hash)
+
+    def _block_by_number(self, number):
+        """번호로 블록 조회 (BlockHeaderCache가 있으면 배처를 거치고 해시 기준으로 캐시에 저장)"""
+        if self.headers is not None:
+            return self.headers.get_by_number(number)
+        return self.web3.eth.get_block(number)
+
+    def _decode_logs(self, logs):
+        """로그 목록 → [(이벤트 이름, 디코딩된 이벤트)]"""
+        events = []
+        for log in logs:
+            name = self._topics.get(HexBytes(log["topics"][0]))
+            if name is None:
+                continue
+            try:
+                events.append((name, self.contract.events[name]().process_log(log)))
+            except Exception as e:
+                logger.warning(f"[EventStore] 로그 디코딩 실패 (블록 #{log['blockNumber']}): {e}")
+        return events
+
+    def _write_range(self, to_block, events, timestamps, tip_hash):
+        """디코딩된 이벤트 저장 + 구간 끝 블록 해시·처리 블록 갱신 → 저장한 이벤트 수"""
+        rows = []
+        for name, event in events:
+            block_hash = HexBytes(event["blockHash"]).hex()
+            args = dict(event["args"])
+            owner = args.get("owner")
+            rows.append((
+                event["blockNumber"],
+                event["logIndex"],
+                block_hash,
+                HexBytes(event["transactionHash"]).hex(),
+                name,
+                _index_text(args.get("uid")),
+                owner.lower() if isinstance(owner, str) else _index_text(owner),
+                _index_text(args.get("deviceId")),
+                timestamps[block_hash],
+                json.dumps({k: _encode_arg(v) for k, v in args.items()}),
+            ))
+
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO events (block_number, log_index, block_hash, tx_hash, event, "
+                "uid, owner, device_id, timestamp, args) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blocks (number, hash) VALUES (?, ?)", (to_block, tip_hash)
+            )
+            self._conn.execute(
+                "DELETE FROM blocks WHERE number NOT IN "
+                "(SELECT number FROM blocks ORDER BY number DESC LIMIT ?)",
+                (self.reorg_depth,),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_block', ?)", (str(to_block),)
+            )
+        return len(rows)
+
+    def _block_timestamps(self, block_hashes):
+        """블록 해시 집합 → {블록 해시(hex): 타임스탬프}"""
+        if self.headers is not None:
+            return self.headers.timestamps(block_hashes)
+        return {
+            HexBytes(block_hash).hex(): self.web3.eth.get_block(block_hash)["timestamp"]
+            for block_hash in block_hashes
+        }
+
+    def _stored_tips(self):
+        """저장된 최근 구간 끝 블록 [(번호, 해시)] (최신순)"""
+        return self._conn.execute("SELECT number, hash FROM blocks ORDER BY number DESC").fetchall()
+
+    def _handle_reorg(self):
+        """저장된 최근 블록 해시를 체인과 비교하여 달라졌으면 공통 조상까지 되돌림"""
+        stored = self._locked(self._stored_tips)
+        chain_hashes = []
+        for number, block_hash in stored:
+            try:
+                chain_hash = HexBytes(self.web3.eth.get_block(number)["hash"]).hex()
+            except Exception:
+                chain_hash = None  # 체인이 짧아진 경우 (블록 없음)
+            chain_hashes.append(chain_hash)
+            if chain_hash == block_hash:
+                break
+        self._locked(self._rollback, stored, chain_hashes)
+
+    def _rollback(self, stored, chain_hashes):
+        """
+        저장된 블록 해시와 체인의 해시(stored 순서, 앞부분만 있어도 됨)를 비교해 공통 조상 이후 이벤트 삭제
+        """
+        common = None
+        for (number, block_hash), chain_hash in zip(stored, chain_hashes):
+            if chain_hash == block_hash:
+                common = number
+                break
+
+        if not stored or common == stored[0][0]:
+            return
+
+        if common is None:
+            # 보관 범위보다 깊은 재구성 → 처음부터 다시 색인
+            logger.warning("[EventStore] 보관 범위를 넘는 체인 재구성 감지 → 전체 재색인")
+            common = self.start_block - 1
+        else:
+            logger.warning(f"[EventStore] 체인 재구성 감지 → 블록 #{common} 이후 이벤트 롤백")
+
+        with self._conn:
+            self._conn.execute("DELETE FROM events WHERE block_number > ?", (common,))
+            self._conn.execute("DELETE FROM blocks WHERE number > ?", (common,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_block', ?)", (str(common),)
+            )
+
+    def query(self, event, uid=None, owner=None, device_id=None):
+        """
+        색인된 이벤트 조회 (블록 순서)
+        :return: [{"event", "uid", "owner", "device_id", "args", "block_number", "block_hash",
+                   "tx_hash", "log_index", "timestamp"}]
+        """
+        sql = (
+            "SELECT event, uid, owner, device_id, args, block_number, block_hash, tx_hash, "
+            "log_index, timestamp FROM events WHERE event = ?"
+        )
+        params = [event]
+        if uid is not None:
+            sql += " AND uid = ?"
+            params.append(_index_text(uid))
+        if owner is not None:
+            sql += " AND owner = ?"
+            params.append(owner.lower())
+        if device_id is not None:
+            sql += " AND device_id = ?"
+            params.append(_index_text(device_id))
+        sql += " ORDER BY block_number, log_index"
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        results = []
+        for name, uid, owner, device_id, args, block_number, block_hash, tx_hash, log_index, ts in rows:
+            results.append({
+                "event": name,
+                "uid": uid,
+                "owner": owner,
+                "device_id": device_id,
+                "args": {k: _decode_arg(v) for k, v in json.loads(args).items()},
+                "block_number": block_number,
+                "block_hash": block_hash,
+                "tx_hash": tx_hash,
+                "log_index": log_index,
+                "timestamp": ts,
+            })
+        return results
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
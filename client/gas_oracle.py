@@ -0,0 +1,124 @@
+import os
+import time
+import logging
+import threading
+
+from client.ttl_cache import SingleFlightCache
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 가스 오라클 설정 (환경변수로 재정의 가능)
+GAS_FEE_TTL = float(os.getenv("GAS_FEE_TTL", 15))
+GAS_ESTIMATE_TTL = float(os.getenv("GAS_ESTIMATE_TTL", 600))
+# 추정 가스에 곱하는 안전 여유 비율
+GAS_ESTIMATE_MARGIN = float(os.getenv("GAS_ESTIMATE_MARGIN", 1.2))
+GAS_FEE_HISTORY_BLOCKS = int(os.getenv("GAS_FEE_HISTORY_BLOCKS", 10))
+GAS_PRIORITY_PERCENTILE = float(os.getenv("GAS_PRIORITY_PERCENTILE", 50))
+GAS_MIN_PRIORITY_FEE = int(os.getenv("GAS_MIN_PRIORITY_FEE", 10 ** 9))
+# auto: 체인이 지원하면(최신 블록에 baseFeePerGas 존재) EIP-1559 사용, off: 항상 legacy gasPrice
+GAS_EIP1559 = os.getenv("GAS_EIP1559", "auto").lower()
+
+
+def fees_from_chain(block, history, gas_price):
+    """
+    최신 블록·eth_feeHistory·eth_gasPrice 조회 결과(실패한 항목은 예외 객체) → 수수료 필드 dict
+    - 최신 블록에 baseFeePerGas가 있으면 EIP-1559 필드, 아니면 legacy gasPrice
+    """
+    if not isinstance(block, Exception) and block.get("baseFeePerGas") is not None:
+        if isinstance(history, Exception):
+            logger.warning(f"[GasOracle] eth_feeHistory 조회 실패 → 최신 블록 기본 수수료 사용: {history}")
+            base_fee, rewards = block["baseFeePerGas"], []
+        else:
+            # 마지막 항목은 다음 블록의 예상 기본 수수료
+            base_fee = history["baseFeePerGas"][-1]
+            rewards = sorted(reward[0] for reward in history.get("reward", []) if reward)
+        priority_fee = max(rewards[len(rewards) // 2] if rewards else 0, GAS_MIN_PRIORITY_FEE)
+        # 기본 수수료가 연속으로 올라도(블록당 최대 12.5%) 몇 블록은 버틸 수 있도록 2배로 설정
+        return {"maxFeePerGas": 2 * base_fee + priority_fee, "maxPriorityFeePerGas": priority_fee}
+
+    if isinstance(gas_price, Exception):
+        raise gas_price
+    return {"gasPrice": gas_price}
+
+
+class GasOracle:
+    """
+    트랜잭션 수수료·가스 한도 오라클
+    - 수수료: 최신 블록·eth_feeHistory·eth_gasPrice를 RPCBatcher 배치 한 번으로 조회해 GAS_FEE_TTL 동안 캐시
+      (EIP-1559 체인이면 maxFeePerGas/maxPriorityFeePerGas, 아니면 gasPrice)
+    - 가스 한도: 컨트랙트 함수별(주소, 함수 시그니처) 최근 추정치를 GAS_ESTIMATE_TTL 동안 재사용
+    """
+
+    def __init__(self, batcher, fee_ttl=GAS_FEE_TTL, estimate_ttl=GAS_ESTIMATE_TTL, margin=GAS_ESTIMATE_MARGIN):
+        self.batcher = batcher
+        self.estimate_ttl = estimate_ttl
+        self.margin = margin
+        self._fees = SingleFlightCache(self._fetch_fees, fee_ttl, name="gas_fees")
+        self._estimates = {}
+        self._lock = threading.Lock()
+
+    def fees(self):
+        """트랜잭션 수수료 필드 dict ({"maxFeePerGas", "maxPriorityFeePerGas"} 또는 {"gasPrice"})"""
+        return dict(self._fees.get())
+
+    @staticmethod
+    def max_fee_per_gas(fees):
+        """잔액 확인용 가스 단가 상한"""
+        return fees.get("maxFeePerGas", fees.get("gasPrice"))
+
+    def _fetch_fees(self):
+        if GAS_EIP1559 == "off":
+            gas_price = self.batcher.execute([lambda w3: w3.eth.gas_price])[0]
+            if isinstance(gas_price, Exception):
+                raise gas_price
+            return {"gasPrice": gas_price}
+
+        block, history, gas_price = self.batcher.execute([
+            lambda w3: w3.eth.get_block("latest"),
+            lambda w3: w3.eth.fee_history(GAS_FEE_HISTORY_BLOCKS, "latest", [GAS_PRIORITY_PERCENTILE]),
+            lambda w3: w3.eth.gas_price,
+        ])
+        return fees_from_chain(block, history, gas_price)
+
+    def estimate(self, function, transaction, fallback=None):
+        """
+        컨트랙트 함수의 가스 한도 (최근 추정치 재사용, 없으면 estimate_gas 후 여유 비율 적용)
+        :param fallback: 추정이 실패했을 때 사용할 가스 한도 (None이면 예외 발생, 캐시하지 않음)
+        """
+        cached = self.cached(function)
+        if cached is not None:
+            return cached
+        try:
+            gas = function.estimate_gas(transaction)
+        except Exception as e:
+            if fallback is None:
+                raise
+            logger.warning(f"[GasOracle] {function.fn_name} 가스 추정 실패 → {fallback} 사용: {e}")
+            return fallback
+        return self.record(function, gas)
+
+    def cached(self, function):
+        """유효한 최근 가스 한도 (없으면 None)"""
+        with self._lock:
+            cached = self._estimates.get(self._key(function))
+            if cached and time.monotonic() < cached[1]:
+                return cached[0]
+        return None
+
+    def record(self, function, gas):
+        """직접 추정한 가스(eth_estimateGas 결과)를 캐시에 기록 → 여유 비율을 적용한 가스 한도"""
+        limit = int(gas * self.margin)
+        with self._lock:
+            self._estimates[self._key(function)] = (limit, time.monotonic() + self.estimate_ttl)
+        return limit
+
+    def forget(self, function):
+        """추정치 폐기 (예: 해당 함수 트랜잭션이 실패한 경우)"""
+        with self._lock:
+            self._estimates.pop(self._key(function), None)
+
+    @staticmethod
+    def _key(function):
+        return function.address, function.abi_element_identifier
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import logging
+import tempfile
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 기본 저널 위치: <프로젝트 루트>/data/install_journal/ (docker-compose의 ./data 볼륨과 공유)
+DEFAULT_JOURNAL_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "install_journal",
+)
+
+# 설치 단계 (순서대로 진행, 각 단계 완료 시 저널에 기록)
+STAGE_DOWNLOADED = "downloaded"          # 암호화된 파일(Es)을 로컬에 저장
+STAGE_VERIFIED = "verified"              # SHA3-256 해시 검증
+STAGE_KEY_DECRYPTED = "key-decrypted"    # CP-ABE로 대칭키 복호화
+STAGE_FILE_DECRYPTED = "file-decrypted"  # 업데이트 파일 복호화
+STAGE_CONFIRMED = "confirmed"            # 설치 확인 트랜잭션 영수증 확인 (이후 저널 삭제)
+STAGES = (STAGE_DOWNLOADED, STAGE_VERIFIED, STAGE_KEY_DECRYPTED, STAGE_FILE_DECRYPTED, STAGE_CONFIRMED)
+
+
+class InstallStageError(Exception):
+    """설치 단계 실패 (메시지는 사용자/API 응답에 그대로 사용)"""
+
+
+def reached(record, stage):
+    """저널 기록이 해당 단계를 이미 완료했는지 여부"""
+    return record is not None and STAGES.index(record["stage"]) >= STAGES.index(stage)
+
+
+class InstallJournal:
+    """
+    uid별 설치 진행 상태 저널 (<디렉토리>/<uid>.json)
+    - 단계가 바뀔 때마다 임시 파일 → fsync → os.replace → 디렉토리 fsync 로 원자적으로 기록
+    - 프로세스가 중간에 죽어도 다음 설치 시도는 마지막으로 완료한 단계 다음부터 진행
+    - key-decrypted ~ file-decrypted 사이에만 대칭키를 기록 (파일 권한 0600, 기기 비밀키와 같은 디스크)
+    - 단일 설치는 다운로드·검증·복호화를 한 번의 스트림으로 처리하므로 file-decrypted부터 기록
+      (downloaded ~ key-decrypted 단계는 암호문을 로컬에 저장하는 일괄 설치와 재개 경로에서만 사용)
+    - 설치 확인 트랜잭션은 전송 직후 TX 해시(confirmTxHash)를 기록 → 재개 시 다시 전송하지 않고 영수증 확인
+    - 설치 확인까지 끝나거나 설치를 포기하면 저널 삭제
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.getenv("INSTALL_JOURNAL_DIR", DEFAULT_JOURNAL_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, uid):
+        return os.path.join(self.directory, f"{uid}.json")
+
+    def load(self, uid):
+        try:
+            with open(self._path(uid), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def resume(self, update_info):
+        """
+        이어서 진행할 저널 기록 반환 (없거나 쓸 수 없으면 None)
+        - 업데이트 내용(ipfsHash, hashOfUpdate)이 바뀌었거나 단계 산출물 파일이 없으면 폐기
+        """
+        uid = update_info["uid"]
+        record = self.load(uid)
+        if record is None:
+            return None
+
+        update = record.get("update", {})
+        if (update.get("ipfsHash"), update.get("hashOfUpdate")) != (update_info["ipfsHash"], update_info["hashOfUpdate"]):
+            logger.info(f"[InstallJournal] {uid} 업데이트 내용 변경 → 저널 폐기")
+            self.discard(uid)
+            return None
+
+        if reached(record, STAGE_FILE_DECRYPTED):
+            artifact = record.get("outputPath")
+        else:
+            artifact = record.get("encryptedPath")
+        if not artifact or not os.path.exists(artifact):
+            logger.info(f"[InstallJournal] {uid} 단계 산출물 없음 → 처음부터 다시 진행")
+            self.discard(uid)
+            return None
+
+        logger.info(f"[InstallJournal] {uid} 이어서 진행 (마지막 완료 단계: {record['stage']})")
+        return record
+
+    def advance(self, uid, stage, **fields):
+        """
+        단계 완료 기록 → 갱신된 저널 기록
+        :param fields: 함께 기록할 값 (None이면 해당 항목 삭제)
+        """
+        record = self.load(uid) or {"uid": uid}
+        record.update(fields)
+        record = {key: value for key, value in record.items() if value is not None}
+        record["stage"] = stage
+        record["updatedAt"] = int(time.time())
+
+        path = self._path(uid)
+        fd, staging_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(record, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(staging_path, path)
+        except BaseException:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+
+        # 디렉토리 엔트리까지 디스크에 반영
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+        logger.info(f"[InstallJournal] {uid} → {stage}")
+        return record
+
+    def update(self, uid, **fields):
+        """단계는 그대로 두고 값만 기록 (예: 설치 확인 TX 해시) → 갱신된 저널 기록"""
+        record = self.load(uid)
+        if record is None:
+            return None
+        return self.advance(uid, record["stage"], **fields)
+
+    def discard(self, uid):
+        """저널과 남아 있는 암호화 파일 삭제 (환불 등으로 설치를 포기한 경우)"""
+        record = self.load(uid)
+        if record and record.get("encryptedPath") and os.path.exists(record["encryptedPath"]):
+            os.remove(record["encryptedPath"])
+        if os.path.exists(self._path(uid)):
+            os.remove(self._path(uid))
+
+    def pending(self):
+        """설치 확인까지 끝나지 않은 저널 기록 목록 (설치 확인까지 끝난 채 남은 저널은 삭제)"""
+        records = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            uid = name[:-len(".json")]
+            record = self.load(uid)
+            if not record:
+                continue
+            if record.get("stage") == STAGE_CONFIRMED:
+                self.discard(uid)
+                continue
+            records.append(record)
+        return records
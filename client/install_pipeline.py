@@ -0,0 +1,177 @@
+import os
+import uuid
+import logging
+import threading
+
+from client.install_journal import InstallStageError, reached, STAGE_KEY_DECRYPTED
+
+try:
+    from eventlet import patcher, tpool
+except ImportError:  # eventlet 없이 실행하는 경우 (CLI, 테스트 등)
+    patcher = tpool = None
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 단계별 동시 실행 수 (환경변수로 재정의 가능)
+INSTALL_DOWNLOAD_WORKERS = int(os.getenv("INSTALL_DOWNLOAD_WORKERS", 3))
+INSTALL_DECRYPT_WORKERS = int(os.getenv("INSTALL_DECRYPT_WORKERS", min(4, os.cpu_count() or 1)))
+
+# 진행 단계
+STAGE_QUEUED = "queued"
+STAGE_DOWNLOADING = "downloading"
+STAGE_DOWNLOADED = "downloaded"
+STAGE_DECRYPTING = "decrypting"
+STAGE_CONFIRMING = "confirming"
+STAGE_INSTALLED = "installed"
+STAGE_FAILED = "failed"
+
+
+def _run_blocking(func, *args):
+    """eventlet 환경이면 CPU 작업을 실제 OS 스레드(tpool)에서 실행 (green thread가 허브를 막지 않도록)"""
+    if patcher is not None and patcher.is_monkey_patched("thread"):
+        return tpool.execute(func, *args)
+    return func(*args)
+
+
+class InstallPipeline:
+    """
+    여러 업데이트 설치 파이프라인
+    - 다운로드(IO) → 해시 검증·AES 복호화(CPU) → 설치 확인/환불 트랜잭션(직렬) 단계로 나누어
+      업데이트 N+1의 다운로드와 업데이트 N의 복호화를 겹쳐 실행
+    - 단계마다 동시 실행 수 제한 (트랜잭션 단계는 1개, 요청 순서대로 처리해 최종 버전이 마지막 업데이트가 되도록 함)
+    - CP-ABE 대칭키 복호화는 시작 시 decrypt_update_keys로 한 번에 수행 (다운로드와 동시 진행)
+    - 각 단계는 IoTDeviceClient의 저널 단계 메서드를 사용하므로 중단된 설치는 마지막 완료 단계부터 재개
+    - 단계가 바뀔 때마다 progress_callback(진행 이벤트)로 알림 (예: SocketIO emit)
+    """
+
+    def __init__(self, device, progress_callback=None,
+                 download_workers=INSTALL_DOWNLOAD_WORKERS, decrypt_workers=INSTALL_DECRYPT_WORKERS):
+        self.device = device
+        self.progress_callback = progress_callback
+        self._download_slots = threading.BoundedSemaphore(max(1, download_workers))
+        self._decrypt_slots = threading.BoundedSemaphore(max(1, decrypt_workers))
+
+    def install(self, update_infos):
+        """
+        업데이트 목록 설치 (모두 끝날 때까지 대기)
+        :param update_infos: check_for_updates_http()가 반환한 업데이트 정보 목록 (설치 순서)
+        :return: 입력 순서의 설치 결과 목록 (download_update와 같은 형태 + uid)
+        """
+        batch = {
+            "id": uuid.uuid4().hex,
+            "total": len(update_infos),
+            "turn": 0,                          # 트랜잭션 단계 차례 (입력 인덱스)
+            "turn_changed": threading.Condition(),
+            "keys": None,
+            "keys_ready": threading.Event(),
+        }
+        results = [None] * len(update_infos)
+        for index, update_info in enumerate(update_infos):
+            self._progress(batch, index, update_info["uid"], STAGE_QUEUED)
+
+        self.device._load_keys()
+        records = [self.device.install_journal.resume(update_info) for update_info in update_infos]
+        # 대칭키 복호화 단계를 이미 마친 업데이트는 CP-ABE 생략
+        pending_keys = [
+            update_info for update_info, record in zip(update_infos, records)
+            if not reached(record, STAGE_KEY_DECRYPTED)
+        ]
+        workers = [threading.Thread(target=self._load_update_keys, args=(batch, pending_keys), daemon=True)]
+        workers += [
+            threading.Thread(target=self._install_one, args=(batch, index, update_info, record, results), daemon=True)
+            for index, (update_info, record) in enumerate(zip(update_infos, records))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        installed = sum(1 for result in results if result.get("success"))
+        logger.info(f"[InstallPipeline] 일괄 설치 완료 {installed}/{len(results)} (batch {batch['id']})")
+        return results
+
+    def _load_update_keys(self, batch, update_infos):
+        try:
+            batch["keys"] = _run_blocking(self.device.decrypt_update_keys, update_infos) if update_infos else {}
+        except Exception as e:
+            logger.error(f"[InstallPipeline] 대칭키 일괄 복호화 실패: {e}")
+            batch["keys"] = {}
+        finally:
+            batch["keys_ready"].set()
+
+    def _install_one(self, batch, index, update_info, record, results):
+        """
+        업데이트 하나 설치 (워커 스레드)
+        - 어떤 오류가 나도 results[index]에 결과를 남기고 트랜잭션 단계 차례를 넘김
+          (결과가 비거나 다음 업데이트가 차례를 기다리다 멈추지 않도록)
+        """
+        uid = update_info["uid"]
+        result = {"success": False, "message": "업데이트 설치 실패: 설치 작업이 중단되었습니다"}
+        try:
+            error = None
+            try:
+                record = self._prepare(batch, index, update_info, record)
+            except InstallStageError as e:
+                error = str(e)
+            except Exception as e:
+                error = f"업데이트 설치 실패: {e}"
+
+            # 트랜잭션 단계: 요청 순서대로 하나씩
+            self._wait_turn(batch, index)
+            if error is None:
+                self._progress(batch, index, uid, STAGE_CONFIRMING)
+                result = self.device.complete_installation(record)
+            else:
+                logger.error(f"[InstallPipeline] {uid} 설치 실패: {error}")
+                result = self.device.abort_installation(uid, error)
+        except Exception as e:
+            logger.error(f"[InstallPipeline] {uid} 설치 실패: {e}")
+            result = {"success": False, "message": f"업데이트 설치 실패: {e}"}
+        finally:
+            self._wait_turn(batch, index)
+            with batch["turn_changed"]:
+                batch["turn"] += 1
+                batch["turn_changed"].notify_all()
+
+            results[index] = {"uid": uid, **result}
+            self._progress(
+                batch, index, uid, STAGE_INSTALLED if result.get("success") else STAGE_FAILED, result.get("message")
+            )
+
+    @staticmethod
+    def _wait_turn(batch, index):
+        with batch["turn_changed"]:
+            batch["turn_changed"].wait_for(lambda: batch["turn"] == index)
+
+    def _prepare(self, batch, index, update_info, record):
+        """다운로드·해시 검증 → 대칭키·파일 복호화 → file-decrypted 단계의 저널 기록"""
+        uid = update_info["uid"]
+
+        with self._download_slots:
+            self._progress(batch, index, uid, STAGE_DOWNLOADING)
+            record = self.device.fetch_update(update_info, record)
+        self._progress(batch, index, uid, STAGE_DOWNLOADED)
+
+        if not reached(record, STAGE_KEY_DECRYPTED):
+            batch["keys_ready"].wait()
+            aes_key = batch["keys"].get(uid)
+            if aes_key is None:
+                raise InstallStageError("대칭키 복호화 실패: CP-ABE 복호화 결과 없음")
+            record = self.device.decrypt_update_key(record, aes_key)
+
+        with self._decrypt_slots:
+            self._progress(batch, index, uid, STAGE_DECRYPTING)
+            return _run_blocking(self.device.decrypt_update_file, record)
+
+    def _progress(self, batch, index, uid, stage, message=None):
+        if not self.progress_callback:
+            return
+        event = {"batchId": batch["id"], "index": index, "total": batch["total"], "uid": uid, "stage": stage}
+        if message:
+            event["message"] = message
+        try:
+            self.progress_callback(event)
+        except Exception as e:
+            logger.error(f"[InstallPipeline] 진행 알림 실패: {e}")
@@ -0,0 +1,191 @@
+import os
+import json
+import random
+import asyncio
+import logging
+import tempfile
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 기본 체크포인트 위치: <프로젝트 루트>/data/listener_checkpoint.json (docker-compose의 ./data 볼륨과 공유)
+DEFAULT_CHECKPOINT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "listener_checkpoint.json",
+)
+
+# 리스너 설정 (환경변수로 재정의 가능)
+LISTENER_BACKOFF_INITIAL = float(os.getenv("LISTENER_BACKOFF_INITIAL", 1))
+LISTENER_BACKOFF_MAX = float(os.getenv("LISTENER_BACKOFF_MAX", 60))
+LISTENER_HEARTBEAT_INTERVAL = float(os.getenv("LISTENER_HEARTBEAT_INTERVAL", 15))
+LISTENER_HEARTBEAT_TIMEOUT = float(os.getenv("LISTENER_HEARTBEAT_TIMEOUT", 10))
+LISTENER_QUEUE_SIZE = int(os.getenv("LISTENER_QUEUE_SIZE", 1000))
+LISTENER_CATCHUP_CHUNK = int(os.getenv("LISTENER_CATCHUP_CHUNK", 2000))
+# 로그가 없을 때 체크포인트를 head보다 이만큼 뒤까지만 전진 (늦게 도착하는 로그 대비)
+LISTENER_CHECKPOINT_LAG = int(os.getenv("LISTENER_CHECKPOINT_LAG", 2))
+
+# 블록 안의 모든 로그를 처리했음을 나타내는 로그 인덱스
+_END_OF_BLOCK = 2 ** 31
+
+
+class ListenerCheckpoint:
+    """
+    마지막으로 처리한 로그 위치 (블록 번호, 로그 인덱스)를 파일에 저장
+    - 임시 파일 → fsync → os.replace 로 원자적으로 기록
+    - 다른 컨트랙트(재배포 등)의 체크포인트는 무시
+    """
+
+    def __init__(self, contract_address, path=None):
+        self.contract_address = contract_address.lower()
+        self.path = path or os.getenv("LISTENER_CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH)
+        self.position = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("contract") != self.contract_address:
+            logger.info("[ListenerCheckpoint] 다른 컨트랙트의 체크포인트 → 무시")
+            return None
+        return data["block_number"], data["log_index"]
+
+    def advance(self, block_number, log_index):
+        """위치가 현재보다 뒤일 때만 저장 → 저장 여부"""
+        position = (block_number, log_index)
+        if self.position is not None and position <= self.position:
+            return False
+        self.position = position
+        data = {"contract": self.contract_address, "block_number": block_number, "log_index": log_index}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, staging_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(staging_path, self.path)
+        except BaseException:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+        return True
+
+
+class SupervisedLogListener:
+    """
+    컨트랙트 로그 구독 감독자 (IoTDeviceClient.listen_for_updates에서 실행, 종료되지 않음)
+    - 연결이 끊기거나 오류가 나면 지수 백오프(+지터)로 재연결
+    - 주기적으로 eth_blockNumber를 보내 응답이 없으면 죽은 소켓으로 보고 재연결
+    - 수신 태스크와 처리 태스크를 크기 제한 asyncio.Queue로 분리 (느린 디코딩이 소켓 수신을 막지 않음)
+    - 처리한 로그 위치를 체크포인트로 저장하고, 재연결/재시작 시 체크포인트 이후 로그를
+      get_logs로 먼저 순서대로 처리한 뒤 실시간 로그를 처리
+    """
+
+    def __init__(self, device, checkpoint=None):
+        self.device = device
+        self.checkpoint = checkpoint or ListenerCheckpoint(device.contract_http.address)
+        self.backoff = LISTENER_BACKOFF_INITIAL
+        self._processing = False
+
+    async def run(self):
+        while True:
+            try:
+                await self._run_session()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[listener] 구독 세션 종료: {e}")
+
+            delay = self.backoff * random.uniform(0.5, 1.0)
+            logger.info(f"[listener] {delay:.1f}초 후 재연결")
+            await asyncio.sleep(delay)
+            self.backoff = min(self.backoff * 2, LISTENER_BACKOFF_MAX)
+            await self._reconnect()
+
+    async def _reconnect(self):
+        try:
+            await self.device._connect_socket()
+        except Exception as e:
+            logger.error(f"[listener] WebSocket 재연결 실패: {e}")
+
+    async def _run_session(self):
+        web3_socket = self.device.web3_socket
+        if web3_socket is None or not await web3_socket.is_connected():
+            raise ConnectionError("WebSocket 연결이 되어있지 않습니다")
+
+        # 구독을 먼저 열어야 공백 채우기와 실시간 수신 사이에 빠지는 로그가 없음
+        log_filter = self.device._log_filter()
+        subscription_id = await web3_socket.eth.subscribe("logs", log_filter)
+        logger.info(f"[listener] 로그 구독 시작 (ID: {subscription_id})")
+        self.backoff = LISTENER_BACKOFF_INITIAL
+
+        queue = asyncio.Queue(maxsize=LISTENER_QUEUE_SIZE)
+        tasks = [asyncio.create_task(self._process(queue))]
+        try:
+            await self._catch_up(web3_socket, log_filter, queue)
+            tasks.append(asyncio.create_task(self._receive(web3_socket, queue)))
+            tasks.append(asyncio.create_task(self._heartbeat(web3_socket, queue)))
+
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+            raise ConnectionError("구독 스트림이 종료되었습니다")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _catch_up(self, web3_socket, log_filter, queue):
+        """체크포인트 이후 ~ 현재 head 구간의 로그를 순서대로 큐에 넣음 (최초 실행이면 head부터 시작)"""
+        head = await web3_socket.eth.block_number
+        if self.checkpoint.position is None:
+            self.checkpoint.advance(head, _END_OF_BLOCK)
+            return
+
+        last_block, last_index = self.checkpoint.position
+        count = 0
+        from_block = last_block
+        while from_block <= head:
+            to_block = min(from_block + LISTENER_CATCHUP_CHUNK - 1, head)
+            logs = await web3_socket.eth.get_logs({"fromBlock": from_block, "toBlock": to_block, **log_filter})
+            for log in logs:
+                if (log["blockNumber"], log["logIndex"]) <= (last_block, last_index):
+                    continue
+                await queue.put(log)
+                count += 1
+            from_block = to_block + 1
+        logger.info(f"[listener] 블록 #{last_block}~#{head} 누락 로그 {count}개 재처리")
+
+    async def _receive(self, web3_socket, queue):
+        """구독 메시지를 받아 큐에 넣기만 함 (큐가 가득 차면 처리될 때까지 대기)"""
+        async for response in web3_socket.socket.process_subscriptions():
+            await queue.put(response["result"])
+
+    async def _process(self, queue):
+        """큐의 로그를 순서대로 처리하고 체크포인트 전진"""
+        while True:
+            log = await queue.get()
+            self._processing = True
+            try:
+                await self.device.handle_contract_log(log)
+                if not log.get("removed"):
+                    self.checkpoint.advance(log["blockNumber"], log["logIndex"])
+            finally:
+                self._processing = False
+                queue.task_done()
+
+    async def _heartbeat(self, web3_socket, queue):
+        """주기적으로 head를 조회해 소켓 생존 확인, 처리 대기 로그가 없으면 체크포인트 전진"""
+        while True:
+            await asyncio.sleep(LISTENER_HEARTBEAT_INTERVAL)
+            try:
+                head = await asyncio.wait_for(web3_socket.eth.block_number, LISTENER_HEARTBEAT_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise ConnectionError(f"하트비트 응답 없음 ({LISTENER_HEARTBEAT_TIMEOUT}s)")
+            if queue.empty() and not self._processing and head > LISTENER_CHECKPOINT_LAG:
+                self.checkpoint.advance(head - LISTENER_CHECKPOINT_LAG, _END_OF_BLOCK)
@@ -0,0 +1,145 @@
+import os
+import logging
+import threading
+
+from eth_utils import get_abi_output_types
+from web3 import Web3
+from web3.contract.contract import ContractFunction
+from web3.contract.utils import format_contract_call_return_data_curried
+from web3.exceptions import ContractLogicError
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Multicall3 배포 주소 (대부분의 체인에서 동일, 로컬 체인은 환경변수로 지정)
+MULTICALL3_ADDRESS = os.getenv("MULTICALL3_ADDRESS", "0xcA11bde05977b3631167028862bE2a173976CA11")
+# aggregate3 호출 하나에 담을 최대 호출 수
+MULTICALL_MAX_CALLS = int(os.getenv("MULTICALL_MAX_CALLS", 200))
+
+MULTICALL3_ABI = [
+    {
+        "type": "function",
+        "name": "aggregate3",
+        "stateMutability": "payable",
+        "inputs": [
+            {
+                "name": "calls",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+            }
+        ],
+        "outputs": [
+            {
+                "name": "returnData",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"},
+                ],
+            }
+        ],
+    }
+]
+
+
+class ReadAggregator:
+    """
+    조회 요청 묶음 실행기
+    - 컨트랙트 조회(ContractFunction)는 Multicall3 aggregate3 eth_call 하나로 묶음
+    - 노드 조회(get_balance, chain_id 등)와 multicall 호출은 RPCBatcher의 JSON-RPC 배치 한 번으로 전송
+    - Multicall3가 배포되지 않은 체인이거나 msg.sender가 필요한 조회(sender 지정)는
+      컨트랙트 조회도 개별 eth_call로 같은 배치에 포함
+    """
+
+    def __init__(self, batcher, multicall_address=MULTICALL3_ADDRESS, max_calls=MULTICALL_MAX_CALLS):
+        self.batcher = batcher
+        self.multicall_address = Web3.to_checksum_address(multicall_address)
+        self.max_calls = max(1, max_calls)
+        self._available = None
+        self._lock = threading.Lock()
+
+    @property
+    def multicall_available(self):
+        """Multicall3 컨트랙트 배포 여부 (최초 1회 eth_getCode로 확인 후 캐시)"""
+        with self._lock:
+            if self._available is None:
+                code = self.batcher.execute([lambda w3: w3.eth.get_code(self.multicall_address)])[0]
+                if isinstance(code, Exception):
+                    logger.warning(f"[ReadAggregator] Multicall3 확인 실패 → JSON-RPC 배치 사용: {code}")
+                    return False
+                self._available = len(code) > 0
+                logger.info(
+                    f"[ReadAggregator] Multicall3 {'사용' if self._available else '미배포 → JSON-RPC 배치 사용'}"
+                    f" ({self.multicall_address})"
+                )
+            return self._available
+
+    def read(self, requests, sender=None):
+        """
+        조회 요청 목록을 한 번의 왕복으로 실행
+        :param requests: ContractFunction (예: contract.functions.getUpdateInfo(uid)) 또는
+                         Web3 인스턴스를 받아 호출을 만드는 함수 (예: lambda w3: w3.eth.get_balance(addr))
+        :param sender: 컨트랙트 조회의 from 주소 (msg.sender에 의존하는 조회는 multicall로 묶지 않음)
+        :return: 입력 순서의 결과 목록 (실패한 항목은 예외 객체)
+        """
+        functions = [i for i, request in enumerate(requests) if isinstance(request, ContractFunction)]
+        use_multicall = sender is None and len(functions) > 1 and self.multicall_available
+        transaction = {"from": sender} if sender else None
+
+        batch = []      # RPCBatcher에 넘길 요청
+        slots = []      # batch 항목별 (원래 인덱스 목록, multicall 여부)
+        if use_multicall:
+            for start in range(0, len(functions), self.max_calls):
+                indexes = functions[start:start + self.max_calls]
+                calls = [
+                    (requests[i].address, True, requests[i]._encode_transaction_data()) for i in indexes
+                ]
+                batch.append(lambda w3, calls=calls: self._multicall().functions.aggregate3(calls).call())
+                slots.append((indexes, True))
+        else:
+            for i in functions:
+                function = self.batcher.rebind(requests[i])
+                batch.append(lambda w3, function=function: function.call(transaction))
+                slots.append(([i], False))
+
+        for i, request in enumerate(requests):
+            if not isinstance(request, ContractFunction):
+                batch.append(request)
+                slots.append(([i], False))
+
+        results = [None] * len(requests)
+        for (indexes, is_multicall), response in zip(slots, self.batcher.execute(batch)):
+            if not is_multicall:
+                results[indexes[0]] = response
+            elif isinstance(response, Exception):
+                for i in indexes:
+                    results[i] = response
+            else:
+                for i, (success, return_data) in zip(indexes, response):
+                    results[i] = self._decode(requests[i], success, return_data)
+        return results
+
+    def _multicall(self):
+        return self.batcher.contract_at(self.multicall_address, MULTICALL3_ABI)
+
+    def _decode(self, function, success, return_data):
+        """aggregate3 개별 결과를 일반 .call()과 같은 형태로 디코딩"""
+        if not success:
+            return ContractLogicError(f"multicall: {function.fn_name} 호출 실패 (revert)")
+        try:
+            return format_contract_call_return_data_curried(
+                self.batcher.web3,
+                False,
+                function.abi,
+                function.abi_element_identifier,
+                (),
+                get_abi_output_types(function.abi),
+                return_data,
+            )
+        except Exception as e:
+            return e
@@ -0,0 +1,138 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+from hexbytes import HexBytes
+from web3 import Web3
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 배치 및 캐시 설정 (환경변수로 재정의 가능)
+RPC_BATCH_SIZE = int(os.getenv("RPC_BATCH_SIZE", 100))
+BLOCK_HEADER_CACHE_SIZE = int(os.getenv("BLOCK_HEADER_CACHE_SIZE", 4096))
+
+
+class RPCBatcher:
+    """
+    JSON-RPC 배치 요청 도우미 (web3 batch_requests 사용)
+    - 여러 조회(eth_getBlockByHash, 컨트랙트 eth_call 등)를 RPC_BATCH_SIZE 단위의 배치 한 번으로 전송
+    - 배치 중에는 provider 전체가 배치 모드가 되므로, 다른 스레드의 일반 호출과 섞이지 않도록
+      전용 provider를 사용하고 락으로 직렬화
+    - 배치 요청이 실패하면(노드가 배치 미지원, 항목 하나가 revert 등) 항목별 개별 호출로 대체
+    """
+
+    def __init__(self, provider_url, max_batch_size=RPC_BATCH_SIZE):
+        self.web3 = Web3(Web3.HTTPProvider(provider_url))
+        self.max_batch_size = max(1, max_batch_size)
+        self._lock = threading.Lock()
+        self._contracts = {}
+
+    def bind(self, contract):
+        """다른 Web3 인스턴스의 컨트랙트를 배치 전용 provider에 다시 바인딩 (주소별 1회)"""
+        return self.contract_at(contract.address, contract.abi)
+
+    def rebind(self, function):
+        """다른 Web3 인스턴스의 ContractFunction(인자 포함)을 배치 전용 provider용으로 다시 생성"""
+        bound = self.contract_at(function.address, function.contract_abi)
+        return bound.functions[function.abi_element_identifier](
+            *(function.args or ()), **(function.kwargs or {})
+        )
+
+    def contract_at(self, address, abi):
+        """주소·ABI로 배치 전용 provider에 바인딩된 컨트랙트 반환 (주소별 1회 생성)"""
+        bound = self._contracts.get(address)
+        if bound is None:
+            bound = self.web3.eth.contract(address=address, abi=abi)
+            self._contracts[address] = bound
+        return bound
+
+    def execute(self, requests):
+        """
+        요청 목록을 배치로 실행
+        :param requests: Web3 인스턴스를 받아 호출을 만드는 함수 목록 (예: lambda w3: w3.eth.get_block(n))
+        :return: 입력 순서의 결과 목록 (실패한 항목은 예외 객체)
+        """
+        results = []
+        for start in range(0, len(requests), self.max_batch_size):
+            chunk = requests[start:start + self.max_batch_size]
+            with self._lock:
+                try:
+                    with self.web3.batch_requests() as batch:
+                        for request in chunk:
+                            batch.add(request(self.web3))
+                        results.extend(batch.execute())
+                    continue
+                except Exception as e:
+                    logger.warning(f"[RPCBatcher] 배치 요청 실패 → 개별 호출로 대체 ({len(chunk)}건): {e}")
+
+                for request in chunk:
+                    try:
+                        results.append(request(self.web3))
+                    except Exception as e:
+                        results.append(e)
+        return results
+
+
+class BlockHeaderCache:
+    """
+    블록 해시 → 블록 헤더 LRU 캐시 (호출 간 유지)
+    - 블록 해시로 조회한 블록 내용은 바뀌지 않으므로 reorg와 무관하게 안전하게 재사용
+    - 캐시에 없는 블록만 모아 RPCBatcher 배치 한 번으로 조회
+    """
+
+    def __init__(self, batcher, max_size=BLOCK_HEADER_CACHE_SIZE):
+        self.batcher = batcher
+        self.max_size = max(1, max_size)
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, block_hashes):
+        """블록 해시 목록 → {블록 해시(hex): 블록}"""
+        keys = list(dict.fromkeys(HexBytes(block_hash).hex() for block_hash in block_hashes))
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                block = self._blocks.get(key)
+                if block is None:
+                    missing.append(key)
+                else:
+                    self._blocks.move_to_end(key)
+                    found[key] = block
+
+        if missing:
+            fetched = self.batcher.execute([
+                (lambda w3, key=key: w3.eth.get_block(HexBytes(key))) for key in missing
+            ])
+            with self._lock:
+                for key, block in zip(missing, fetched):
+                    if isinstance(block, Exception):
+                        raise block
+                    found[key] = block
+                    self._blocks[key] = block
+                while len(self._blocks) > self.max_size:
+                    self._blocks.popitem(last=False)
+        return found
+
+    def get_by_number(self, number):
+        """
+        블록 번호로 조회 (번호→블록은 reorg로 바뀔 수 있으므로 매번 노드에 조회)
+        - 받은 블록은 해시 기준으로 캐시에 넣어 이후 해시 조회(타임스탬프 등)에 재사용
+        """
+        (block,) = self.batcher.execute([lambda w3: w3.eth.get_block(number)])
+        if isinstance(block, Exception):
+            raise block
+        key = HexBytes(block["hash"]).hex()
+        with self._lock:
+            self._blocks[key] = block
+            self._blocks.move_to_end(key)
+            while len(self._blocks) > self.max_size:
+                self._blocks.popitem(last=False)
+        return block
+
+    def timestamps(self, block_hashes):
+        """블록 해시 목록 → {블록 해시(hex): 타임스탬프}"""
+        return {key: block["timestamp"] for key, block in self.get_many(block_hashes).items()}
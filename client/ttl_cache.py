@@ -0,0 +1,136 @@
+import time
+import asyncio
+import logging
+import threading
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class _Flight:
+    """진행 중인 로드 1건 (같은 로드를 기다리는 호출자들이 결과를 공유)"""
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlightCache:
+    """
+    값 하나를 보관하는 TTL 캐시 (single-flight)
+    - 만료되었거나 무효화된 상태에서 동시에 여러 요청이 들어와도 loader는 한 번만 실행하고
+      나머지 호출자는 그 결과(또는 예외)를 함께 받음
+    - invalidate()는 캐시 값을 버리고 진행 중인 로드와도 분리하여, 이후 호출은 새로 로드
+      (무효화 이전에 시작된 로드 결과는 캐시에 저장하지 않음)
+    - 로드 실패는 캐시하지 않음
+    """
+
+    def __init__(self, loader, ttl, name="cache"):
+        self.loader = loader
+        self.ttl = ttl
+        self.name = name
+        self._lock = threading.Lock()
+        self._value = _MISSING
+        self._expires = 0.0
+        self._generation = 0
+        self._flight = None
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """invalidate() 때 함께 호출할 함수 등록 (예: 같은 데이터를 보관하는 다른 캐시 무효화)"""
+        self._subscribers.append(callback)
+
+    def get(self):
+        with self._lock:
+            if self._value is not _MISSING and time.monotonic() < self._expires:
+                return self._value
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight(self._generation)
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self.loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and flight.generation == self._generation:
+                    self._value = flight.value
+                    self._expires = time.monotonic() + self.ttl
+                if self._flight is flight:
+                    self._flight = None
+            flight.done.set()
+        return flight.value
+
+    def invalidate(self, reason=None):
+        """캐시 값 폐기 (다음 get()에서 새로 로드)"""
+        with self._lock:
+            self._generation += 1
+            self._value = _MISSING
+            self._flight = None
+        if reason:
+            logger.info(f"[{self.name}] 캐시 무효화: {reason}")
+        for callback in self._subscribers:
+            callback(reason)
+
+
+class AsyncSingleFlightCache:
+    """
+    SingleFlightCache의 asyncio 버전 (loader는 코루틴 함수)
+    - 동시에 들어온 get()은 하나의 로드 태스크를 함께 기다림 (한 호출자가 취소되어도 로드는 계속)
+    - invalidate()는 다른 스레드에서 호출해도 안전 (예: SingleFlightCache.subscribe로 연결)
+    """
+
+    def __init__(self, loader, ttl, name="cache"):
+        self.loader = loader
+        self.ttl = ttl
+        self.name = name
+        self._lock = threading.Lock()
+        self._value = _MISSING
+        self._expires = 0.0
+        self._generation = 0
+        self._task = None
+
+    async def get(self):
+        with self._lock:
+            if self._value is not _MISSING and time.monotonic() < self._expires:
+                return self._value
+            task = self._task
+            if task is None or task.get_loop() is not asyncio.get_running_loop():
+                task = self._task = asyncio.ensure_future(self._load(self._generation))
+        return await asyncio.shield(task)
+
+    async def _load(self, generation):
+        try:
+            value = await self.loader()
+        finally:
+            with self._lock:
+                if self._task is asyncio.current_task():
+                    self._task = None
+        with self._lock:
+            if generation == self._generation:
+                self._value = value
+                self._expires = time.monotonic() + self.ttl
+        return value
+
+    def invalidate(self, reason=None):
+        """캐시 값 폐기 (다음 get()에서 새로 로드)"""
+        with self._lock:
+            self._generation += 1
+            self._value = _MISSING
+            self._task = None
+        if reason:
+            logger.info(f"[{self.name}] 캐시 무효화: {reason}")
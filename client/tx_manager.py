@@ -0,0 +1,367 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 트랜잭션 처리 설정 (환경변수로 재정의 가능)
+TX_RECEIPT_POLL_INTERVAL = float(os.getenv("TX_RECEIPT_POLL_INTERVAL", 1))
+TX_RECEIPT_TIMEOUT = float(os.getenv("TX_RECEIPT_TIMEOUT", 120))
+TX_HISTORY_SIZE = int(os.getenv("TX_HISTORY_SIZE", 256))
+
+# 노드가 nonce 불일치로 거부할 때의 오류 메시지 (geth, ganache, hardhat, anvil)
+NONCE_ERRORS = ("nonce too low", "already known", "replacement transaction underpriced", "invalid nonce")
+
+# 트랜잭션 상태
+STATUS_PENDING = "pending"
+STATUS_SUCCESS = "success"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+
+
+def _is_nonce_error(error):
+    return any(message in str(error).lower() for message in NONCE_ERRORS)
+
+
+def _new_record(kind, tx_hash, meta=None):
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "tx_hash": tx_hash.hex(),
+        "status": STATUS_PENDING,
+        "submittedAt": int(time.time()),
+        "blockNumber": None,
+        **(meta or {}),
+    }
+
+
+def _trim_history(records, pending):
+    """TX_HISTORY_SIZE를 넘는 오래된 기록 정리 (영수증 대기 중인 기록은 완료될 때까지 보관)"""
+    excess = len(records) - TX_HISTORY_SIZE
+    if excess <= 0:
+        return
+    for tx_id in [tx_id for tx_id in records if tx_id not in pending][:excess]:
+        del records[tx_id]
+
+
+class NonceManager:
+    """
+    계정별 로컬 nonce 관리
+    - 최초 1회(또는 재동기화 후) 노드의 pending 트랜잭션 수로 시작하고 이후에는 로컬에서 증가
+    - 전송에 실패해 쓰이지 않은 nonce는 빈 번호(gap)로 보관하고 다음 예약 때 가장 작은 번호부터 재사용
+    - nonce 오류나 영수증 시간 초과 시 resync()로 노드 기준으로 다시 맞춤
+    """
+
+    def __init__(self, web3, address):
+        self.web3 = web3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next = None
+        self._gaps = set()
+
+    def reserve(self):
+        with self._lock:
+            if self._next is None:
+                self._next = self.web3.eth.get_transaction_count(self.address, "pending")
+                self._gaps.clear()
+            if self._gaps:
+                nonce = min(self._gaps)
+                self._gaps.discard(nonce)
+                return nonce
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def release(self, nonce):
+        """전송되지 않은 nonce 반환 (마지막 번호면 되돌리고, 중간 번호면 gap으로 보관)"""
+        with self._lock:
+            if self._next is None:
+                return
+            if nonce == self._next - 1:
+                self._next -= 1
+                # 끝에 붙어 있는 gap도 함께 정리
+                while self._next - 1 in self._gaps:
+                    self._next -= 1
+                    self._gaps.discard(self._next)
+            elif nonce < self._next:
+                self._gaps.add(nonce)
+
+    def resync(self):
+        """다음 예약 때 노드의 pending nonce를 다시 조회"""
+        with self._lock:
+            self._next = None
+            self._gaps.clear()
+
+
+class TransactionManager:
+    """
+    트랜잭션 전송 파이프라인
+    - chain_id는 최초 1회만 조회해 캐시
+    - nonce 예약 → 트랜잭션 구성 → 서명 → 전송을 락으로 직렬화 (동시 설치 간 nonce 경합 제거)
+    - 전송 직후 기록(tx_id, tx_hash, pending)을 반환하고, 영수증은 백그라운드 스레드 하나가 폴링
+    - 상태가 바뀔 때마다 status_callback(기록)으로 알림 (예: SocketIO emit)
+    """
+
+    def __init__(self, web3, address, private_key, status_callback=None,
+                 poll_interval=TX_RECEIPT_POLL_INTERVAL, timeout=TX_RECEIPT_TIMEOUT):
+        self.web3 = web3
+        self.address = address
+        self.private_key = private_key
+        self.status_callback = status_callback
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.nonces = NonceManager(web3, address)
+        self._chain_id = None
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+        self._pending = {}   # tx_id → (제출 시각, 완료 이벤트, on_complete)
+        self._poller = None
+
+    @property
+    def chain_id(self):
+        if self._chain_id is None:
+            self._chain_id = self.web3.eth.chain_id
+        return self._chain_id
+
+    def submit(self, build, kind, meta=None, on_complete=None):
+        """
+        트랜잭션 전송 → 기록 dict (status=pending)
+        :param build: {"chainId", "nonce", "from"}를 받아 서명할 트랜잭션 dict를 반환하는 함수
+        :param kind: 트랜잭션 종류 (purchase, refund, confirm 등)
+        :param on_complete: 영수증 확인(또는 시간 초과) 후 기록을 받아 호출할 함수
+        """
+        with self._send_lock:
+            tx_hash = self._sign_and_send(build)
+
+        record = _new_record(kind, tx_hash, meta)
+        with self._lock:
+            self._records[record["id"]] = record
+            self._pending[record["id"]] = (time.monotonic(), threading.Event(), on_complete)
+            _trim_history(self._records, self._pending)
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_receipts, daemon=True)
+                self._poller.start()
+
+        logger.info(f"[TransactionManager] {kind} 트랜잭션 전송 - TX 해시: {record['tx_hash']}")
+        self._notify(record)
+        return dict(record)
+
+    def _sign_and_send(self, build):
+        """nonce 예약 후 서명·전송 (nonce 오류 시 노드 기준으로 재동기화하여 1회 재시도)"""
+        for attempt in range(2):
+            nonce = self.nonces.reserve()
+            try:
+                txn = build({"chainId": self.chain_id, "nonce": nonce, "from": self.address})
+                signed_txn = self.web3.eth.account.sign_transaction(txn, private_key=self.private_key)
+                return self.web3.eth.send_raw_transaction(signed_txn.raw_transaction)
+            except Exception as e:
+                if attempt == 0 and _is_nonce_error(e):
+                    logger.warning(f"[TransactionManager] nonce {nonce} 거부됨 → 재동기화 후 재시도: {e}")
+                    self.nonces.resync()
+                    continue
+                self.nonces.release(nonce)
+                raise
+
+    def wait(self, tx_id, timeout=None):
+        """
+        영수증 확인(또는 시간 초과)까지 대기 → 기록 dict
+        :param timeout: 최대 대기 시간(초, 생략 시 영수증 대기 시간 self.timeout)
+        """
+        with self._lock:
+            pending = self._pending.get(tx_id)
+        if pending is not None:
+            pending[1].wait(self.timeout if timeout is None else timeout)
+        return self.get(tx_id)
+
+    def get(self, tx_id):
+        with self._lock:
+            record = self._records.get(tx_id)
+            return dict(record) if record else None
+
+    def _poll_receipts(self):
+        """대기 중인 트랜잭션이 없어질 때까지 영수증 폴링"""
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._pending:
+                    self._poller = None
+                    return
+                pending = list(self._pending.items())
+
+            for tx_id, (submitted, done, on_complete) in pending:
+                with self._lock:
+                    record = self._records.get(tx_id)
+                    tx_hash = record["tx_hash"] if record else None
+                if record is None:
+                    # 기록이 없으면 더 추적할 수 없으므로 대기를 끝냄 (wait 호출자가 막히지 않도록)
+                    logger.warning(f"[TransactionManager] 트랜잭션 기록 없음 → 추적 중단: {tx_id}")
+                    with self._lock:
+                        self._pending.pop(tx_id, None)
+                    done.set()
+                    continue
+
+                try:
+                    receipt = self.web3.eth.get_transaction_receipt(tx_hash)
+                except TransactionNotFound:
+                    receipt = None
+                except Exception as e:
+                    logger.warning(f"[TransactionManager] 영수증 조회 실패 ({tx_hash}): {e}")
+                    receipt = None
+
+                if receipt is None and time.monotonic() - submitted <= self.timeout:
+                    continue
+
+                with self._lock:
+                    if receipt is not None:
+                        record["status"] = STATUS_SUCCESS if receipt["status"] == 1 else STATUS_FAILED
+                        record["blockNumber"] = receipt["blockNumber"]
+                    else:
+                        record["status"] = STATUS_TIMEOUT
+                    self._pending.pop(tx_id, None)
+                    record = dict(record)
+                if receipt is None:
+                    # 누락(드롭)된 트랜잭션일 수 있으므로 nonce를 노드 기준으로 다시 맞춤
+                    self.nonces.resync()
+
+                logger.info(f"[TransactionManager] {record['kind']} 트랜잭션 {record['status']} - TX 해시: {tx_hash}")
+                if on_complete:
+                    try:
+                        on_complete(dict(record))
+                    except Exception as e:
+                        logger.error(f"[TransactionManager] 완료 콜백 오류: {e}")
+                done.set()
+                self._notify(record)
+
+    def _notify(self, record):
+        if self.status_callback:
+            try:
+                self.status_callback(dict(record))
+            except Exception as e:
+                logger.error(f"[TransactionManager] 상태 알림 실패: {e}")
+
+
+class AsyncTransactionManager:
+    """
+    TransactionManager의 asyncio 버전 (AsyncWeb3 사용)
+    - 같은 계정의 NonceManager를 동기 TransactionManager와 공유해 두 경로가 같은 nonce를 쓰지 않음
+    - 영수증은 트랜잭션마다 asyncio 태스크가 wait_for_transaction_receipt로 대기
+    - 기록 형식과 status_callback 호출 시점은 TransactionManager와 같음
+    """
+
+    def __init__(self, web3, address, private_key, nonces, status_callback=None,
+                 poll_interval=TX_RECEIPT_POLL_INTERVAL, timeout=TX_RECEIPT_TIMEOUT):
+        self.web3 = web3
+        self.address = address
+        self.private_key = private_key
+        self.nonces = nonces
+        self.status_callback = status_callback
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._chain_id = None
+        self._send_lock = asyncio.Lock()
+        self._records = OrderedDict()
+        self._tasks = {}
+
+    async def chain_id(self):
+        if self._chain_id is None:
+            self._chain_id = await self.web3.eth.chain_id
+        return self._chain_id
+
+    async def submit(self, build, kind, meta=None, on_complete=None):
+        """
+        트랜잭션 전송 → 기록 dict (status=pending)
+        :param build: {"chainId", "nonce", "from"}를 받아 서명할 트랜잭션 dict를 반환하는 코루틴 함수
+        """
+        async with self._send_lock:
+            tx_hash = await self._sign_and_send(build)
+
+        record = _new_record(kind, tx_hash, meta)
+        self._records[record["id"]] = record
+        self._tasks[record["id"]] = asyncio.ensure_future(self._track(record, on_complete))
+        _trim_history(self._records, self._tasks)
+
+        logger.info(f"[AsyncTransactionManager] {kind} 트랜잭션 전송 - TX 해시: {record['tx_hash']}")
+        self._notify(record)
+        return dict(record)
+
+    async def _sign_and_send(self, build):
+        """nonce 예약 후 서명·전송 (nonce 오류 시 노드 기준으로 재동기화하여 1회 재시도)"""
+        for attempt in range(2):
+            # 최초 예약은 노드 조회를 포함하므로 이벤트 루프 밖에서 실행
+            nonce = await asyncio.to_thread(self.nonces.reserve)
+            try:
+                txn = await build({"chainId": await self.chain_id(), "nonce": nonce, "from": self.address})
+                signed_txn = self.web3.eth.account.sign_transaction(txn, private_key=self.private_key)
+                return await self.web3.eth.send_raw_transaction(signed_txn.raw_transaction)
+            except Exception as e:
+                if attempt == 0 and _is_nonce_error(e):
+                    logger.warning(f"[AsyncTransactionManager] nonce {nonce} 거부됨 → 재동기화 후 재시도: {e}")
+                    self.nonces.resync()
+                    continue
+                self.nonces.release(nonce)
+                raise
+
+    async def _track(self, record, on_complete):
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                try:
+                    receipt = await self.web3.eth.wait_for_transaction_receipt(
+                        record["tx_hash"],
+                        timeout=max(0.0, deadline - time.monotonic()),
+                        poll_latency=self.poll_interval,
+                    )
+                except TimeExhausted:
+                    receipt = None
+                except Exception as e:
+                    logger.warning(f"[AsyncTransactionManager] 영수증 조회 실패 ({record['tx_hash']}): {e}")
+                    if time.monotonic() < deadline:
+                        await asyncio.sleep(self.poll_interval)
+                        continue
+                    receipt = None
+
+                if receipt is not None:
+                    record["status"] = STATUS_SUCCESS if receipt["status"] == 1 else STATUS_FAILED
+                    record["blockNumber"] = receipt["blockNumber"]
+                else:
+                    # 누락(드롭)된 트랜잭션일 수 있으므로 nonce를 노드 기준으로 다시 맞춤
+                    record["status"] = STATUS_TIMEOUT
+                    self.nonces.resync()
+                break
+        finally:
+            self._tasks.pop(record["id"], None)
+
+        logger.info(f"[AsyncTransactionManager] {record['kind']} 트랜잭션 {record['status']} - TX 해시: {record['tx_hash']}")
+        if on_complete:
+            try:
+                on_complete(dict(record))
+            except Exception as e:
+                logger.error(f"[AsyncTransactionManager] 완료 콜백 오류: {e}")
+        self._notify(record)
+
+    async def wait(self, tx_id):
+        """영수증 확인(또는 시간 초과)까지 대기 → 기록 dict"""
+        task = self._tasks.get(tx_id)
+        if task is not None:
+            await asyncio.shield(task)
+        return self.get(tx_id)
+
+    def get(self, tx_id):
+        record = self._records.get(tx_id)
+        return dict(record) if record else None
+
+    def _notify(self, record):
+        if self.status_callback:
+            try:
+                self.status_callback(dict(record))
+            except Exception as e:
+                logger.error(f"[AsyncTransactionManager] 상태 알림 실패: {e}")
@@ -0,0 +1,71 @@
+"""
+CP-ABE 암호문 역직렬화 벤치마크 (범용 walker vs BSW07 스키마 기반)
+
+사용법:
+    python -m crypto.cpabe.bench_deserialize --attributes 5,20,50 --iterations 200
+charm-crypto가 설치된 환경(Docker 이미지)에서 실행합니다.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from charm.core.engine.util import objectToBytes
+from charm.toolbox.pairinggroup import GT
+
+from crypto.cpabe.cpabe import CPABETools
+
+
+def serialize_ciphertext(ciphertext, group):
+    """제조사 측과 같은 방식으로 암호문을 JSON 직렬화 (그룹 원소 → base64)"""
+    def serialize(obj):
+        if isinstance(obj, dict):
+            return {k: serialize(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [serialize(e) for e in obj]
+        if isinstance(obj, str):
+            return obj
+        return base64.b64encode(objectToBytes(obj, group)).decode()
+    return json.dumps(serialize(ciphertext))
+
+
+def build_ciphertext(tools, attribute_count):
+    """attribute_count개 속성 OR 정책으로 임의 GT 원소를 암호화한 JSON 암호문 생성"""
+    attributes = [f"ATTR{i}" for i in range(attribute_count)]
+    policy = "(" + " or ".join(attributes) + ")"
+    pk, _ = tools.cpabe.setup()
+    message = tools.group.random(GT)
+    ciphertext = tools.cpabe.encrypt(pk, message, policy)
+    return serialize_ciphertext(ciphertext, tools.group)
+
+
+def measure(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CP-ABE 암호문 역직렬화 벤치마크")
+    parser.add_argument("--attributes", default="5,20,50", help="정책 속성 수 목록 (쉼표 구분)")
+    parser.add_argument("--iterations", type=int, default=200, help="측정 반복 횟수")
+    args = parser.parse_args()
+
+    tools = CPABETools()
+    print(f"{'속성 수':>8} {'범용 walker (ms)':>18} {'스키마 기반 (ms)':>18} {'속도 향상':>10}")
+    for attribute_count in [int(n) for n in args.attributes.split(",")]:
+        encrypted_data = json.loads(build_ciphertext(tools, attribute_count))
+        generic_ms = measure(lambda: tools._deserialize_generic(encrypted_data), args.iterations)
+        schema_ms = measure(lambda: tools.deserialize_ciphertext(encrypted_data), args.iterations)
+        print(f"{attribute_count:>8} {generic_ms:>18.3f} {schema_ms:>18.3f} {generic_ms / schema_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,49 @@
 from charm.toolbox.pairinggroup import PairingGroup, GT
 from charm.schemes.abenc.abenc_bsw07 import CPabe_BSW07
-from charm.core.engine.util import bytesToObject
+from charm.core.engine.util import bytesToObject, objectToBytes
 import os
 import json
 import logging
 import base64
+import atexit
+import multiprocessing
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+from crypto.cpabe.keyfile import is_binary_key_file, load_key_file
+from crypto.cpabe.prepared import PreparedSecretKey
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# BSW07 암호문 구조: 그룹 원소 필드 / 속성별 그룹 원소 맵 / 일반 값 필드
+CIPHERTEXT_ELEMENT_FIELDS = ("C_tilde", "C")
+CIPHERTEXT_ELEMENT_MAPS = ("Cy", "Cyp")
+CIPHERTEXT_PLAIN_FIELDS = ("policy", "attributes")
+
+# decrypt_many 프로세스 풀 설정 (환경변수로 재정의 가능)
+CPABE_DECRYPT_PROCESSES = int(os.getenv("CPABE_DECRYPT_PROCESSES", os.cpu_count() or 1))
+CPABE_PARALLEL_MIN_BATCH = int(os.getenv("CPABE_PARALLEL_MIN_BATCH", 4))
+# 워커 시작 방식: eventlet 몽키패치·다중 스레드 프로세스에서 fork 시 상속된 락으로 교착될 수 있어 spawn/forkserver만 사용
+CPABE_POOL_START_METHOD = os.getenv("CPABE_POOL_START_METHOD", "spawn")
+
 class CPABETools:
-    def __init__(self):
+    def __init__(self, prepared_keys=None):
         """
         CP-ABE(BSW07) 스킴 초기화 클래스.
         - PairingGroup("SS512")를 사용하여 안전한 암호연산 환경 생성
         - CPabe_BSW07 스킴을 로딩하여 정책 기반 암호화/복호화 기능 사용 가능
+        - prepared_keys: 디바이스 비밀키 준비(사전계산·정책 경로 캐시) 모드 사용 여부
+          (생략 시 환경변수 CPABE_PREPARED_KEY, 기본 사용)
         """
         self.group = PairingGroup("SS512")
         self.cpabe = CPabe_BSW07(self.group)
         self.charm_installed = True
+        if prepared_keys is None:
+            prepared_keys = os.getenv("CPABE_PREPARED_KEY", "1") != "0"
+        self.prepared_keys = prepared_keys
+        self._prepared = None
         logger.info("Charm-crypto 라이브러리 로드 성공. CP-ABE 기능 활성화됨.")
 
     def decrypt(self, encrypted_key_json, public_key, device_secret_key):
@@ -35,24 +60,14 @@ class CPABETools:
             else:
                 encrypted_data = encrypted_key_json
 
-            # base64 문자열을 그룹 원소로 변환
-            def deserialize_element(obj):
-                if isinstance(obj, str):
-                    try:
-                        return bytesToObject(base64.b64decode(obj), self.group)
-                    except Exception:
-                        return obj  # 단순 문자열은 그대로 유지
-                elif isinstance(obj, list):
-                    return [deserialize_element(e) for e in obj]
-                elif isinstance(obj, dict):
-                    return {k: deserialize_element(v) for k, v in obj.items()}
-                else:
-                    return obj
-
-            deserialized = deserialize_element(encrypted_data)
-
-            # 복호화 실행
-            decrypted_result = self.cpabe.decrypt(public_key, device_secret_key, deserialized)
+            # base64 문자열을 그룹 원소로 변환 (BSW07 구조를 알고 있으므로 원소 필드만 디코드)
+            deserialized = self.deserialize_ciphertext(encrypted_data)
+
+            # 복호화 실행 (준비된 키 모드면 캐시된 정책 경로와 사전계산된 원소 재사용)
+            if self.prepared_keys or isinstance(device_secret_key, PreparedSecretKey):
+                decrypted_result = self.prepare_key(device_secret_key).decrypt(deserialized)
+            else:
+                decrypted_result = self.cpabe.decrypt(public_key, device_secret_key, deserialized)
             if isinstance(decrypted_result, bool):
                 logger.error("접근 정책이 충족되지 않음")
                 return None
@@ -61,10 +76,149 @@ class CPABETools:
             logger.error(f"CP-ABE 복호화 실패: {e}")
             return None
 
+    def decrypt_many(self, encrypted_keys, public_key, device_secret_key, processes=None):
+        """
+        여러 암호문(JSON 문자열 또는 dict)을 한 번에 복호화.
+        - 동일한 암호문은 한 번만 복호화
+        - 정책(policy)별로 묶어 정책 만족 경로 계산을 그룹 내에서 공유
+        - 고유 암호문이 CPABE_PARALLEL_MIN_BATCH 이상이고 정책 그룹이 2개 이상이면
+          페어링 연산을 장기 유지되는 프로세스 풀로 분산 (정책 그룹 1개는 호출 프로세스에서 복호화)
+        :return: 입력 순서와 같은 결과 목록 (복호화 실패/정책 불충족 항목은 None)
+        """
+        # 1. 중복 제거 (정규화된 JSON 문자열 기준)
+        unique = {}
+        order = []
+        for encrypted_key in encrypted_keys:
+            if isinstance(encrypted_key, str):
+                canonical = encrypted_key
+            else:
+                canonical = json.dumps(encrypted_key, sort_keys=True)
+            order.append(canonical)
+            unique.setdefault(canonical, None)
+
+        # 2. 정책별 그룹화
+        groups = {}
+        for canonical in unique:
+            try:
+                policy = json.loads(canonical)["policy"]
+            except Exception as e:
+                logger.error(f"CP-ABE 암호문 파싱 실패: {e}")
+                continue
+            groups.setdefault(policy, []).append(canonical)
+
+        logger.info(
+            f"[decrypt_many] 암호문 {len(order)}개 → 고유 {len(unique)}개, 정책 그룹 {len(groups)}개"
+        )
+
+        # 3. 정책 그룹 단위 복호화 (그룹 안에서 만족 경로 1회 계산)
+        processes = CPABE_DECRYPT_PROCESSES if processes is None else processes
+        if processes > 1 and len(groups) > 1 and len(unique) >= CPABE_PARALLEL_MIN_BATCH:
+            results = self._decrypt_groups_parallel(groups, device_secret_key, processes)
+        else:
+            results = {}
+            prepared = self.prepare_key(device_secret_key)
+            for policy, members in groups.items():
+                if prepared.satisfying_path(policy) is False:
+                    logger.error(f"접근 정책이 충족되지 않음: {policy}")
+                    continue
+                for canonical in members:
+                    results[canonical] = self.decrypt(canonical, public_key, prepared)
+
+        return [results.get(canonical) for canonical in order]
+
+    def _decrypt_groups_parallel(self, groups, device_secret_key, processes):
+        """정책 그룹을 워커 수에 맞게 나누어 공유 프로세스 풀에서 복호화 → {암호문: GT 원소}"""
+        tasks = []
+        for policy, members in groups.items():
+            # 큰 그룹은 워커 수만큼 분할 (각 조각은 같은 정책 → 워커에서 경로 1회 계산)
+            size = max(1, -(-len(members) // processes))
+            for start in range(0, len(members), size):
+                tasks.append(members[start:start + size])
+
+        if isinstance(device_secret_key, PreparedSecretKey):
+            device_secret_key = device_secret_key.device_secret_key
+        serialized_key = self.serialize_secret_key(device_secret_key)
+        results = {}
+        # 워커는 풀과 함께 유지되므로 비밀키는 작업마다 전달 (워커가 직렬화된 키 기준으로 준비된 키 캐시)
+        executor = _get_decrypt_pool(processes)
+        outputs_list = executor.map(_decrypt_worker, [serialized_key] * len(tasks), tasks)
+        for members, outputs in zip(tasks, outputs_list):
+            for canonical, output in zip(members, outputs):
+                if output is not None:
+                    results[canonical] = bytesToObject(output, self.group)
+        return results
+
+    def serialize_secret_key(self, device_secret_key):
+        """디바이스 비밀키를 JSON(base64) 호환 구조로 직렬화 (프로세스 간 전달용)"""
+        def serialize(obj, key_name=None):
+            if key_name == "S":
+                return list(obj)
+            if isinstance(obj, Mapping):
+                return {k: serialize(v, k) for k, v in obj.items()}
+            if isinstance(obj, str):
+                return obj
+            return base64.b64encode(objectToBytes(obj, self.group)).decode()
+        return serialize(device_secret_key)
+
+    def prepare_key(self, device_secret_key):
+        """
+        디바이스 비밀키에 대한 PreparedSecretKey 반환.
+        - 같은 비밀키 객체(키 캐시가 유지하는 객체)면 이전에 준비한 결과 재사용
+        - 키가 교체되면(다른 객체) 새로 준비
+        """
+        if isinstance(device_secret_key, PreparedSecretKey):
+            return device_secret_key
+        prepared = self._prepared
+        if prepared is None or prepared.device_secret_key is not device_secret_key:
+            prepared = PreparedSecretKey(self.group, device_secret_key)
+            self._prepared = prepared
+        return prepared
+
+    def deserialize_ciphertext(self, encrypted_data):
+        """
+        BSW07 암호문 구조(C_tilde, C, Cy, Cyp, policy, attributes)에 맞춰 역직렬화.
+        - 그룹 원소 필드만 base64 → bytesToObject 변환, policy/attributes는 그대로 사용
+        - 예외를 이용한 원소 판별이 없어 속성 수가 많아도 비용이 원소 수에만 비례
+        - 구조가 다르면 범용 역직렬화(_deserialize_generic)로 처리
+        """
+        required = CIPHERTEXT_ELEMENT_FIELDS + CIPHERTEXT_ELEMENT_MAPS + CIPHERTEXT_PLAIN_FIELDS
+        if not isinstance(encrypted_data, dict) or not all(k in encrypted_data for k in required):
+            logger.warning("알 수 없는 암호문 구조 → 범용 역직렬화 사용")
+            return self._deserialize_generic(encrypted_data)
+
+        group = self.group
+        deserialized = dict(encrypted_data)  # 알 수 없는 추가 필드는 그대로 유지
+        for field in CIPHERTEXT_ELEMENT_FIELDS:
+            deserialized[field] = bytesToObject(base64.b64decode(encrypted_data[field]), group)
+        for field in CIPHERTEXT_ELEMENT_MAPS:
+            deserialized[field] = {
+                attr: bytesToObject(base64.b64decode(value), group)
+                for attr, value in encrypted_data[field].items()
+            }
+        return deserialized
+
+    def _deserialize_generic(self, obj):
+        """구조를 모르는 값 역직렬화: 모든 문자열에 대해 그룹 원소 변환을 시도하고 실패 시 그대로 유지"""
+        if isinstance(obj, str):
+            try:
+                return bytesToObject(base64.b64decode(obj), self.group)
+            except Exception:
+                return obj  # 단순 문자열은 그대로 유지
+        elif isinstance(obj, list):
+            return [self._deserialize_generic(e) for e in obj]
+        elif isinstance(obj, dict):
+            return {k: self._deserialize_generic(v) for k, v in obj.items()}
+        else:
+            return obj
+
     def load_public_key(self, public_key_file):
         """
         저장된 공개키(JSON base64)를 로드하여 복원.
+        - 바이너리 키 컨테이너(keyfile.py)면 그룹 원소를 접근 시점에 역직렬화하는 매핑 반환
         """
+        if is_binary_key_file(public_key_file):
+            return load_key_file(public_key_file, self.group)
+
         with open(public_key_file, "r") as f:
             serialized_pk = json.load(f)
         pk = {k: bytesToObject(base64.b64decode(v), self.group) for k, v in serialized_pk.items()}
@@ -76,10 +230,18 @@ class CPABETools:
         - 주의: 비밀키 내부에는 'S'라는 속성 리스트가 포함되어 있음
         → 이는 단순 문자열 리스트이므로 base64 decode 하면 오류 발생
         → 따라서 key_name == "S"일 때는 그대로 반환
+        - 바이너리 키 컨테이너(keyfile.py)면 그룹 원소를 접근 시점에 역직렬화하는 매핑 반환
         """
+        if is_binary_key_file(device_secret_key_file):
+            return load_key_file(device_secret_key_file, self.group)
+
         with open(device_secret_key_file, "r") as f:
             serialized_key = json.load(f)
 
+        return self.deserialize_secret_key(serialized_key)
+
+    def deserialize_secret_key(self, serialized_key):
+        """JSON(base64) 구조의 디바이스 비밀키를 그룹 원소로 복원 ('S' 속성 리스트는 그대로)"""
         def deserialize_element(obj, key_name=None):
             # 'S' 키는 속성 리스트 → 그대로 문자열 반환
             if key_name == "S":
@@ -104,3 +266,66 @@ class CPABETools:
         PairingGroup 객체 반환 (외부에서 GT 요소 생성 등 활용 가능).
         """
         return self.group
+
+
+# decrypt_many 워커 프로세스 상태 (프로세스마다 1회 초기화)
+_decrypt_pool = None
+_decrypt_pool_size = 0
+_decrypt_pool_lock = threading.Lock()
+
+
+def _get_decrypt_pool(processes):
+    """decrypt_many 공유 프로세스 풀 반환 (최초 호출 시 spawn/forkserver 컨텍스트로 생성, 워커 수 변경 시 재생성)"""
+    global _decrypt_pool, _decrypt_pool_size
+    with _decrypt_pool_lock:
+        if _decrypt_pool is None or _decrypt_pool_size != processes:
+            if _decrypt_pool is not None:
+                _decrypt_pool.shutdown(wait=False)
+            start_method = CPABE_POOL_START_METHOD
+            if start_method not in ("spawn", "forkserver"):
+                logger.warning(f"[CPABETools] 지원하지 않는 풀 시작 방식 {start_method} → spawn 사용")
+                start_method = "spawn"
+            _decrypt_pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context(start_method),
+            )
+            _decrypt_pool_size = processes
+            logger.info(f"[CPABETools] 복호화 프로세스 풀 생성: 워커 {processes}개 ({start_method})")
+        return _decrypt_pool
+
+
+@atexit.register
+def _shutdown_decrypt_pool():
+    """프로세스 종료 시 공유 풀 정리"""
+    global _decrypt_pool
+    with _decrypt_pool_lock:
+        if _decrypt_pool is not None:
+            _decrypt_pool.shutdown(wait=False, cancel_futures=True)
+            _decrypt_pool = None
+
+
+_worker_tools = None
+_worker_key = None
+_worker_key_source = None
+
+
+def _load_worker_key(serialized_key):
+    """워커 프로세스의 준비된 키 로드 (같은 비밀키면 재사용, 키가 바뀌면 다시 역직렬화)"""
+    global _worker_tools, _worker_key, _worker_key_source
+    if _worker_tools is None:
+        _worker_tools = CPABETools(prepared_keys=True)
+    key_source = json.dumps(serialized_key, sort_keys=True)
+    if key_source != _worker_key_source:
+        _worker_key = _worker_tools.prepare_key(_worker_tools.deserialize_secret_key(serialized_key))
+        _worker_key_source = key_source
+    return _worker_key
+
+
+def _decrypt_worker(serialized_key, members):
+    """같은 정책의 암호문 묶음을 복호화 → objectToBytes 결과 목록 (실패 시 None)"""
+    key = _load_worker_key(serialized_key)
+    outputs = []
+    for canonical in members:
+        result = _worker_tools.decrypt(canonical, None, key)
+        outputs.append(None if result is None else objectToBytes(result, _worker_tools.group))
+    return outputs
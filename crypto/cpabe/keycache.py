@@ -0,0 +1,75 @@
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class CPABEKeyCache:
+    """
+    역직렬화된 CP-ABE 키(공개키, 디바이스 비밀키) 메모리 캐시
+    - 최초 1회만 파일을 읽고 그룹 원소로 역직렬화
+    - 이후에는 키 파일의 (inode, mtime, 크기)가 바뀐 경우에만 다시 로드 → 재시작 없이 키 교체 반영
+    - 새 키 파일 로드에 실패하면 기존 키를 유지하고 다음 호출에서 재시도
+    """
+
+    def __init__(self, cpabe, public_key_file, device_secret_key_file):
+        self.cpabe = cpabe
+        self.public_key_file = public_key_file
+        self.device_secret_key_file = device_secret_key_file
+        self._lock = threading.Lock()
+        self._public_key = None
+        self._public_key_signature = None
+        self._device_secret_key = None
+        self._device_secret_key_signature = None
+
+    @staticmethod
+    def _signature(path):
+        """파일 변경 감지용 서명 (없으면 None)"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def get(self):
+        """(공개키, 디바이스 비밀키) 반환 - 키 파일이 바뀐 경우에만 다시 역직렬화"""
+        with self._lock:
+            signature = self._signature(self.public_key_file)
+            if signature is None:
+                if self._public_key is None:
+                    logger.warning("공개키를 찾을 수 없습니다. 제조사로부터 받아야 합니다.")
+            elif signature != self._public_key_signature:
+                try:
+                    self._public_key = self.cpabe.load_public_key(self.public_key_file)
+                    self._public_key_signature = signature
+                    logger.info("공개키 로드 완료")
+                except Exception as e:
+                    logger.error(f"공개키 로드 중 오류 발생 (기존 키 유지): {e}")
+
+            signature = self._signature(self.device_secret_key_file)
+            if signature is None:
+                if self._device_secret_key is None:
+                    raise FileNotFoundError(
+                        f"기기 비밀키 파일을 찾을 수 없습니다: {self.device_secret_key_file}"
+                    )
+            elif signature != self._device_secret_key_signature:
+                try:
+                    self._device_secret_key = self.cpabe.load_device_secret_key(
+                        self.device_secret_key_file
+                    )
+                    self._device_secret_key_signature = signature
+                    logger.info("기기 비밀키 로드 완료")  # 값은 로그에 남기지 않음
+                except Exception as e:
+                    if self._device_secret_key is None:
+                        raise
+                    logger.error(f"기기 비밀키 로드 중 오류 발생 (기존 키 유지): {e}")
+
+            return self._public_key, self._device_secret_key
+
+    def invalidate(self):
+        """다음 get() 호출에서 강제로 다시 로드"""
+        with self._lock:
+            self._public_key_signature = None
+            self._device_secret_key_signature = None
@@ -0,0 +1,235 @@
+"""
+CP-ABE 키 바이너리 컨테이너 (버전 1)
+
+레이아웃 (모든 정수는 big-endian):
+    헤더   : magic "BKEY"(4) | version u16 | reserved u16 | entry_count u32
+    인덱스 : entry_count 개의 항목
+             type u8 | path_len u8 | (component_len u16 | component utf-8) * path_len
+             | offset u64 | length u32
+    데이터 : 각 항목 값 (offset은 파일 시작 기준)
+             - ELEMENT     : charm objectToBytes 결과 (JSON 형식의 base64 필드를 디코드한 값)
+             - STRING      : utf-8 문자열 (이전 버전 변환기가 기록한 항목 호환용)
+             - STRING_LIST : JSON 배열(utf-8)
+
+파일을 mmap으로 매핑하고 인덱스만 읽으며, 그룹 원소는 처음 접근할 때 역직렬화합니다.
+
+변환:
+    python -m crypto.cpabe.keyfile convert client/keys/device_secret_key_file.bin sk.bkey
+"""
+import os
+import sys
+import json
+import mmap
+import base64
+import struct
+import logging
+import binascii
+import argparse
+import tempfile
+from collections.abc import Mapping
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+MAGIC = b"BKEY"
+VERSION = 1
+
+ENTRY_ELEMENT = 1
+ENTRY_STRING = 2
+ENTRY_STRING_LIST = 3
+
+_HEADER = struct.Struct(">4sHHI")
+_COMPONENT_LEN = struct.Struct(">H")
+_LOCATION = struct.Struct(">QI")
+
+# JSON 키 파일(BSW07 공개키·비밀키)의 문자열 값은 모두 그룹 원소(base64)이고,
+# 아래 키의 값만 그룹 원소가 아닌 속성 문자열 목록
+PLAIN_LIST_KEYS = ("S",)
+
+
+def is_binary_key_file(path):
+    """파일이 바이너리 키 컨테이너인지 확인"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _flatten_json_key(obj, path=()):
+    """
+    JSON 키 구조를 (경로, 타입, 값 바이트) 목록으로 평탄화 (그룹 원소는 역직렬화하지 않음)
+    - 항목 타입은 키 구조로 결정 (PLAIN_LIST_KEYS의 값 → STRING_LIST, 그 밖의 문자열 → ELEMENT)
+    - 그룹 원소 자리의 값이 base64가 아니거나 구조가 맞지 않으면 ValueError
+    """
+    if not path and not isinstance(obj, dict):
+        raise ValueError(f"키 파일의 최상위 값은 JSON 객체여야 합니다: {type(obj).__name__}")
+
+    name = "/".join(path)
+    entries = []
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            entries.extend(_flatten_json_key(value, path + (key,)))
+    elif path[-1] in PLAIN_LIST_KEYS:
+        if not isinstance(obj, list) or not all(isinstance(e, str) for e in obj):
+            raise ValueError(f"속성 문자열 목록이어야 합니다: {name}")
+        entries.append((path, ENTRY_STRING_LIST, json.dumps(obj).encode()))
+    elif isinstance(obj, str):
+        try:
+            entries.append((path, ENTRY_ELEMENT, base64.b64decode(obj, validate=True)))
+        except (binascii.Error, ValueError):
+            raise ValueError(f"그룹 원소(base64) 값이 아닙니다: {name}")
+    else:
+        raise ValueError(f"지원하지 않는 키 값 형식입니다: {name}")
+    return entries
+
+
+def write_key_file(entries, output_path):
+    """(경로, 타입, 값 바이트) 목록을 바이너리 컨테이너로 원자적으로 저장"""
+    index = bytearray()
+    for path, entry_type, _ in entries:
+        index += struct.pack(">BB", entry_type, len(path))
+        for component in path:
+            encoded = component.encode()
+            index += _COMPONENT_LEN.pack(len(encoded)) + encoded
+        index += _LOCATION.pack(0, 0)  # 오프셋은 아래에서 채움
+
+    offset = _HEADER.size + len(index)
+    data = bytearray()
+    cursor = 0
+    for path, entry_type, value in entries:
+        cursor += 2 + sum(_COMPONENT_LEN.size + len(c.encode()) for c in path)
+        _LOCATION.pack_into(index, cursor, offset + len(data), len(value))
+        cursor += _LOCATION.size
+        data += value
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, staging_path = tempfile.mkstemp(dir=output_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, len(entries)))
+            f.write(index)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(staging_path, 0o600)
+        os.replace(staging_path, output_path)
+    except BaseException:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+        raise
+
+
+def convert_json_key_file(json_path, output_path):
+    """기존 JSON(base64) 키 파일을 바이너리 컨테이너로 변환 (charm 없이 동작)"""
+    with open(json_path, "r") as f:
+        serialized_key = json.load(f)
+    entries = _flatten_json_key(serialized_key)
+    write_key_file(entries, output_path)
+    logger.info(f"키 파일 변환 완료: {json_path} → {output_path} (항목 {len(entries)}개)")
+    return output_path
+
+
+class LazyKeyNode(Mapping):
+    """키의 한 계층 (dict처럼 사용, 그룹 원소는 처음 접근할 때 역직렬화 후 보관)"""
+
+    def __init__(self, key_file):
+        self._key_file = key_file
+        self._children = {}   # 이름 → LazyKeyNode 또는 (타입, 오프셋, 길이)
+        self._resolved = {}
+
+    def __getitem__(self, name):
+        if name in self._resolved:
+            return self._resolved[name]
+        child = self._children[name]
+        if isinstance(child, LazyKeyNode):
+            return child
+        value = self._key_file._decode(*child)
+        self._resolved[name] = value
+        return value
+
+    def __iter__(self):
+        return iter(self._children)
+
+    def __len__(self):
+        return len(self._children)
+
+    def __repr__(self):
+        return f"LazyKeyNode({list(self._children)})"
+
+
+class BinaryKeyFile:
+    """mmap으로 매핑한 바이너리 키 컨테이너 (인덱스만 파싱, 원소는 지연 역직렬화)"""
+
+    def __init__(self, path, group):
+        self.path = path
+        self.group = group
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.root = LazyKeyNode(self)
+        self._parse_index()
+
+    def _parse_index(self):
+        magic, version, _, entry_count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError("바이너리 키 파일 형식이 아닙니다")
+        if version != VERSION:
+            raise ValueError(f"지원하지 않는 키 파일 버전입니다: {version}")
+
+        cursor = _HEADER.size
+        for _ in range(entry_count):
+            entry_type, path_len = struct.unpack_from(">BB", self._map, cursor)
+            cursor += 2
+            path = []
+            for _ in range(path_len):
+                (length,) = _COMPONENT_LEN.unpack_from(self._map, cursor)
+                cursor += _COMPONENT_LEN.size
+                path.append(self._map[cursor:cursor + length].decode())
+                cursor += length
+            offset, length = _LOCATION.unpack_from(self._map, cursor)
+            cursor += _LOCATION.size
+            if offset + length > len(self._map):
+                raise ValueError("키 파일이 손상되었습니다 (데이터 범위 초과)")
+            if not path:
+                raise ValueError("키 파일이 손상되었습니다 (빈 항목 경로)")
+
+            node = self.root
+            for component in path[:-1]:
+                node = node._children.setdefault(component, LazyKeyNode(self))
+            node._children[path[-1]] = (entry_type, offset, length)
+
+    def _decode(self, entry_type, offset, length):
+        raw = self._map[offset:offset + length]
+        if entry_type == ENTRY_ELEMENT:
+            from charm.core.engine.util import bytesToObject
+            return bytesToObject(raw, self.group)
+        if entry_type == ENTRY_STRING:
+            return raw.decode()
+        if entry_type == ENTRY_STRING_LIST:
+            return json.loads(raw.decode())
+        raise ValueError(f"알 수 없는 키 항목 형식입니다: {entry_type}")
+
+
+def load_key_file(path, group):
+    """바이너리 키 파일 로드 → dict처럼 사용할 수 있는 지연 역직렬화 매핑"""
+    return BinaryKeyFile(path, group).root
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CP-ABE 키 바이너리 컨테이너 도구")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert = subparsers.add_parser("convert", help="JSON(base64) 키 파일을 바이너리로 변환")
+    convert.add_argument("json_path")
+    convert.add_argument("output_path")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        if is_binary_key_file(args.json_path):
+            print(f"이미 바이너리 키 파일입니다: {args.json_path}")
+            return 1
+        convert_json_key_file(args.json_path, args.output_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
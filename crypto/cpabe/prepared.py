@@ -0,0 +1,99 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+from charm.toolbox.pairinggroup import pair, ZR
+from charm.toolbox.secretutil import SecretUtil
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# 정책 문자열별 만족 경로 캐시 크기
+POLICY_CACHE_SIZE = int(os.getenv("CPABE_POLICY_CACHE_SIZE", 128))
+
+
+class PreparedSecretKey:
+    """
+    디바이스 고정 비밀키(SKd)에 대한 "준비된 키" (BSW07 복호화 전용)
+    - 비밀키 원소(D, Dj, Djp)는 처음 사용할 때 charm의 원소 사전계산(initPP)을 적용해 보관
+      (지연 로드 키(keyfile.py)를 쓰는 경우에도 정책에 필요한 원소만 준비됨)
+    - 정책 문자열별로 정책 트리 파싱, 속성 가지치기(prune), 계수(coefficient) 계산 결과를 캐시
+    - 이후 복호화는 캐시된 만족 경로를 따라 페어링만 수행하며, 계수가 1이면 GT 거듭제곱 생략
+    """
+
+    def __init__(self, group, device_secret_key):
+        self.group = group
+        self.device_secret_key = device_secret_key
+        self.util = SecretUtil(group, verbose=False)
+        self.attributes = list(device_secret_key["S"])
+        self._one = group.init(ZR, 1)
+        self._elements = {}
+        self._policies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _element(self, field, attribute=None):
+        """비밀키 원소를 사전계산 적용 후 반환 (최초 1회만 준비)"""
+        cache_key = (field, attribute)
+        element = self._elements.get(cache_key)
+        if element is None:
+            element = self.device_secret_key[field]
+            if attribute is not None:
+                element = element[attribute]
+            try:
+                element.initPP()
+            except Exception:
+                pass  # 사전계산을 지원하지 않는 원소 → 그대로 사용
+            self._elements[cache_key] = element
+        return element
+
+    def satisfying_path(self, policy_str):
+        """
+        정책 문자열에 대한 만족 경로 [(암호문 속성 키, 비밀키 속성, 계수 또는 None)] 반환
+        - 비밀키 속성으로 정책을 만족할 수 없으면 False
+        - 결과는 정책 문자열별로 LRU 캐시
+        """
+        with self._lock:
+            if policy_str in self._policies:
+                self._policies.move_to_end(policy_str)
+                return self._policies[policy_str]
+
+        policy = self.util.createPolicy(policy_str)
+        pruned_list = self.util.prune(policy, self.attributes)
+        if pruned_list is False:
+            path = False
+        else:
+            coefficients = self.util.getCoefficients(policy)
+            path = []
+            for node in pruned_list:
+                j = node.getAttributeAndIndex()
+                k = node.getAttribute()
+                coefficient = coefficients[j]
+                path.append((j, k, None if coefficient == self._one else coefficient))
+
+        with self._lock:
+            self._policies[policy_str] = path
+            self._policies.move_to_end(policy_str)
+            while len(self._policies) > POLICY_CACHE_SIZE:
+                self._policies.popitem(last=False)
+        return path
+
+    def decrypt(self, ciphertext):
+        """BSW07 복호화 (역직렬화된 암호문) → GT 원소, 정책 불충족 시 False"""
+        path = self.satisfying_path(ciphertext["policy"])
+        if path is False:
+            return False
+
+        A = None
+        for j, k, coefficient in path:
+            term = pair(ciphertext["Cy"][j], self._element("Dj", k)) / pair(
+                self._element("Djp", k), ciphertext["Cyp"][j]
+            )
+            if coefficient is not None:
+                term = term ** coefficient
+            A = term if A is None else A * term
+
+        blinded = pair(ciphertext["C"], self._element("D"))
+        if A is not None:
+            blinded = blinded / A
+        return ciphertext["C_tilde"] / blinded
@@ -0,0 +1,96 @@
+"""
+HashTools 해시 처리량 벤치마크
+
+사용법:
+    python -m crypto.hash.bench_hash --size-mb 256 --repeat 3
+합성(랜덤) 파일을 만들어 모드별 처리량(MB/s)을 출력합니다.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from crypto.hash.hash import HashTools
+
+
+def legacy_sha3(file_path, chunk_size=8192):
+    """기존 구현 방식 (8KB read 반복, 청크 출력 제외)"""
+    hash_obj = hashlib.sha3_256()
+    with open(file_path, "rb") as f:
+        chunk = f.read(chunk_size)
+        while chunk:
+            hash_obj.update(chunk)
+            chunk = f.read(chunk_size)
+    return hash_obj.hexdigest()
+
+
+def make_synthetic_file(directory, size_mb):
+    """지정 크기의 랜덤 데이터 파일 생성"""
+    path = os.path.join(directory, f"synthetic_{size_mb}mb.bin")
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+    return path
+
+
+def measure(label, func, size_mb, repeat):
+    """repeat 회 중 최고 처리량 출력"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<52} {size_mb / best:10.1f} MB/s  ({best:.3f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HashTools 처리량 벤치마크")
+    parser.add_argument("--size-mb", type=int, default=128, help="합성 파일 크기 (MB)")
+    parser.add_argument("--repeat", type=int, default=3, help="모드별 반복 횟수")
+    parser.add_argument(
+        "--chunk-sizes", default="65536,1048576,4194304",
+        help="readinto 모드에서 측정할 읽기 크기 목록 (쉼표 구분)",
+    )
+    args = parser.parse_args()
+
+    chunk_sizes = [int(size) for size in args.chunk_sizes.split(",")]
+    multi = ("sha3_256", "sha256", "blake2b")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_synthetic_file(directory, args.size_mb)
+        print(f"합성 파일: {args.size_mb} MB, 반복: {args.repeat}")
+
+        measure("legacy read (8KB)", lambda: legacy_sha3(path), args.size_mb, args.repeat)
+        for chunk_size in chunk_sizes:
+            measure(
+                f"readinto ({chunk_size // 1024}KB)",
+                lambda: HashTools.sha3_hash_file(path, chunk_size=chunk_size),
+                args.size_mb, args.repeat,
+            )
+        measure(
+            "mmap",
+            lambda: HashTools.sha3_hash_file(path, use_mmap=True),
+            args.size_mb, args.repeat,
+        )
+        measure(
+            "multi-digest readinto (" + "+".join(multi) + ")",
+            lambda: HashTools.hash_file(path, multi),
+            args.size_mb, args.repeat,
+        )
+        measure(
+            "multi-digest mmap (" + "+".join(multi) + ")",
+            lambda: HashTools.hash_file(path, multi, use_mmap=True),
+            args.size_mb, args.repeat,
+        )
+
+
+if __name__ == "__main__":
+    main()
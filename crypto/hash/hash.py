@@ -1,26 +1,78 @@
 import hashlib
 import logging
+import mmap
+import os
 
 # 로깅 설정
 logger = logging.getLogger(__name__)
 
+# 파일 해시 계산 시 기본 읽기 크기 (환경변수로 재정의 가능)
+DEFAULT_CHUNK_SIZE = int(os.getenv("HASH_CHUNK_SIZE", 1024 * 1024))
+
+
 class HashTools:
     """파일 해시 계산 및 검증을 위한 도구"""
 
     @staticmethod
-    def sha3_hash_file(file_path, chunk_size=8192):
+    def sha3_hash_file(file_path, chunk_size=DEFAULT_CHUNK_SIZE, use_mmap=False):
         """SHA-3 (SHA3-256) 알고리즘을 사용하여 파일의 해시값 계산"""
+        digests = HashTools.hash_file(
+            file_path, ("sha3_256",), chunk_size=chunk_size, use_mmap=use_mmap
+        )
+        return digests["sha3_256"] if digests else None
+
+    @staticmethod
+    def hash_file(file_path, algorithms=("sha3_256",), chunk_size=DEFAULT_CHUNK_SIZE, use_mmap=False):
+        """
+        파일을 한 번만 읽으면서 여러 해시를 동시에 계산
+        :param algorithms: hashlib 알고리즘 이름 목록 (예: sha3_256, sha256, blake2b)
+        :param chunk_size: 한 번에 읽을 크기 (미리 할당한 버퍼에 readinto)
+        :param use_mmap: True이면 로컬 파일을 mmap으로 매핑해 복사 없이 해시
+        :return: {알고리즘: hexdigest} 또는 오류 시 None
+        """
         try:
-            hash_obj = hashlib.sha3_256()
+            hashers = [(name, hashlib.new(name)) for name in algorithms]
 
             with open(file_path, "rb") as f:
-                chunk = f.read(chunk_size)
-                while chunk:
-                    print(f"Chunk Read ({len(chunk)} bytes): {chunk[:10]}...")  # 로그 추가
-                    hash_obj.update(chunk)
-                    chunk = f.read(chunk_size)
+                if use_mmap and os.fstat(f.fileno()).st_size > 0:
+                    HashTools._update_from_mmap(f, hashers, chunk_size)
+                else:
+                    HashTools._update_from_reader(f, hashers, chunk_size)
 
-            return hash_obj.hexdigest()
+            return {name: hasher.hexdigest() for name, hasher in hashers}
         except Exception as e:
-            logger.error(f"파일 SHA3 해시 계산 중 오류: {e}")
+            logger.error(f"파일 해시 계산 중 오류: {e}")
             return None
+
+    @staticmethod
+    def hash_chunks(chunks, algorithms=("sha3_256",)):
+        """바이트 청크 이터레이터에 대해 여러 해시를 한 번에 계산 → {알고리즘: hexdigest}"""
+        hashers = [(name, hashlib.new(name)) for name in algorithms]
+        for chunk in chunks:
+            for _, hasher in hashers:
+                hasher.update(chunk)
+        return {name: hasher.hexdigest() for name, hasher in hashers}
+
+    @staticmethod
+    def _update_from_reader(f, hashers, chunk_size):
+        """미리 할당한 버퍼에 readinto로 읽어 해시 갱신 (청크마다 새 객체 생성 없음)"""
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            for _, hasher in hashers:
+                hasher.update(view[:read])
+
+    @staticmethod
+    def _update_from_mmap(f, hashers, chunk_size):
+        """파일을 mmap으로 매핑해 페이지 캐시에서 바로 해시 갱신"""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, len(view), chunk_size):
+                    for _, hasher in hashers:
+                        hasher.update(view[offset:offset + chunk_size])
+            finally:
+                view.release()
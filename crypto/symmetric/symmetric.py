@@ -1,4 +1,5 @@
 import os
+import tempfile
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import unpad
 import logging
@@ -6,43 +7,188 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class SymmetricCrypto:
-    """대칭키 복호화를 위한 클래스"""
+# 스트리밍 복호화 시 한 번에 처리할 암호문 크기 (AES 블록 크기의 배수로 맞춰 사용)
+DECRYPT_CHUNK_SIZE = int(os.getenv("AES_DECRYPT_CHUNK_SIZE", 1024 * 1024))
 
-    @staticmethod
-    def decrypt_file(encrypted_file_path, key):
-        """파일을 대칭키로 AES CBC 모드로 복호화"""
-        if not os.path.exists(encrypted_file_path):
-            raise FileNotFoundError(f"파일을 찾을 수 없습니다: {encrypted_file_path}")
 
-        with open(encrypted_file_path, "rb") as file:
-            encrypted_data = file.read()
+class CBCStreamDecryptor:
+    """
+    AES-CBC 점진적(스트리밍) 복호화기
+    - 입력 스트림의 첫 16바이트를 IV로 사용
+    - 블록 단위로 즉시 복호화하고, PKCS#7 패딩 제거를 위해 마지막 블록만 보류
+    - output 버퍼를 넘기면 평문을 그 버퍼에 기록 (SymmetricCrypto.decrypt_stream의 버퍼 재사용 경로)
+    """
 
-        if len(encrypted_data) < 16:
-            raise ValueError("올바르지 않은 암호화 데이터입니다. (IV 없음)")
+    def __init__(self, key):
+        self.key = key
+        self._cipher = None
+        self._iv = bytearray()
+        self._pending = bytearray()  # 블록 경계에 맞지 않은 암호문 + 보류 중인 마지막 블록 (최대 1블록)
+
+    def update(self, data, output=None):
+        """
+        암호문 청크를 받아 지금까지 복호화 가능한 평문 반환
+        :param output: 평문을 기록할 쓰기 가능한 버퍼 (len(data) + 16바이트 이상)
+        :return: 평문 bytes (output을 넘긴 경우 기록한 바이트 수)
+        """
+        block_size = AES.block_size
+        data = memoryview(data)
+        if self._cipher is None:
+            need = block_size - len(self._iv)
+            self._iv += data[:need]
+            data = data[need:]
+            if len(self._iv) < block_size:
+                return b"" if output is None else 0
+            self._cipher = AES.new(self.key, AES.MODE_CBC, bytes(self._iv))
+
+        plain = []
+        written = 0
+
+        # 보류 중인 꼬리를 한 블록으로 채우고, 뒤에 데이터가 더 있으면 그 블록은 복호화
+        fill = min(len(data), -len(self._pending) % block_size)
+        self._pending += data[:fill]
+        data = data[fill:]
+        if data and len(self._pending) == block_size:
+            written += self._decrypt(self._pending, output, written, plain)
+            self._pending = bytearray()
 
-        iv = encrypted_data[:16]  # IV 추출
-        encrypted_data = encrypted_data[16:]  # 암호문 분리
+        if data:
+            # 마지막 블록은 finalize()에서 패딩 제거를 위해 남겨둠
+            ready = (len(data) - 1) // block_size * block_size
+            if ready:
+                written += self._decrypt(data[:ready], output, written, plain)
+            self._pending = bytearray(data[ready:])
 
-        cipher = AES.new(key, AES.MODE_CBC, iv)
-        decrypted_data = cipher.decrypt(encrypted_data)
+        return b"".join(plain) if output is None else written
 
+    def _decrypt(self, ciphertext, output, offset, plain):
+        if output is None:
+            plain.append(self._cipher.decrypt(ciphertext))
+        else:
+            self._cipher.decrypt(ciphertext, output=memoryview(output)[offset:offset + len(ciphertext)])
+        return len(ciphertext)
+
+    def finalize(self):
+        """보류 중인 마지막 블록을 복호화하고 패딩 제거"""
+        if self._cipher is None:
+            raise ValueError("올바르지 않은 암호화 데이터입니다. (IV 없음)")
+        if len(self._pending) != AES.block_size:
+            raise ValueError("패딩 오류: 데이터가 올바르지 않음 (복호화 실패)")
+
+        last_block = self._cipher.decrypt(bytes(self._pending))
+        self._pending = bytearray()
         try:
-            decrypted_data = unpad(decrypted_data, AES.block_size)  # 패딩 제거
+            return unpad(last_block, AES.block_size)  # 패딩 제거
         except ValueError:
             raise ValueError("패딩 오류: 데이터가 올바르지 않음 (복호화 실패)")
 
-        # 복호화된 파일 저장
-        # 확장자 복원 로직
+
+class _ChunkReader:
+    """바이트 청크 이터레이터를 readinto() 가능한 파일 객체처럼 감싸는 어댑터"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._current = memoryview(b"")
+
+    def readinto(self, buffer):
+        while not self._current:
+            try:
+                self._current = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._current))
+        buffer[:size] = self._current[:size]
+        self._current = self._current[size:]
+        return size
+
+
+class SymmetricCrypto:
+    """대칭키 복호화를 위한 클래스"""
+
+    @staticmethod
+    def decrypted_path_for(encrypted_file_path):
+        """복호화 결과 저장 경로 계산 (".enc" 확장자 복원)"""
         if encrypted_file_path.endswith(".enc"):
             # 원래 확장자 추출 (".enc" 바로 앞 부분의 확장자)
             base, _ = os.path.splitext(encrypted_file_path)   # (update_xxx.py, .enc)
-            decrypted_file_path = base                        # update_xxx.py
-            logger.info(f".enc 확장자 복원 완료: {decrypted_file_path}")
+            return base                                       # update_xxx.py
+        return encrypted_file_path
+
+    @staticmethod
+    def decrypt_file(encrypted_file_path, key):
+        """파일을 대칭키로 AES CBC 모드로 복호화 (청크 단위, 메모리 사용량 일정)"""
+        if not os.path.exists(encrypted_file_path):
+            raise FileNotFoundError(f"파일을 찾을 수 없습니다: {encrypted_file_path}")
+
+        return SymmetricCrypto.decrypt_stream(encrypted_file_path, key)
+
+    @staticmethod
+    def decrypt_stream(source, key, output=None, chunk_size=DECRYPT_CHUNK_SIZE):
+        """
+        AES CBC 스트리밍 복호화
+        - 블록 정렬된 청크 단위로 CBCStreamDecryptor에 넘겨 복호화 (IV 처리·마지막 블록 보류·패딩 제거는 한 곳에서)
+        - 입력/출력 버퍼를 한 번만 할당해 재사용 (파일 크기와 무관한 메모리 사용량)
+        :param source: 암호문 파일 경로, 파일 객체(readinto/read 지원), 또는 바이트 청크 이터레이터
+        :param key: AES 대칭키
+        :param output: 출력 파일 경로 또는 쓰기 가능한 파일 객체
+                       (생략 시 source 경로에서 .enc 확장자를 복원한 경로)
+        :param chunk_size: 한 번에 복호화할 암호문 크기
+        :return: 복호화된 파일 경로 (파일 객체로 출력한 경우 None)
+        """
+        if isinstance(source, (str, os.PathLike)):
+            source_path = os.fspath(source)
+            if output is None:
+                output = SymmetricCrypto.decrypted_path_for(source_path)
+                if output != source_path:
+                    logger.info(f".enc 확장자 복원 완료: {output}")
+            with open(source_path, "rb") as reader:
+                return SymmetricCrypto.decrypt_stream(reader, key, output, chunk_size)
+
+        if hasattr(source, "readinto"):
+            reader = source
+        elif hasattr(source, "read"):
+            reader = _ChunkReader(iter(lambda: source.read(chunk_size), b""))
         else:
-            decrypted_file_path = encrypted_file_path
+            reader = _ChunkReader(source)
+
+        if output is None:
+            raise ValueError("출력 경로 또는 파일 객체가 필요합니다")
+
+        if not isinstance(output, (str, os.PathLike)):
+            SymmetricCrypto._decrypt_into(reader, key, output, chunk_size)
+            return None
 
-        with open(decrypted_file_path, "wb") as file:
-            file.write(decrypted_data)
+        # 같은 디렉토리의 임시 파일에 기록한 뒤 교체 (입력과 출력 경로가 같아도 안전)
+        output_path = os.fspath(output)
+        fd, staging_path = tempfile.mkstemp(
+            prefix=f".{os.path.basename(output_path)}.",
+            suffix=".part",
+            dir=os.path.dirname(os.path.abspath(output_path)),
+        )
+        try:
+            with os.fdopen(fd, "wb") as writer:
+                SymmetricCrypto._decrypt_into(reader, key, writer, chunk_size)
+            os.replace(staging_path, output_path)
+        except BaseException:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+
+        return output_path
+
+    @staticmethod
+    def _decrypt_into(reader, key, writer, chunk_size):
+        """reader의 암호문(IV 포함)을 CBCStreamDecryptor로 복호화하여 writer에 기록 (입력/출력 버퍼 재사용)"""
+        block_size = AES.block_size
+        chunk_size = max(block_size, chunk_size // block_size * block_size)
+        in_view = memoryview(bytearray(chunk_size))
+        out_view = memoryview(bytearray(chunk_size + block_size))
 
-        return decrypted_file_path
+        decryptor = CBCStreamDecryptor(key)
+        while True:
+            read = reader.readinto(in_view)
+            if not read:
+                break
+            written = decryptor.update(in_view[:read], output=out_view)
+            writer.write(out_view[:written])
+        writer.write(decryptor.finalize())
@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import errno
+import fcntl
+import shutil
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+
+from crypto.hash.hash import HashTools
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 기본 캐시 위치: <프로젝트 루트>/data/ipfs_cache (docker-compose의 ./data 볼륨과 공유)
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data",
+    "ipfs_cache",
+)
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB
+
+# Linux FICLONE ioctl (reflink 지원 파일시스템: btrfs, xfs 등)
+FICLONE = 0x40049409
+
+
+class IPFSCache:
+    """
+    CID 기반(content-addressed) 로컬 IPFS 객체 캐시
+    - objects/<cid> 에 데이터, objects/<cid>.json 에 메타데이터(원래 파일명, 크기, SHA3-256) 저장
+    - 모든 쓰기는 임시 파일 → fsync → os.replace 로 원자적으로 반영
+    - 메타데이터 파일의 mtime을 마지막 사용 시각으로 사용하여 LRU 방식으로 용량 제한
+    - save_dir로의 전달은 하드링크 → reflink → 복사 순으로 시도
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.getenv("IPFS_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_bytes = int(max_bytes or os.getenv("IPFS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.objects_dir = os.path.join(self.cache_dir, "objects")
+        self.tmp_dir = os.path.join(self.cache_dir, "tmp")
+        self.lock_path = os.path.join(self.cache_dir, ".lock")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """환경변수 설정으로 캐시 생성 (IPFS_CACHE_ENABLED=0 이거나 생성 실패 시 None)"""
+        if os.getenv("IPFS_CACHE_ENABLED", "1") == "0":
+            return None
+        try:
+            return cls()
+        except Exception as e:
+            logger.warning(f"⚠️ IPFS 캐시 비활성화: {e}")
+            return None
+
+    def _data_path(self, cid):
+        return os.path.join(self.objects_dir, cid)
+
+    def _meta_path(self, cid):
+        return os.path.join(self.objects_dir, f"{cid}.json")
+
+    @contextmanager
+    def _locked(self):
+        """같은 볼륨을 공유하는 여러 프로세스 간 삽입/삭제 직렬화"""
+        with open(self.lock_path, "a+") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def get(self, cid, expected_hash=None, verify=True):
+        """
+        캐시 항목 조회
+        :param expected_hash: 기대 SHA3-256 (주어지면 메타데이터와 일치해야 적중)
+        :param verify: True이면 파일 내용을 다시 해시하여 손상 여부 확인
+        :return: {"cid", "name", "size", "sha3_256", "path"} 또는 None
+        """
+        try:
+            with open(self._meta_path(cid), "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        data_path = self._data_path(cid)
+        if not os.path.exists(data_path) or os.path.getsize(data_path) != meta.get("size"):
+            logger.warning(f"⚠️ 손상된 캐시 항목 제거: {cid}")
+            self.evict(cid)
+            return None
+
+        if expected_hash and meta.get("sha3_256") != expected_hash:
+            logger.warning(f"⚠️ 캐시 항목 해시가 기대값과 다름: {cid}")
+            return None
+
+        if verify and HashTools.sha3_hash_file(data_path, use_mmap=True) != meta.get("sha3_256"):
+            logger.warning(f"⚠️ 캐시 항목 해시 검증 실패, 제거: {cid}")
+            self.evict(cid)
+            return None
+
+        # LRU: 마지막 사용 시각 갱신
+        try:
+            os.utime(self._meta_path(cid))
+        except OSError:
+            pass
+
+        meta["path"] = data_path
+        return meta
+
+    def open_writer(self, cid, name):
+        """스트리밍으로 새 항목을 기록하는 writer 생성 (commit 전까지 캐시에 보이지 않음)"""
+        return _CacheWriter(self, cid, name)
+
+    def put_file(self, cid, name, src_path, expected_hash=None):
+        """이미 받은 파일을 캐시에 추가 → 추가된 항목 메타데이터 또는 None"""
+        writer = self.open_writer(cid, name)
+        try:
+            with open(src_path, "rb") as f:
+                shutil.copyfileobj(f, writer, 1024 * 1024)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit(expected_hash)
+
+    def adopt_file(self, cid, name, path, expected_hash=None):
+        """
+        캐시 디렉토리 안에서 받은 파일을 복사 없이 캐시에 편입 (os.replace)
+        :return: 추가된 항목 메타데이터 또는 해시 불일치 시 None (파일은 삭제됨)
+        """
+        sha3_hex = HashTools.sha3_hash_file(path, use_mmap=True)
+        if sha3_hex is None or (expected_hash and sha3_hex != expected_hash):
+            logger.warning(f"⚠️ 해시 불일치로 캐시에 저장하지 않음: {cid}")
+            os.remove(path)
+            return None
+        return self._commit(cid, name, path, os.path.getsize(path), sha3_hex)
+
+    def partial_path(self, cid):
+        """재개 가능한 다운로드용 고정 임시 경로 (캐시와 같은 파일시스템)"""
+        return os.path.join(self.tmp_dir, f"{cid}.partial")
+
+    def materialize(self, cid, dest_path):
+        """캐시 항목을 dest_path로 전달 (하드링크 → reflink → 복사, 원자적 교체)"""
+        src_path = self._data_path(cid)
+        dest_dir = os.path.dirname(os.path.abspath(dest_path))
+        os.makedirs(dest_dir, exist_ok=True)
+        staging_path = os.path.join(
+            dest_dir, f".{os.path.basename(dest_path)}.{os.getpid()}.{time.monotonic_ns()}.part"
+        )
+        try:
+            try:
+                os.link(src_path, staging_path)
+                method = "hardlink"
+            except OSError:
+                if self._reflink(src_path, staging_path):
+                    method = "reflink"
+                else:
+                    shutil.copy2(src_path, staging_path)
+                    method = "copy"
+            os.replace(staging_path, dest_path)
+        except BaseException:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+        logger.info(f"✅ 캐시에서 전달 완료 ({method}): {dest_path}")
+        return dest_path
+
+    @staticmethod
+    def _reflink(src_path, dest_path):
+        """FICLONE ioctl로 복사 없이 블록 공유 (미지원 시 False)"""
+        try:
+            with open(src_path, "rb") as src, open(dest_path, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            return False
+
+    def evict(self, cid):
+        """캐시 항목 삭제"""
+        with self._locked():
+            self._remove_entry(cid)
+
+    def _remove_entry(self, cid):
+        for path in (self._meta_path(cid), self._data_path(cid)):
+            try:
+                os.remove(path)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    logger.warning(f"⚠️ 캐시 파일 삭제 실패: {path}: {e}")
+
+    def _enforce_limit(self, keep_cid=None):
+        """총 용량이 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제 (락 보유 상태에서 호출)"""
+        entries = []
+        total = 0
+        for file_name in os.listdir(self.objects_dir):
+            if not file_name.endswith(".json"):
+                continue
+            cid = file_name[:-len(".json")]
+            try:
+                last_used = os.path.getmtime(self._meta_path(cid))
+                size = os.path.getsize(self._data_path(cid))
+            except OSError:
+                continue
+            entries.append((last_used, cid, size))
+            total += size
+
+        entries.sort()
+        for _, cid, size in entries:
+            if total <= self.max_bytes:
+                break
+            if cid == keep_cid:
+                continue
+            logger.info(f"IPFS 캐시 용량 초과 → 항목 제거: {cid} ({size} bytes)")
+            self._remove_entry(cid)
+            total -= size
+
+    def _commit(self, cid, name, staging_path, size, sha3_hex):
+        """writer가 완성한 임시 파일을 캐시에 원자적으로 반영"""
+        meta = {
+            "cid": cid,
+            "name": name,
+            "size": size,
+            "sha3_256": sha3_hex,
+            "created": int(time.time()),
+        }
+        fd, meta_staging = tempfile.mkstemp(dir=self.tmp_dir, suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self._locked():
+            os.replace(staging_path, self._data_path(cid))
+            os.replace(meta_staging, self._meta_path(cid))
+            dir_fd = os.open(self.objects_dir, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+            self._enforce_limit(keep_cid=cid)
+
+        logger.info(f"✅ IPFS 캐시 저장 완료: {cid} ({size} bytes)")
+        meta["path"] = self._data_path(cid)
+        return meta
+
+
+class _CacheWriter:
+    """캐시 항목을 청크 단위로 기록하면서 SHA3-256을 함께 계산"""
+
+    def __init__(self, cache, cid, name):
+        self.cache = cache
+        self.cid = cid
+        self.name = name
+        self.size = 0
+        self._hasher = hashlib.sha3_256()
+        fd, self._staging_path = tempfile.mkstemp(dir=cache.tmp_dir, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self._hasher.update(chunk)
+        self.size += len(chunk)
+        return len(chunk)
+
+    def commit(self, expected_hash=None):
+        """기록 완료 → 해시가 기대값과 일치하면 캐시에 반영하고 메타데이터 반환, 아니면 None"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        sha3_hex = self._hasher.hexdigest()
+        if expected_hash and sha3_hex != expected_hash:
+            logger.warning(f"⚠️ 해시 불일치로 캐시에 저장하지 않음: {self.cid}")
+            self.abort()
+            return None
+
+        try:
+            return self.cache._commit(self.cid, self.name, self._staging_path, self.size, sha3_hex)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        """기록 중인 임시 파일 폐기"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._staging_path):
+            os.remove(self._staging_path)
@@ -1,64 +1,223 @@
 import os
 import logging
 import tempfile
-import requests
-import warnings
 import shutil
 
+from ipfs.cache.cache import IPFSCache
+from ipfs.download.ranged import RangedDownloader, RANGED_MIN_SIZE
+from ipfs.download.session import IPFSSessionPool
+
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 스트리밍 다운로드 시 청크 크기 (환경변수로 재정의 가능)
+STREAM_CHUNK_SIZE = int(os.getenv("IPFS_STREAM_CHUNK_SIZE", 1024 * 1024))
+
 
 class IPFSDownloader:
     """IPFS에서 파일 다운로드하는 클래스"""
 
-    def __init__(self, api_url=None):
-        """IPFS 다운로더 초기화"""
+    def __init__(self, api_url=None, cache=None, pool=None):
+        """IPFS 다운로더 초기화 (연결 확인은 첫 사용 시 수행되고 TTL 동안 캐시됨)"""
         # 기본값: 로컬 노드 (환경변수로 재정의 가능)
         self.api_url = api_url or os.getenv("IPFS_API", "http://127.0.0.1:5001")
         self.http_gateway = os.getenv("IPFS_GATEWAY", "http://127.0.0.1:8080")
 
-        # IPFS 연결 확인
-        self.ipfs_available = self._check_ipfs_connection()
+        # CID 기반 로컬 캐시 (재시도/같은 볼륨을 공유하는 기기는 네트워크 생략)
+        self.cache = cache if cache is not None else IPFSCache.from_env()
+
+        # 게이트웨이 병렬 구간 다운로더 (재개 가능)
+        self.ranged = RangedDownloader()
+
+        # keep-alive 연결을 재사용하는 IPFS API 세션 풀 (같은 주소는 프로세스 전역 공유)
+        self.pool = pool or IPFSSessionPool.shared(self.api_url)
+
+    @property
+    def ipfs_available(self):
+        """IPFS API 연결 확인 (TTL 캐시)"""
+        return self.pool.is_available()
+
+    @staticmethod
+    def restore_extension(file_name):
+        """원래 파일명에서 확장자 추출 (.py.enc 같은 다중 확장자 포함, 없으면 .bin)"""
+        _, ext = os.path.splitext(file_name)
+        if file_name.count(".") > 1:
+            # .py.enc 같은 다중 확장자 처리
+            return "." + ".".join(file_name.split(".")[1:])
+        return ext or ".bin"
 
-    def _check_ipfs_connection(self):
-        """IPFS API 연결 확인"""
+    def open_stream(self, ipfs_hash, chunk_size=STREAM_CHUNK_SIZE, expected_hash=None):
+        """
+        IPFS 객체를 청크 단위로 스트리밍
+        - 로컬 캐시에 있으면 네트워크 없이 캐시에서 읽음
+        - 없으면 ipfshttpclient(cat)를 우선 사용하고, 실패 시 게이트웨이로 재시도하며
+          받은 청크를 캐시에도 함께 기록 (끝까지 받고 해시가 맞을 때만 캐시에 반영)
+        :param ipfs_hash: 다운로드할 CID
+        :param chunk_size: 스트리밍 청크 크기
+        :param expected_hash: 기대 SHA3-256 (캐시 적중/저장 조건)
+        :return: (원래 파일명, 바이트 청크 이터레이터)
+        """
+        if self.cache:
+            # 스트림을 읽는 쪽에서 해시를 검증하므로 여기서는 재해시 생략
+            entry = self.cache.get(ipfs_hash, expected_hash=expected_hash, verify=False)
+            if entry:
+                logger.info(f"✅ IPFS 캐시 적중: {ipfs_hash}")
+                return entry["name"], self._iter_file(entry["path"], chunk_size)
+
+        cacheable = True
         try:
-            import ipfshttpclient
-            # 버전 불일치 경고 무시
-            warnings.filterwarnings(
-                "ignore", category=ipfshttpclient.exceptions.VersionMismatch
-            )
-            client = ipfshttpclient.connect(self.api_url)
-            version = client.version()
-            client.close()
-            logger.info(f"✅ IPFS 연결 성공. 버전: {version['Version']}")
-            return True
+            file_name, chunks = self._open_api_stream(ipfs_hash)
         except Exception as e:
-            logger.error(f"🚨 IPFS 연결 실패: {e}")
-            return False
+            # 실패 시 게이트웨이 fallback
+            logger.warning(f"⚠️ ipfshttpclient 스트리밍 실패: {e}, 게이트웨이로 재시도합니다.")
+            gateway_url = f"{self.http_gateway}/ipfs/{ipfs_hash}"
+            probe_result = self.ranged.probe(gateway_url)
+            size, accepts_ranges, _ = probe_result
 
-    def download_file(self, ipfs_hash, save_dir, uid):
+            if accepts_ranges and size and size >= RANGED_MIN_SIZE:
+                # 큰 파일: 병렬 구간 다운로드로 받은 뒤 로컬 파일을 스트리밍
+                path = self._fetch_gateway_ranged(ipfs_hash, probe_result, expected_hash)
+                if self.cache and expected_hash:
+                    return ipfs_hash, self._iter_file(path, chunk_size)
+                return ipfs_hash, self._iter_file(path, chunk_size, remove=True)
+
+            file_name, chunks = ipfs_hash, self._open_gateway_stream(gateway_url, chunk_size)
+            # 게이트웨이 응답은 검증할 해시가 있을 때만 캐시에 기록
+            cacheable = bool(expected_hash)
+
+        if self.cache and cacheable:
+            writer = self.cache.open_writer(ipfs_hash, file_name)
+            chunks = self._tee_into_cache(chunks, writer, expected_hash)
+        return file_name, chunks
+
+    def _fetch_gateway_ranged(self, ipfs_hash, probe_result, expected_hash=None):
+        """
+        게이트웨이에서 병렬 구간 다운로드 (중단 시 같은 경로로 재호출하면 이어받음)
+        - 게이트웨이 응답은 검증되지 않았으므로 expected_hash와 일치할 때만 캐시에 편입
+        :return: 받은 파일 경로 (캐시에 편입했으면 캐시 항목 경로)
+        """
+        gateway_url = f"{self.http_gateway}/ipfs/{ipfs_hash}"
+        if self.cache and expected_hash:
+            partial_path = self.cache.partial_path(ipfs_hash)
+        else:
+            partial_path = os.path.join(tempfile.gettempdir(), f"ipfs_{ipfs_hash}.partial")
+
+        self.ranged.download(gateway_url, partial_path, probe_result)
+
+        if self.cache and expected_hash:
+            entry = self.cache.adopt_file(ipfs_hash, ipfs_hash, partial_path, expected_hash)
+            if not entry:
+                raise Exception("게이트웨이 다운로드 파일 해시 검증 실패")
+            return entry["path"]
+        return partial_path
+
+    def _open_api_stream(self, ipfs_hash):
+        """IPFS API(cat)에서 스트림 열기 → (원래 파일명, 청크 이터레이터)"""
+        if not self.ipfs_available:
+            raise ConnectionError("🚨 IPFS API 연결 불가. 다운로드를 수행할 수 없습니다.")
+
+        lease = self.pool.lease()
+        client = lease.client
+        try:
+            # CID가 디렉토리일 경우 → 내부 첫 번째 파일을 스트리밍
+            listing = client.ls(ipfs_hash)
+            links = [
+                link for link in listing["Objects"][0].get("Links", [])
+                if link.get("Name")
+            ]
+            if links:
+                file_name = links[0]["Name"]
+                target_hash = links[0]["Hash"]
+                logger.info(f"실제 다운로드할 파일명: {file_name}")
+            else:
+                file_name = ipfs_hash
+                target_hash = ipfs_hash
+                logger.info("⚠️ 원래 파일명 정보를 찾지 못했습니다. CID로 저장합니다.")
+
+            stream = client.cat(target_hash, stream=True)
+        except Exception:
+            lease.discard()
+            self.pool.mark_unavailable()
+            raise
+
+        return file_name, self._iter_and_close(stream, lease)
+
+    def _open_gateway_stream(self, gateway_url, chunk_size):
+        """게이트웨이 단일 스트림 열기 (풀링된 세션 재사용)"""
+        response = self.ranged.session.get(gateway_url, stream=True, timeout=self.ranged.timeout)
+        if response.status_code != 200:
+            response.close()
+            raise Exception(f"HTTP 다운로드 실패: 상태 코드 {response.status_code}")
+        return self._iter_and_close(response.iter_content(chunk_size=chunk_size), response)
+
+    @staticmethod
+    def _iter_file(path, chunk_size, remove=False):
+        """로컬 파일을 청크 단위로 순회 (remove=True이면 순회 후 삭제)"""
+        try:
+            with open(path, "rb") as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            if remove and os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def _tee_into_cache(chunks, writer, expected_hash):
+        """청크를 그대로 넘기면서 캐시 writer에도 기록 (중단 시 캐시 반영 취소)"""
+        committed = False
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+                yield chunk
+            writer.commit(expected_hash)
+            committed = True
+        finally:
+            if not committed:
+                writer.abort()
+
+    @staticmethod
+    def _iter_and_close(chunks, resource):
+        """청크를 순회한 뒤 연결 자원 정리 (오류로 중단되면 풀에 반환하지 않고 폐기)"""
+        try:
+            for chunk in chunks:
+                if chunk:
+                    yield chunk
+        except BaseException:
+            getattr(resource, "discard", resource.close)()
+            raise
+        finally:
+            resource.close()
+
+    def download_file(self, ipfs_hash, save_dir, uid, expected_hash=None):
         """
         IPFS에서 파일 다운로드 후 확장자 복원하여 updates/<uid>.<확장자> 로 저장
         :param ipfs_hash: 다운로드할 CID
         :param save_dir: 저장할 디렉토리 (예: updates/)
         :param uid: 저장 시 사용할 이름 (ex: forward_v1.5.0)
+        :param expected_hash: 기대 SHA3-256 (게이트웨이로 받은 파일은 이 값과 일치할 때만 캐시에 편입)
         :return: 최종 저장 경로
         """
+        os.makedirs(save_dir, exist_ok=True)
+
+        # 캐시 적중 시 네트워크 없이 하드링크/reflink로 전달
+        if self.cache:
+            entry = self.cache.get(ipfs_hash, expected_hash=expected_hash)
+            if entry:
+                logger.info(f"✅ IPFS 캐시 적중: {ipfs_hash}")
+                final_path = os.path.join(save_dir, f"{uid}{self.restore_extension(entry['name'])}")
+                return self.cache.materialize(ipfs_hash, final_path)
+
         if not self.ipfs_available:
             raise ConnectionError("🚨 IPFS API 연결 불가. 다운로드를 수행할 수 없습니다.")
 
-        os.makedirs(save_dir, exist_ok=True)
-
         try:
-            import ipfshttpclient
-            warnings.filterwarnings("ignore", category=ipfshttpclient.exceptions.VersionMismatch)
-
             # 임시 디렉토리 생성 후 파일 다운로드
             temp_dir = tempfile.mkdtemp()
-            with ipfshttpclient.connect(self.api_url) as client:
+            with self.pool.client() as client:
                 client.get(ipfs_hash, temp_dir)
 
             downloaded_path = os.path.join(temp_dir, ipfs_hash)
@@ -79,33 +238,31 @@ class IPFSDownloader:
                 logger.info("⚠️ 원래 파일명 정보를 찾지 못했습니다. CID로 저장합니다.")
 
             # 확장자 복원: 원래 파일명에서 확장자 그대로 가져오기
-            _, ext = os.path.splitext(file_name)
-            if file_name.count(".") > 1:
-                # .py.enc 같은 다중 확장자 처리
-                original_ext = ".".join(file_name.split(".")[1:])
-                original_ext = "." + original_ext
-            else:
-                original_ext = ext or ".bin"
+            original_ext = self.restore_extension(file_name)
 
-            # 최종 저장 경로
+            # 최종 저장 경로 (캐시에 넣은 뒤 캐시에서 링크로 전달)
             final_path = os.path.join(save_dir, f"{uid}{original_ext}")
-            shutil.copy2(downloaded_file, final_path)
+            if self.cache and self.cache.put_file(ipfs_hash, file_name, downloaded_file, expected_hash):
+                self.cache.materialize(ipfs_hash, final_path)
+            else:
+                shutil.copy2(downloaded_file, final_path)
             shutil.rmtree(temp_dir)
 
             logger.info(f"✅ IPFS 파일 다운로드 완료 - 저장 경로: {final_path}")
             return final_path
 
         except Exception as e:
-            # 실패 시 게이트웨이 fallback
+            # 실패 시 게이트웨이 fallback (병렬 구간 다운로드, 중단 시 재호출하면 이어받음)
             logger.warning(f"⚠️ ipfshttpclient 다운로드 실패: {e}, 게이트웨이로 재시도합니다.")
             gateway_url = f"{self.http_gateway}/ipfs/{ipfs_hash}"
-            response = requests.get(gateway_url, stream=True, timeout=10)
-            if response.status_code == 200:
-                final_path = os.path.join(save_dir, f"{uid}.bin")
-                with open(final_path, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                logger.info(f"✅ 게이트웨이 다운로드 완료 - 저장 경로: {final_path}")
-                return final_path
+            probe_result = self.ranged.probe(gateway_url)
+            final_path = os.path.join(save_dir, f"{uid}.bin")
+            if self.cache and expected_hash:
+                # 해시가 일치해야 캐시에 편입 (불일치 시 예외)
+                self._fetch_gateway_ranged(ipfs_hash, probe_result, expected_hash)
+                self.cache.materialize(ipfs_hash, final_path)
             else:
-                raise Exception(f"HTTP 다운로드 실패: 상태 코드 {response.status_code}")
+                # 검증할 해시가 없으면 캐시에 넣지 않고 바로 저장 (검증되지 않은 내용이 이후 조회에 쓰이지 않도록)
+                self.ranged.download(gateway_url, final_path, probe_result)
+            logger.info(f"✅ 게이트웨이 다운로드 완료 - 저장 경로: {final_path}")
+            return final_path
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 병렬 구간 다운로드 설정 (환경변수로 재정의 가능)
+RANGED_WORKERS = int(os.getenv("IPFS_GATEWAY_WORKERS", 4))
+RANGED_SEGMENT_SIZE = int(os.getenv("IPFS_GATEWAY_SEGMENT_SIZE", 4 * 1024 * 1024))
+RANGED_MIN_SIZE = int(os.getenv("IPFS_RANGED_MIN_SIZE", 8 * 1024 * 1024))
+RANGED_MAX_RETRIES = int(os.getenv("IPFS_GATEWAY_MAX_RETRIES", 5))
+# 같은 구간을 다시 요청할 일시적 오류 상태 코드
+RANGED_TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# 세그먼트 데이터만 디스크에 반영 (fdatasync가 없는 플랫폼은 fsync)
+_sync_data = getattr(os, "fdatasync", os.fsync)
+
+
+class RangeRequestError(Exception):
+    """
+    Range 요청에 대한 게이트웨이 응답 오류
+    - restart: 원본이 바뀜(If-Range/ETag 불일치, 전체 크기 변경) → 받은 세그먼트를 버리고 처음부터 다시 다운로드
+    - transient: 일시적 오류(429, 503 등) → 같은 구간 재시도
+    """
+
+    def __init__(self, message, status_code=None, restart=False, transient=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.restart = restart
+        self.transient = transient
+
+
+class RangedDownloader:
+    """
+    HTTP 게이트웨이용 재개 가능한 병렬 구간(Range) 다운로더
+    - HEAD(또는 Range 0-0) 요청으로 크기와 Range 지원 여부 확인
+    - 파일을 고정 크기 세그먼트로 나누어 여러 워커가 동시에 요청
+    - 미리 할당한 파일의 각 세그먼트 오프셋에 pwrite로 직접 기록
+    - 세그먼트 데이터를 디스크에 반영한 뒤 완료 목록을 <파일>.manifest.json에 저장 → 중단 후 재호출 시 이어받기
+    - 다운로드 도중 원본이 바뀌면(RangeRequestError.restart) 한 번만 처음부터 다시 다운로드
+    """
+
+    def __init__(self, session=None, workers=RANGED_WORKERS, segment_size=RANGED_SEGMENT_SIZE,
+                 timeout=(5, 30), max_retries=RANGED_MAX_RETRIES):
+        self.workers = max(1, workers)
+        self.segment_size = segment_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = session or self._create_session(self.workers)
+
+    @staticmethod
+    def _create_session(pool_size):
+        """워커 수만큼 keep-alive 연결을 유지하는 requests.Session 생성"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def probe(self, url):
+        """
+        다운로드 대상 정보 확인
+        :return: (전체 크기 또는 None, Range 지원 여부, ETag)
+        """
+        try:
+            response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+            if response.status_code == 200:
+                size = response.headers.get("Content-Length")
+                accepts_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+                if size is not None and accepts_ranges:
+                    return int(size), True, response.headers.get("ETag")
+        except requests.RequestException as e:
+            logger.debug(f"HEAD 요청 실패, Range 요청으로 확인: {e}")
+
+        # HEAD를 지원하지 않거나 Accept-Ranges를 알리지 않는 게이트웨이 → 1바이트 Range 요청
+        with self.session.get(url, headers={"Range": "bytes=0-0"}, stream=True,
+                              timeout=self.timeout) as response:
+            content_range = response.headers.get("Content-Range", "")
+            if response.status_code == 206 and "/" in content_range:
+                total = content_range.rsplit("/", 1)[1]
+                if total.isdigit():
+                    return int(total), True, response.headers.get("ETag")
+            if response.status_code == 200:
+                size = response.headers.get("Content-Length")
+                return (int(size) if size else None), False, response.headers.get("ETag")
+            raise Exception(f"HTTP 다운로드 실패: 상태 코드 {response.status_code}")
+
+    def download(self, url, dest_path, probe_result=None):
+        """
+        url을 dest_path로 다운로드 (Range 미지원 시 단일 스트림)
+        :param probe_result: 이미 수행한 probe() 결과 (생략 시 새로 확인)
+        :return: dest_path
+        """
+        try:
+            return self._download(url, dest_path, probe_result)
+        except RangeRequestError as e:
+            if not e.restart:
+                raise
+            logger.warning(f"⚠️ 다운로드 중 원본이 바뀜 → 처음부터 다시 다운로드: {e}")
+            manifest_path = f"{dest_path}.manifest.json"
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+            return self._download(url, dest_path, None)
+
+    def _download(self, url, dest_path, probe_result):
+        size, accepts_ranges, etag = probe_result or self.probe(url)
+        if not accepts_ranges or not size:
+            logger.info("게이트웨이가 Range 요청을 지원하지 않음 → 단일 스트림 다운로드")
+            self._download_single(url, dest_path)
+            return dest_path
+
+        manifest_path = f"{dest_path}.manifest.json"
+        segment_count = (size + self.segment_size - 1) // self.segment_size
+        done = self._load_manifest(manifest_path, url, size, etag, dest_path)
+
+        if done is None:
+            # 새 다운로드: 파일을 전체 크기로 미리 할당
+            done = set()
+            with open(dest_path, "wb") as f:
+                if hasattr(os, "posix_fallocate"):
+                    try:
+                        os.posix_fallocate(f.fileno(), 0, size)
+                    except OSError:
+                        f.truncate(size)
+                else:
+                    f.truncate(size)
+            self._save_manifest(manifest_path, url, size, etag, done)
+        else:
+            logger.info(f"이전 다운로드 이어받기: {len(done)}/{segment_count} 세그먼트 완료됨")
+
+        pending = [index for index in range(segment_count) if index not in done]
+        manifest_lock = threading.Lock()
+        started = time.monotonic()
+
+        fd = os.open(dest_path, os.O_WRONLY)
+        try:
+            def run_segment(index):
+                start = index * self.segment_size
+                end = min(start + self.segment_size, size) - 1
+                self._download_segment(url, fd, start, end, size, etag)
+                # 세그먼트 데이터가 디스크에 반영된 뒤에만 완료로 기록 (재개 시 빈/찢어진 구간을 건너뛰지 않도록)
+                _sync_data(fd)
+                with manifest_lock:
+                    done.add(index)
+                    self._save_manifest(manifest_path, url, size, etag, done)
+
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                # 하나라도 실패하면 아직 시작하지 않은 세그먼트를 취소하고 예외 전파 (완료된 세그먼트는 매니페스트에 남음)
+                futures = [executor.submit(run_segment, index) for index in pending]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        os.remove(manifest_path)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        logger.info(
+            f"✅ 병렬 구간 다운로드 완료 - {size} bytes, {len(pending)}개 세그먼트, "
+            f"{size / elapsed / (1024 * 1024):.1f} MB/s"
+        )
+        return dest_path
+
+    def _download_segment(self, url, fd, start, end, size, etag):
+        """
+        [start, end] 구간을 받아 해당 오프셋에 기록 (끊기거나 일시적 오류면 받은 지점부터 재시도)
+        - 원본이 바뀌었거나 재시도해도 소용없는 응답이면 RangeRequestError 전파
+        """
+        offset = start
+        attempt = 0
+        while offset <= end:
+            headers = {"Range": f"bytes={offset}-{end}"}
+            if etag:
+                headers["If-Range"] = etag
+            try:
+                with self.session.get(url, headers=headers, stream=True,
+                                      timeout=self.timeout) as response:
+                    self._check_range_response(response, offset, size, etag)
+                    for chunk in response.iter_content(chunk_size=256 * 1024):
+                        if not chunk:
+                            continue
+                        chunk = chunk[:end + 1 - offset]
+                        os.pwrite(fd, chunk, offset)
+                        offset += len(chunk)
+                        if offset > end:
+                            break
+                if offset <= end:
+                    raise requests.ConnectionError("세그먼트 수신 중 연결 종료")
+            except (requests.RequestException, OSError, RangeRequestError) as e:
+                if isinstance(e, RangeRequestError) and not e.transient:
+                    raise
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise ConnectionError(f"세그먼트 {start}-{end} 다운로드 실패: {e}") from e
+                delay = min(2 ** attempt * 0.5, 10)
+                logger.warning(f"⚠️ 세그먼트 {start}-{end} 재시도 {attempt}/{self.max_retries} ({delay:.1f}s 후): {e}")
+                time.sleep(delay)
+
+    @staticmethod
+    def _check_range_response(response, offset, size, etag):
+        """Range 요청 응답이 offset부터의 같은 원본 구간인지 확인 (아니면 RangeRequestError)"""
+        status = response.status_code
+        if status == 200:
+            # If-Range 불일치(원본 변경) 시 게이트웨이는 전체 본문을 200으로 응답
+            raise RangeRequestError("Range 요청에 전체 본문 응답 (If-Range 불일치)", status, restart=True)
+        if status in (412, 416):
+            raise RangeRequestError(f"Range 요청 실패: 상태 코드 {status}", status, restart=True)
+        if status != 206:
+            raise RangeRequestError(
+                f"Range 요청 실패: 상태 코드 {status}", status, transient=status in RANGED_TRANSIENT_STATUS
+            )
+
+        response_etag = response.headers.get("ETag")
+        if etag and response_etag and response_etag != etag:
+            raise RangeRequestError(f"ETag 불일치: {response_etag} != {etag}", status, restart=True)
+        content_range = response.headers.get("Content-Range", "")
+        total = content_range.rsplit("/", 1)[-1]
+        if total.isdigit() and int(total) != size:
+            raise RangeRequestError(f"전체 크기 변경: {content_range} (기존 {size} bytes)", status, restart=True)
+        if not content_range.startswith(f"bytes {offset}-"):
+            raise RangeRequestError(f"예상하지 못한 Content-Range: {content_range}", status, transient=True)
+
+    def _download_single(self, url, dest_path):
+        """Range 미지원 게이트웨이용 단일 스트림 다운로드"""
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise Exception(f"HTTP 다운로드 실패: 상태 코드 {response.status_code}")
+            with open(dest_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=256 * 1024):
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _load_manifest(self, manifest_path, url, size, etag, dest_path):
+        """이어받기 가능한 매니페스트면 완료 세그먼트 집합 반환, 아니면 None"""
+        try:
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (
+            manifest.get("url") != url
+            or manifest.get("size") != size
+            or manifest.get("etag") != etag
+            or manifest.get("segment_size") != self.segment_size
+            or not os.path.exists(dest_path)
+            or os.path.getsize(dest_path) != size
+        ):
+            logger.info("매니페스트가 현재 대상과 달라 처음부터 다시 다운로드합니다.")
+            return None
+        return set(manifest.get("done", []))
+
+    def _save_manifest(self, manifest_path, url, size, etag, done):
+        """매니페스트를 원자적으로 저장"""
+        manifest = {
+            "url": url,
+            "size": size,
+            "etag": etag,
+            "segment_size": self.segment_size,
+            "done": sorted(done),
+        }
+        manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+        fd, staging_path = tempfile.mkstemp(dir=manifest_dir, suffix=".manifest.tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(staging_path, manifest_path)
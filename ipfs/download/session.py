@@ -0,0 +1,141 @@
+import os
+import time
+import queue
+import logging
+import threading
+import warnings
+from contextlib import contextmanager
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 풀 크기 및 헬스체크 캐시 유지 시간 (환경변수로 재정의 가능)
+IPFS_POOL_SIZE = int(os.getenv("IPFS_POOL_SIZE", 4))
+IPFS_HEALTH_TTL = float(os.getenv("IPFS_HEALTH_TTL", 60))
+IPFS_HEALTH_FAILURE_TTL = float(os.getenv("IPFS_HEALTH_FAILURE_TTL", 5))
+
+
+class IPFSSessionPool:
+    """
+    오래 유지되는 스레드 안전 ipfshttpclient 세션 풀
+    - session=True 클라이언트를 재사용하여 keep-alive HTTP 연결 유지 (매 호출 TCP 핸드셰이크 제거)
+    - 헬스체크(version) 결과를 TTL 동안 캐시 (실패 결과는 더 짧게 캐시)
+    - 같은 API 주소에 대해서는 shared()로 프로세스 전역 풀 하나를 공유
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, api_url, max_size=IPFS_POOL_SIZE, health_ttl=IPFS_HEALTH_TTL,
+                 failure_ttl=IPFS_HEALTH_FAILURE_TTL):
+        self.api_url = api_url
+        self.max_size = max(1, max_size)
+        self.health_ttl = health_ttl
+        self.failure_ttl = failure_ttl
+        self._idle = queue.LifoQueue(maxsize=self.max_size)
+        self._health_lock = threading.Lock()
+        self._health = None  # (결과, 만료 시각)
+
+    @classmethod
+    def shared(cls, api_url):
+        """API 주소별 프로세스 전역 풀 반환"""
+        with cls._shared_lock:
+            pool = cls._shared.get(api_url)
+            if pool is None:
+                pool = cls(api_url)
+                cls._shared[api_url] = pool
+            return pool
+
+    def _connect(self):
+        import ipfshttpclient
+        # 버전 불일치 경고 무시
+        warnings.filterwarnings("ignore", category=ipfshttpclient.exceptions.VersionMismatch)
+        return ipfshttpclient.connect(self.api_url, session=True)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, client, healthy=True):
+        if healthy:
+            try:
+                self._idle.put_nowait(client)
+                return
+            except queue.Full:
+                pass
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def client(self):
+        """풀에서 클라이언트를 빌려 사용 (오류 발생 시 해당 연결은 폐기)"""
+        client = self._acquire()
+        try:
+            yield client
+        except BaseException:
+            self._release(client, healthy=False)
+            raise
+        else:
+            self._release(client)
+
+    def lease(self):
+        """스트리밍처럼 호출 범위를 벗어나 사용할 클라이언트 대여 → PooledClientLease"""
+        return PooledClientLease(self, self._acquire())
+
+    def is_available(self, force=False):
+        """IPFS API 연결 가능 여부 (TTL 동안 캐시된 헬스체크 결과 사용)"""
+        with self._health_lock:
+            now = time.monotonic()
+            if not force and self._health and self._health[1] > now:
+                return self._health[0]
+
+            try:
+                with self.client() as client:
+                    version = client.version()
+                logger.info(f"✅ IPFS 연결 성공. 버전: {version['Version']}")
+                self._health = (True, now + self.health_ttl)
+            except Exception as e:
+                logger.error(f"🚨 IPFS 연결 실패: {e}")
+                self._health = (False, now + self.failure_ttl)
+            return self._health[0]
+
+    def mark_unavailable(self):
+        """요청 실패 시 캐시된 헬스체크를 무효화 (다음 호출에서 재확인)"""
+        with self._health_lock:
+            self._health = None
+
+    def close_all(self):
+        """유휴 연결 모두 종료"""
+        while True:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                client.close()
+            except Exception:
+                pass
+
+
+class PooledClientLease:
+    """대여한 클라이언트 래퍼: close() 시 풀로 반환 (오류 발생 시 discard())"""
+
+    def __init__(self, pool, client):
+        self.pool = pool
+        self.client = client
+        self._returned = False
+
+    def close(self):
+        if not self._returned:
+            self._returned = True
+            self.pool._release(self.client)
+
+    def discard(self):
+        if not self._returned:
+            self._returned = True
+            self.pool._release(self.client, healthy=False)
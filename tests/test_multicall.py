@@ -0,0 +1,236 @@
+"""
+ReadAggregator 테스트 (anvil/hardhat 노드를 흉내 내는 최소 JSON-RPC 스텁 사용)
+- Multicall3가 배포된 체인: 컨트랙트 조회를 aggregate3 eth_call 하나로 묶음
+- Multicall3가 없는 체인: 컨트랙트 조회를 개별 eth_call로 JSON-RPC 배치에 포함
+- 두 경로 모두 revert된 조회는 해당 항목만 예외 객체로 반환
+- purchase_update처럼 가스 추정(eth_estimateGas)도 조회와 같은 배치로 전송
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector
+from web3.exceptions import ContractLogicError
+
+from client.multicall import MULTICALL3_ADDRESS, ReadAggregator
+from client.rpc_batch import RPCBatcher
+
+TARGET_ADDRESS = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+ACCOUNT_ADDRESS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+BALANCE = 10 ** 18
+PRICE = 10 ** 15
+GAS_ESTIMATE = 52000
+
+# double(x) = 2x, x == 13이면 revert / buy(x): value가 PRICE보다 적으면 revert
+TARGET_ABI = [
+    {
+        "type": "function",
+        "name": "double",
+        "stateMutability": "view",
+        "inputs": [{"name": "x", "type": "uint256"}],
+        "outputs": [{"name": "", "type": "uint256"}],
+    },
+    {
+        "type": "function",
+        "name": "buy",
+        "stateMutability": "payable",
+        "inputs": [{"name": "x", "type": "uint256"}],
+        "outputs": [],
+    },
+]
+DOUBLE_SELECTOR = function_signature_to_4byte_selector("double(uint256)")
+BUY_SELECTOR = function_signature_to_4byte_selector("buy(uint256)")
+AGGREGATE3_SELECTOR = function_signature_to_4byte_selector("aggregate3((address,bool,bytes)[])")
+REVERT_INPUT = 13
+
+
+class StubNode:
+    """eth_chainId, eth_getCode, eth_getBalance, eth_call, eth_estimateGas만 처리하는 JSON-RPC 스텁 (배치 요청 지원)"""
+
+    def __init__(self, multicall_deployed):
+        self.multicall_deployed = multicall_deployed
+        self.posts = []   # HTTP 요청마다 JSON-RPC 메서드 목록
+
+    def handle(self, request):
+        method, params = request["method"], request["params"]
+        if method == "eth_chainId":
+            return self._result(request, "0x7a69")
+        if method == "eth_getCode":
+            deployed = self.multicall_deployed and params[0].lower() == MULTICALL3_ADDRESS.lower()
+            return self._result(request, "0x6080" if deployed else "0x")
+        if method == "eth_getBalance":
+            return self._result(request, hex(BALANCE))
+        if method == "eth_call":
+            to, data = params[0]["to"].lower(), bytes.fromhex(params[0]["data"][2:])
+            if to == MULTICALL3_ADDRESS.lower() and data[:4] == AGGREGATE3_SELECTOR:
+                (calls,) = decode(["(address,bool,bytes)[]"], data[4:])
+                results = [self._double(call_data) for _, _, call_data in calls]
+                return self._result(request, "0x" + encode(["(bool,bytes)[]"], [results]).hex())
+            if to == TARGET_ADDRESS.lower() and data[:4] == DOUBLE_SELECTOR:
+                success, return_data = self._double(data)
+                if not success:
+                    return self._error(request, 3, "execution reverted")
+                return self._result(request, "0x" + return_data.hex())
+        if method == "eth_estimateGas":
+            to, data = params[0]["to"].lower(), bytes.fromhex(params[0]["data"][2:])
+            if to == TARGET_ADDRESS.lower() and data[:4] == BUY_SELECTOR:
+                if int(params[0].get("value", "0x0"), 16) < PRICE:
+                    return self._error(request, 3, "execution reverted")
+                return self._result(request, hex(GAS_ESTIMATE))
+        return self._error(request, -32601, f"method not found: {method}")
+
+    @staticmethod
+    def _double(call_data):
+        (x,) = decode(["uint256"], call_data[4:])
+        if x == REVERT_INPUT:
+            return False, b""
+        return True, encode(["uint256"], [2 * x])
+
+    @staticmethod
+    def _result(request, result):
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    @staticmethod
+    def _error(request, code, message):
+        return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": code, "message": message}}
+
+
+def _serve(node):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            requests = body if isinstance(body, list) else [body]
+            node.posts.append([request["method"] for request in requests])
+            responses = [node.handle(request) for request in requests]
+            data = json.dumps(responses if isinstance(body, list) else responses[0]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def start_node():
+    servers = []
+
+    def start(multicall_deployed):
+        node = StubNode(multicall_deployed)
+        server = _serve(node)
+        servers.append(server)
+        node.url = f"http://127.0.0.1:{server.server_address[1]}"
+        return node
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(params=[True, False], ids=["aggregate3", "batch-fallback"])
+def node(request, start_node):
+    return start_node(request.param)
+
+
+def _aggregator(node):
+    batcher = RPCBatcher(node.url)
+    target = batcher.web3.eth.contract(address=TARGET_ADDRESS, abi=TARGET_ABI)
+    return ReadAggregator(batcher), target
+
+
+def test_read_mixed_requests_with_failing_call(node):
+    aggregator, target = _aggregator(node)
+
+    results = aggregator.read([
+        target.functions.double(1),
+        target.functions.double(REVERT_INPUT),
+        lambda w3: w3.eth.get_balance(ACCOUNT_ADDRESS),
+        target.functions.double(21),
+    ])
+
+    assert results[0] == 2
+    assert isinstance(results[1], ContractLogicError)
+    assert results[2] == BALANCE
+    assert results[3] == 42
+    assert aggregator.multicall_available is node.multicall_deployed
+
+
+def test_aggregate3_packs_contract_reads_into_one_call(start_node):
+    node = start_node(multicall_deployed=True)
+    aggregator, target = _aggregator(node)
+    aggregator.multicall_available  # eth_getCode 확인은 최초 1회
+
+    node.posts.clear()
+    results = aggregator.read([target.functions.double(x) for x in (1, 2, REVERT_INPUT, 4)])
+
+    assert results[:2] == [2, 4] and results[3] == 8
+    assert isinstance(results[2], ContractLogicError)
+    assert node.posts == [["eth_call"]]
+
+
+def test_batch_fallback_sends_individual_calls_in_one_batch(start_node):
+    node = start_node(multicall_deployed=False)
+    aggregator, target = _aggregator(node)
+    aggregator.multicall_available
+
+    node.posts.clear()
+    results = aggregator.read([
+        target.functions.double(3),
+        lambda w3: w3.eth.get_balance(ACCOUNT_ADDRESS),
+    ])
+
+    assert results == [6, BALANCE]
+    assert node.posts == [["eth_call", "eth_getBalance"]]
+
+
+def test_sender_bound_reads_skip_multicall(node):
+    aggregator, target = _aggregator(node)
+
+    results = aggregator.read(
+        [target.functions.double(5), target.functions.double(REVERT_INPUT)], sender=ACCOUNT_ADDRESS
+    )
+
+    assert results[0] == 10
+    assert isinstance(results[1], ContractLogicError)
+    assert all("eth_getCode" not in methods for methods in node.posts)
+
+
+def test_estimate_gas_rides_in_the_read_batch(start_node):
+    node = start_node(multicall_deployed=True)
+    aggregator, target = _aggregator(node)
+    aggregator.multicall_available
+
+    def estimate(value):
+        return lambda w3: aggregator.batcher.rebind(target.functions.buy(1)).estimate_gas(
+            {"from": ACCOUNT_ADDRESS, "value": value}
+        )
+
+    node.posts.clear()
+    results = aggregator.read([
+        target.functions.double(7),
+        lambda w3: w3.eth.get_balance(ACCOUNT_ADDRESS),
+        estimate(PRICE),
+    ])
+
+    assert results == [14, BALANCE, GAS_ESTIMATE]
+    assert node.posts == [["eth_call", "eth_getBalance", "eth_estimateGas"]]
+
+    # 가격보다 적은 value → 가스 추정만 예외 객체, 나머지 조회 결과는 유지
+    results = aggregator.read([
+        target.functions.double(7),
+        lambda w3: w3.eth.get_balance(ACCOUNT_ADDRESS),
+        estimate(PRICE - 1),
+    ])
+
+    assert results[:2] == [14, BALANCE]
+    assert isinstance(results[2], ContractLogicError)